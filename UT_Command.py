@@ -1,8 +1,13 @@
+import json
+import signal
+import threading
 import unittest
 from time import sleep, time
 
 # Module imports
-from backend.Command import Command
+from backend.Command import Capture, Command, E_Capture
+from backend.Reactor import Reactor
+from backend.Scheduling import E_IOClass, Sched
 
 
 class UT_Command(unittest.TestCase):
@@ -24,6 +29,19 @@ class UT_Command(unittest.TestCase):
     AO_RAW_NL: str = "cat /mnt/daten/testfiles/rutbs4/cmd/00_0f.txt" 
     AP_RAW_EXTREME: str = "cat /mnt/daten/testfiles/rutbs4/cmd/00_ff.txt"
     AR_RAW_ALLERR: str = ">&2 cat /mnt/daten/testfiles/rutbs4/cmd/00_ff.txt"
+    AS_WAKEUP: str = "sleep 0.3"
+    AT_RAW_LARGE: str = "dd if=/dev/urandom bs=1M count=16 iflag=fullblock status=none"
+    AU_LINES: str = "seq 1 1000"
+    AV_PARALLEL: str = "sh -c 'sleep 0.5; echo done'"
+    AW_THROUGHPUT: str = "dd if=/dev/urandom of=/dev/null bs=1M count=512"
+    AX_ARGV: list = ["echo", "it's a \"file\" with $HOME in it"]
+    AX_NOTFOUND: list = ["rutbs-command-that-does-not-exist", "--help"]
+    AY_STDIN: list = ["sha256sum"]
+    AY_STALL: list = ["sleep", "10"]
+    AZ_SCHED: list = ["sleep", "2"]
+    BA_SLEEP: list = ["sleep", "0.2"]
+    BB_SNAPSHOT: list = ["echo", "snapshot"]
+    BA_BUSY: list = ["dd", "if=/dev/zero", "of=/dev/null", "bs=1M", "count=4096", "status=none"]
 
     """_summary_
     Depdencies:
@@ -291,15 +309,15 @@ class UT_Command(unittest.TestCase):
 
     def test_AJ_WaitTimeout(self) -> None:
         """
-        This test does terminate cmd mid-way with the c.wait(timeout=xxx) (xxx in 10ms)
-        Default Value 100 -> 1sec / 1000ms
+        This test does terminate cmd mid-way with the c.wait(timeout=xxx) (xxx in sec.)
+        Default Value 1 -> 1sec / 1000ms
         """
 
         c: Command = Command(self.AJ_WAITTIME)
         self.assertEqual(c.cmd, self.AJ_WAITTIME)
 
         beg_time = time()
-        c.wait(100)
+        c.wait(1)
         end_time = time()
 
         try:
@@ -468,5 +486,333 @@ class UT_Command(unittest.TestCase):
             raise
         print("R_RAW_ALLERR")
 
+    def test_AS_waitWakeup(self) -> None:
+        """
+        c.wait() must return as soon as the process exits, not on the next polling tick
+        - sleep 0.3 shall be done after ~300ms
+        - the output of an instant command shall be available right after c.wait()
+        """
+
+        c: Command = Command(self.AS_WAKEUP)
+
+        beg_time = time()
+        c.wait()
+        end_time = time()
+
+        try:
+            self.assertGreaterEqual((end_time - beg_time), 0.3)
+            self.assertLess((end_time - beg_time), 0.5)
+            self.assertEqual(c.exitCode, 0)
+            self.assertEqual(c.running, False)
+            self.assertEqual(c.closed, True)
+            self.assertEqual(c.pidfd, -1)
+
+            c.reset()
+            c.cmd = self.AF_STDOUT
+            c.wait()
+            self.assertEqual(c.stdout[0], "b32fea58-45ec-4276-a129-ee4f1ee441ae")
+        except AssertionError:
+            c.quiet = False
+            print(c)
+            raise
+
+        print("S_WAKEUP")
+
+    def test_AT_rawLarge(self) -> None:
+        """
+        RAW output is kept as bytes, 16MiB must arrive completely and
+        c.stdout[0] must be the hex rendering of exactly those bytes
+        """
+
+        c: Command = Command(self.AT_RAW_LARGE, raw=True)
+        c.wait()
+
+        try:
+            self.assertEqual(c.exitCode, 0)
+            self.assertEqual(len(c.status_msg), 0)
+            self.assertEqual(len(c.stdoutRaw), 16 * 1024 * 1024)
+            self.assertEqual(len(c.stdout), 1)
+            self.assertEqual(c.stdout[0], c.stdoutRaw.hex())
+            self.assertEqual(len(c.stderrRaw), 0)
+            self.assertEqual(c.stderr, [])
+        except AssertionError:
+            c.quiet = False
+            print(c)
+            raise
+
+        print("T_RAW_LARGE")
+
+    def test_AU_capturePolicies(self) -> None:
+        """
+        Runs "seq 1 1000" with every capture policy:
+            - DISCARD keeps nothing but counts bytes
+            - RING keeps the last 10 lines
+            - SPOOL writes everything into a temp file, removed by c.reset()
+            - CALLBACK gets every single line
+        """
+
+        _total: int = len("\n".join(str(n) for n in range(1, 1001))) + 1
+
+        c: Command = Command(self.AU_LINES, capture=Capture(E_Capture.DISCARD))
+        c.wait()
+        self.assertEqual(c.exitCode, 0)
+        self.assertEqual(c.stdout, [])
+        self.assertEqual(c._asdict()["capture"]["stdout"]["bytes"], _total)
+
+        c = Command(self.AU_LINES, capture=Capture(E_Capture.RING, lines=10))
+        c.wait()
+        self.assertEqual(c.stdout, [str(n) for n in range(991, 1001)])
+
+        c = Command(self.AU_LINES, capture=Capture(E_Capture.SPOOL))
+        c.wait()
+        self.assertEqual(c.stdout, [])
+        with open(c.stdoutSpool, "r") as f:
+            self.assertEqual(f.read().split(), [str(n) for n in range(1, 1001)])
+        _spool: str = c.stdoutSpool
+        c.reset()
+        self.assertEqual(c.stdoutSpool, "")
+        with self.assertRaises(FileNotFoundError):
+            open(_spool, "r")
+
+        _lines: list = []
+        c = Command(self.AU_LINES, capture=Capture(E_Capture.CALLBACK, callback=lambda name, line: _lines.append((name, line))))
+        c.wait()
+        self.assertEqual(c.stdout, [])
+        self.assertEqual(len(_lines), 1000)
+        self.assertEqual(_lines[-1], ("STDOUT", "1000"))
+
+        print("U_CAPTURE")
+
+    def test_AV_threadCount(self) -> None:
+        """
+        32 parallel commands must not spawn any reader threads,
+        all pipes are served by the single Reactor thread
+        """
+        Command("true").wait()  # makes sure the reactor is up
+        _threads: int = threading.active_count()
+
+        commands: list = [Command(self.AV_PARALLEL) for n in range(32)]
+        for c in commands:
+            c.start()
+
+        try:
+            self.assertEqual(threading.active_count(), _threads)
+            self.assertEqual(Reactor.ThreadCount(), 1)
+
+            for c in commands:
+                c.wait()
+                self.assertEqual(c.exitCode, 0)
+                self.assertEqual(c.stdout, ["done"])
+        except AssertionError:
+            print(json.dumps([c._asdict() for c in commands], indent=2))
+            raise
+
+        print("V_THREADS")
+
+    def test_AW_ioStats(self) -> None:
+        """
+        Reads 512MiB from /dev/urandom, the IOSampler shall provide:
+            - parsed integer counters
+            - a rate and an ETA while running (filesize given)
+            - final counters after exit
+            - no sample once the PID got released by reaping (it may be reused)
+        """
+
+        c: Command = Command(self.AW_THROUGHPUT, filesize=512 * 1024 * 1024)
+        c.start()
+        sleep(1.2)
+        c.status()
+
+        try:
+            if c.running:   # very fast systems might be done by now
+                stats: dict = c._asdict()["io_stats"]
+                self.assertGreater(stats["read"]["rate"], 0)
+                self.assertGreater(stats["read"]["avg_rate"], 0)
+                self.assertGreaterEqual(stats["read"]["eta"], 0)
+                self.assertGreaterEqual(len(c.ioSampler.read.history), 2)
+
+            c.wait()
+            self.assertEqual(c.exitCode, 0)
+            self.assertIsInstance(c.ioSampler.counters["rchar"], int)
+            self.assertGreater(c.ioSampler.counters["rchar"], 512 * 1024 * 1024)
+            self.assertEqual(c.ioSampler.read.current(), c.ioSampler.counters["rchar"])
+
+            short: Command = Command(["sleep", "5"])
+            short.start()
+            short._signal(signal.SIGKILL)
+            short._reap(block=True)     # reaped only, no status() / cleanup() yet
+            self.assertEqual(short.ioSampler.stopped, True)
+            self.assertEqual(short.ioSampler.sample(force=True), False)
+            self.assertGreaterEqual(short.ioSampler.samples, 1)
+            short.cleanup()
+        except AssertionError:
+            c.quiet = False
+            print(c)
+            raise
+
+        print("W_IOSTATS")
+
+    def test_AX_argv(self) -> None:
+        """
+        argv lists are spawned without a shell:
+            - quotes and $VARS are passed through untouched
+            - an unknown binary ends with exitCode 127 like in a shell
+        """
+
+        c: Command = Command(self.AX_ARGV)
+        c.wait()
+
+        try:
+            self.assertEqual(c.exitCode, 0)
+            self.assertEqual(c.stdout, [self.AX_ARGV[1]])
+            self.assertEqual(c._asdict()["cmd"], "echo 'it'\"'\"'s a \"file\" with $HOME in it'")
+
+            c = Command(self.AX_NOTFOUND)
+            c.wait()
+            self.assertEqual(c.exitCode, 127)
+            self.assertEqual(c.running, False)
+            self.assertEqual(c.didRun, True)
+            self.assertEqual(len(c.status_msg), 1)
+        except AssertionError:
+            c.quiet = False
+            print(c)
+            raise
+
+        print("X_ARGV")
+
+    def test_AY_stdin(self) -> None:
+        """
+        STDIN feed:
+            - 32MiB pushed from python must arrive byte-exact
+            - a child that does not read blocks the producer (backpressure)
+        """
+        import hashlib
+        data: bytes = bytes(range(256)) * 131072
+
+        c: Command = Command(self.AY_STDIN, stdin=True)
+        c.start()
+        c.feed(data)
+        c.wait()
+
+        try:
+            self.assertEqual(c.exitCode, 0)
+            self.assertEqual(c.stdout[0].split()[0], hashlib.sha256(data).hexdigest())
+            self.assertEqual(c._asdict()["stdin"]["bytes"], len(data))
+
+            c = Command(self.AY_STALL, stdin=True)
+            c.start()
+            with self.assertRaises(TimeoutError):
+                for n in range(64):
+                    c.write(bytes(1024 * 1024), timeout=0.5)
+            self.assertLessEqual(c._stdin.buffered, Command.STDIN_LIMIT + 1024 * 1024)
+            c.kill()
+            self.assertEqual(c.running, False)
+        except AssertionError:
+            c.quiet = False
+            print(c)
+            raise
+
+        print("Y_STDIN")
+
+    def test_AZ_sched(self) -> None:
+        """
+        Scheduling class is applied to the child right after spawn
+        """
+        import os
+        import resource
+        sched: Sched = Sched("test", nice=7, ioClass=E_IOClass.IDLE, cpus={0},
+                             rlimits={resource.RLIMIT_NOFILE: (64, 64)})
+        c: Command = Command(self.AZ_SCHED, sched=sched)
+        c.start()
+
+        try:
+            self.assertEqual(os.getpriority(os.PRIO_PROCESS, c.pid), 7)
+            self.assertEqual(Sched.GetIOPrio(c.pid)[0], E_IOClass.IDLE)
+            self.assertEqual(os.sched_getaffinity(c.pid), {0})
+            self.assertEqual(resource.prlimit(c.pid, resource.RLIMIT_NOFILE), (64, 64))
+            self.assertEqual(c._asdict()["sched"]["name"], "test")
+            self.assertEqual(len(c.status_msg), 0)
+            c.kill()
+
+            # The preset only asks for what this user may get, no message per tape dd
+            c = Command(self.AZ_SCHED, sched=Sched.STREAMING)
+            c.start()
+            self.assertEqual(len(c.status_msg), 0)
+            c.kill()
+        except AssertionError:
+            c.quiet = False
+            print(c)
+            raise
+
+        print("Z_SCHED")
+
+    def test_BA_rusage(self) -> None:
+        """
+        rusage via wait4():
+            - wall time ends at exit, not when somebody polls later
+            - sleep is idle, dd from /dev/zero burns CPU
+            - both end up in Command.Statistics()
+            - shell strings are keyed by their executable, not by redirections in front of it
+        """
+        Command.ResetStatistics()
+        c: Command = Command(self.BA_SLEEP)
+        c.start()
+        sleep(1)
+        c.status()
+        busy: Command = Command(self.BA_BUSY)
+        busy.wait()
+        Command("2>/dev/null LC_ALL=C true").wait()
+
+        try:
+            self.assertEqual(c.exitCode, 0)
+            self.assertGreaterEqual(c.rusage["wall"], 0.2)
+            self.assertLess(c.rusage["wall"], 0.8)
+            self.assertLess(c.rusage["utime"] + c.rusage["stime"], 0.1)
+            self.assertGreater(c.rusage["maxrss"], 0)
+            self.assertEqual(c._asdict()["rusage"], c.rusage)
+            self.assertGreater(busy.rusage["utime"] + busy.rusage["stime"], 0)
+
+            stats = Command.Statistics()
+            self.assertEqual(stats["sleep"]["runs"], 1)
+            self.assertEqual(stats["dd"]["runs"], 1)
+            self.assertGreater(stats["dd"]["cpu"], stats["sleep"]["cpu"])
+            self.assertEqual(stats["true"]["runs"], 1)
+            self.assertEqual(sorted(stats), ["dd", "sleep", "true"])
+        except AssertionError:
+            c.quiet = False
+            print(c)
+            print(Command.Statistics())
+            raise
+
+        print("BA_RUSAGE")
+
+    def test_BB_snapshot(self) -> None:
+        """
+        _asdict() of a finished Command is built once and reused,
+        a reset + rerun builds it again
+        """
+        c: Command = Command(self.BB_SNAPSHOT)
+        c.wait()
+        first: dict = c._asdict()
+        builds: int = c._snapshot.builds
+
+        try:
+            for n in range(100):
+                self.assertIs(c._asdict(), first)
+            self.assertEqual(c._snapshot.builds, builds)
+            self.assertEqual(first["stdout"], ["snapshot"])
+
+            c.reset()
+            c.cmd = ["echo", "changed"]
+            c.wait()
+            self.assertEqual(c._asdict()["stdout"], ["changed"])
+            self.assertGreater(c._snapshot.builds, builds)
+        except AssertionError:
+            c.quiet = False
+            print(c)
+            raise
+
+        print("BB_SNAPSHOT")
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,10 +1,14 @@
+import os
+import tempfile
 import unittest
 import json
+from typing import List
 
 # Module imports
 from backend.Encryption import *
 from backend.File import File, FileState
 from backend.Checksum import *
+from backend.PageCache import E_Cache, PageCache
 
 class UT_Encryption(unittest.TestCase):
 
@@ -281,6 +285,46 @@ class UT_Encryption(unittest.TestCase):
         #print(json.dumps(result, indent=2))
         print("CA_ALL_MEDIUM")
 
+# --- D PAGE CACHE ------------------------------------------------------------
+
+    def test_DA_pageCache(self) -> None:
+        """
+        DROP policy: dd reads the source and writes the target with nocache, openssl only sees pipes
+        """
+        tmp = tempfile.TemporaryDirectory()
+        data: bytes = os.urandom(3 * 1024 * 1024 + 17)
+        path: str = os.path.join(tmp.name, "plain.bin")
+        with open(path, "wb") as f:
+            f.write(data)
+        e: Encryption = Encryption(Key(KeyLength.medium), E_Mode.AES256CTR)
+
+        PageCache.SetPolicy(E_Cache.DROP)
+        try:
+            e.encrypt(path)
+            e.wait()
+            self.assertEqual(e.state, E_State.IDLE)
+            argvs: List[List[str]] = [stage.cmd for stage in e.pipeline.commands]
+            self.assertEqual([argv[0] for argv in argvs], ["dd", "openssl", "dd"])
+            self.assertIn("iflag=nocache", argvs[0])
+            self.assertIn("oflag=nocache", argvs[2])
+            self.assertNotIn("-in", argvs[1])
+            self.assertIs(e.cmd, e.pipeline.commands[1])
+
+            os.remove(path)
+            e.decrypt(path + ".crypt")
+            e.wait()
+            self.assertEqual(e.state, E_State.IDLE)
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), data)
+        except AssertionError:
+            print(e)
+            raise
+        finally:
+            PageCache.SetPolicy(E_Cache.DEFAULT)
+            tmp.cleanup()
+
+        print("DA_PAGE_CACHE")
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,531 @@
+import hashlib
+import os
+import tempfile
+import time
+import unittest
+import zlib
+from typing import List
+
+# Module imports
+from backend.Checksum import Checksum, ChecksumState, ChecksumType
+from backend.ChecksumBatch import ChecksumBatch
+from backend.ChecksumCache import ChecksumCache
+from backend.File import File, FileState
+from backend.HashEngine import HashEngine, HashJob, HashStream
+from backend.PageCache import E_Cache, PageCache
+from backend.Scheduling import E_IOClass, Sched
+
+
+class UT_HashEngine(unittest.TestCase):
+
+    """_summary_
+    Depdencies:
+    - your favorite flavour of LINUX
+    - a writable temp dir
+    """
+
+    SIZE: int = 3 * HashEngine.BUFFER_SIZE + 12345     # not buffer aligned
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data: bytes = os.urandom(self.SIZE)
+        self.path: str = os.path.join(self.tmp.name, "it's data.bin")
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+        ChecksumCache.Open(os.path.join(self.tmp.name, "cache.sqlite"))   # never touch ~/.cache
+
+    def tearDown(self) -> None:
+        ChecksumCache.Open("")
+        self.tmp.cleanup()
+
+    def test_AA_digest(self) -> None:
+        for algorithm in ("md5", "sha256", "sha512"):
+            job: HashJob = HashJob(self.path, algorithm, self.SIZE)
+            job.wait()
+            try:
+                self.assertEqual(job.exitCode, 0)
+                self.assertEqual(job.running, False)
+                self.assertEqual(job.bytes, self.SIZE)
+                self.assertEqual(job.digest, hashlib.new(algorithm, self.data).hexdigest())
+            except AssertionError:
+                print(job)
+                raise
+
+        print("A_DIGEST")
+
+    def test_AB_parallel(self) -> None:
+        """
+        64 jobs never use more workers than the thread limit
+        """
+        HashEngine.SetThreadLimit(3)
+        jobs = [HashJob(self.path) for n in range(64)]
+        for job in jobs:
+            job.start()
+            self.assertLessEqual(HashEngine.ThreadCount(), 3)
+        for job in jobs:
+            job.wait()
+
+        expected: str = hashlib.sha256(self.data).hexdigest()
+        self.assertTrue(all(job.digest == expected for job in jobs))
+        HashEngine.SetThreadLimit(os.cpu_count() or 1)
+
+        print("B_PARALLEL")
+
+    def test_AC_errors(self) -> None:
+        """
+        A missing file fails the job but not the worker, reset() allows a rerun.
+        An unreadable path (a directory) is named in the error and leaks no fd.
+        """
+        job: HashJob = HashJob(self.path + ".missing")
+        job.wait()
+        fds: int = len(os.listdir("/proc/self/fd"))
+        folder: List[HashJob] = [HashJob(self.tmp.name) for n in range(20)]
+        for failed in folder:
+            failed.wait()
+        try:
+            self.assertEqual(job.exitCode, 1)
+            self.assertEqual(job.digest, "")
+            self.assertEqual(len(job.status_msg), 1)
+            self.assertEqual(folder[0].exitCode, 1)
+            self.assertIn("directory: '" + self.tmp.name + "'", folder[0].status_msg[0])
+            self.assertLessEqual(len(os.listdir("/proc/self/fd")), fds)
+
+            job.reset()
+            job.path = self.path
+            job.wait()
+            self.assertEqual(job.exitCode, 0)
+            self.assertEqual(len(job.status_msg), 0)
+
+            with self.assertRaises(ValueError):
+                HashJob(self.path, "no-such-algo").start()
+        except AssertionError:
+            print(job)
+            raise
+
+        print("C_ERRORS")
+
+    def test_AD_batch(self) -> None:
+        """
+        300 small files + 1 large one as a ChecksumBatch:
+            - one vanished file ends in ERROR, all others get the right value
+            - drain() hands out every File exactly once
+        """
+        files = []
+        for n in range(300):
+            path: str = os.path.join(self.tmp.name, "small_" + str(n))
+            with open(path, "wb") as f:
+                f.write(str(n).encode() * n)
+            files.append(File(n, path, self.tmp.name))
+        files.append(File(300, self.path, self.tmp.name))
+        os.remove(files[42].path.path)
+
+        batch: ChecksumBatch = ChecksumBatch(files)
+        batch.wait()
+        drained = batch.drain()
+
+        try:
+            self.assertEqual(len(drained), len(files))
+            self.assertEqual(batch.drain(), [])
+            self.assertEqual(batch.failed, 1)
+            self.assertEqual(files[42].state, FileState.ERROR)
+            for file in files:
+                if file is files[42]:
+                    continue
+                with open(file.path.path, "rb") as f:
+                    self.assertEqual(file.cksum.value, hashlib.sha256(f.read()).hexdigest())
+                self.assertEqual(file.state, FileState.IDLE)
+        except AssertionError:
+            print(batch)
+            raise
+
+        print("D_BATCH")
+
+    def test_AE_multiDigest(self) -> None:
+        """
+        SHA256 + MD5 + SHA512 from one read pass, stored and validated per type
+        """
+        file: File = File(1, self.path, self.tmp.name)
+        file.cksum.setExtraTypes([ChecksumType.MD5, ChecksumType.SHA512, ChecksumType.SHA256])
+        file.createChecksum()
+        file.wait()
+
+        try:
+            self.assertEqual(file.cksum.value, hashlib.sha256(self.data).hexdigest())
+            self.assertEqual(file.cksum.extra_values, {
+                "MD5": hashlib.md5(self.data).hexdigest(),
+                "SHA512": hashlib.sha512(self.data).hexdigest()})
+            self.assertEqual(file.cksum.cmd.bytes, self.SIZE)   # read once, not three times
+            self.assertIn("extra_values", file.cksum._asdict())
+
+            file.validateIntegrity(file.cksum.value, extraTargets={"MD5": file.cksum.extra_values["MD5"]})
+            file.wait()
+            self.assertEqual(file.cksum.state, ChecksumState.IDLE)
+
+            file.validateIntegrity(file.cksum.value, extraTargets={"MD5": "0" * 32})
+            file.wait()
+            self.assertEqual(file.cksum.state, ChecksumState.MISMATCH)
+            self.assertEqual(file.state, FileState.MISMATCH)
+        except AssertionError:
+            print(file)
+            raise
+
+        print("E_MULTI_DIGEST")
+
+    def test_AF_cache(self) -> None:
+        """
+        Unchanged file -> cache hit without reading, modified file or force=True -> re-hash,
+        validate() always reads
+        """
+        file: File = File(1, self.path, self.tmp.name)
+        file.createChecksum()
+        file.wait()
+        expected: str = hashlib.sha256(self.data).hexdigest()
+
+        try:
+            self.assertEqual(file.cksum.cmd.fromCache, False)
+            self.assertEqual(ChecksumCache.Stats()["stores"], 1)
+
+            file.createChecksum()
+            file.wait()
+            self.assertEqual(file.cksum.cmd.fromCache, True)
+            self.assertEqual(file.cksum.cmd.bytes, 0)
+            self.assertEqual(file.cksum.value, expected)
+            self.assertEqual(file.state, FileState.IDLE)
+            self.assertEqual(ChecksumCache.Stats()["hits"], 1)
+
+            file.createChecksum(force=True)
+            file.wait()
+            self.assertEqual(file.cksum.cmd.fromCache, False)
+            self.assertEqual(file.cksum.cmd.bytes, self.SIZE)
+
+            file.validateIntegrity(expected)
+            file.wait()
+            self.assertEqual(file.cksum.cmd.fromCache, False)
+            self.assertEqual(file.cksum.state, ChecksumState.IDLE)
+
+            with open(self.path, "r+b") as f:
+                f.write(b"rewritten")
+            st: os.stat_result = os.stat(self.path)
+            os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+            file.createChecksum()
+            file.wait()
+            self.assertEqual(file.cksum.cmd.fromCache, False)
+            self.assertNotEqual(file.cksum.value, expected)
+            self.assertEqual(ChecksumCache.Stats()["entries"], 1)   # the stale entry got replaced
+
+            self.assertEqual(ChecksumCache.Evict(maxEntries=0), 1)
+            self.assertEqual(ChecksumCache.Stats()["entries"], 0)
+
+            ChecksumCache.Open("")  # disabled: nothing stored, nothing answered
+            file.createChecksum()
+            file.wait()
+            file.createChecksum()
+            file.wait()
+            self.assertEqual(file.cksum.cmd.fromCache, False)
+            self.assertEqual(ChecksumCache.Stats(), {"hits": 0, "misses": 0, "stores": 0, "entries": 0})
+        except AssertionError:
+            print(file)
+            print(ChecksumCache.Stats())
+            raise
+
+        print("F_CACHE")
+
+    def test_AG_fastTypes(self) -> None:
+        """
+        BLAKE2b and CRC32 end to end: create, TOC round trip of the type, validate.
+        Optional types are either computed or refused up front.
+        """
+        expected = {
+            ChecksumType.BLAKE2B: hashlib.blake2b(self.data).hexdigest(),
+            ChecksumType.CRC32: format(zlib.crc32(self.data), "08x"),
+        }
+        for t, value in expected.items():
+            file: File = File(1, self.path, self.tmp.name)
+            file.cksum.setType(t)
+            file.createChecksum()
+            file.wait()
+
+            try:
+                self.assertEqual(file.cksum.value, value)
+                restored: Checksum = Checksum(self.path, ChecksumType[file.cksum._asdict()["type"]])
+                restored.validate(file.cksum.value)
+                restored.wait()
+                self.assertEqual(restored.state, ChecksumState.IDLE)
+
+                restored.validate("0" * len(value))
+                restored.wait()
+                self.assertEqual(restored.state, ChecksumState.MISMATCH)
+            except AssertionError:
+                print(file)
+                raise
+
+        for t in (ChecksumType.CRC32C, ChecksumType.XXH64, ChecksumType.XXH3_128):
+            if not HashEngine.Available(t.name.lower()):
+                with self.assertRaises(ValueError):
+                    Checksum(self.path, t)
+                continue
+            cksum: Checksum = Checksum(self.path, t)
+            cksum.create(force=True)
+            cksum.wait()
+            self.assertEqual(cksum.state, ChecksumState.IDLE)
+
+        print("G_FAST_TYPES")
+
+    def test_AH_tree(self) -> None:
+        """
+        Tree mode: leaves hashed in parallel, root over the binary leaves, HashStream agrees,
+        a damaged region shows up as bad leaf
+        """
+        chunk: int = 1024 * 1024
+        leaves = [hashlib.sha256(self.data[n:n + chunk]).digest() for n in range(0, self.SIZE, chunk)]
+        root: str = hashlib.sha256(b"".join(leaves)).hexdigest()
+
+        file: File = File(1, self.path, self.tmp.name)
+        file.cksum.setTreeChunk(chunk)
+        file.createChecksum()
+        file.wait()
+
+        try:
+            self.assertEqual(file.cksum.value, root)
+            self.assertEqual(file.cksum.leaves, [leaf.hex() for leaf in leaves])
+            self.assertEqual(file.cksum.cmd.bytes, self.SIZE)
+            self.assertEqual(len(file.cksum._asdict()["tree"]["leaves"]), 4)
+
+            job: HashJob = HashJob(self.path)
+            job.treeChunk = chunk
+            stream: HashStream = HashStream(job)
+            for n in range(0, self.SIZE, 77777):    # odd chunks cross the leaf borders
+                stream.update(self.data[n:n + 77777])
+            stream.close()
+            self.assertEqual(job.digest, root)
+
+            single: HashJob = HashJob(self.path)
+            single.treeChunk = 2 * self.SIZE
+            single.wait()
+            self.assertEqual(single.digest, hashlib.sha256(hashlib.sha256(self.data).digest()).hexdigest())
+
+            with open(self.path, "r+b") as f:
+                f.seek(2 * chunk + 5)
+                f.write(b"rot")
+            file.validateIntegrity(root)
+            file.wait()
+            self.assertEqual(file.state, FileState.MISMATCH)
+            self.assertEqual(file.cksum.bad_leaves, [2])
+        except AssertionError:
+            print(file)
+            raise
+
+        print("H_TREE")
+
+    def test_AI_manifest(self) -> None:
+        """
+        Block manifest: one CRC32 per 256K block (tree mode agrees), damage is located,
+        verifyBlocks() re-checks only the bad entries
+        """
+        block: int = 256 * 1024
+        expected = [format(zlib.crc32(self.data[n:n + block]), "08x") for n in range(0, self.SIZE, block)]
+
+        file: File = File(1, self.path, self.tmp.name)
+        file.cksum.setManifest("256K", 1)
+        file.createChecksum()
+        file.wait()
+
+        try:
+            self.assertEqual(file.cksum.manifest, expected)
+            self.assertEqual(file.cksum.value, hashlib.sha256(self.data).hexdigest())
+            self.assertEqual(file.cksum._asdict()["manifest"]["entries"], expected)
+
+            tree: File = File(2, self.path, self.tmp.name)
+            tree.cksum.setManifest("256K", 1)
+            tree.cksum.setTreeChunk(1024 * 1024)
+            tree.createChecksum()
+            tree.wait()
+            self.assertEqual(tree.cksum.manifest, expected)
+
+            with open(self.path, "r+b") as f:
+                f.seek(5 * block + 10)
+                f.write(b"rot")
+            file.validateIntegrity(file.cksum.value)
+            file.wait()
+            self.assertEqual(file.state, FileState.MISMATCH)
+            self.assertEqual(file.cksum.bad_blocks, [5])
+            self.assertEqual(file.cksum.badRange(), (5 * block, block))
+
+            self.assertEqual(file.cksum.verifyBlocks(), [5])
+            with open(self.path, "r+b") as f:
+                f.seek(5 * block + 10)
+                f.write(self.data[5 * block + 10:5 * block + 13])
+            self.assertEqual(file.cksum.verifyBlocks(), [])
+        except AssertionError:
+            print(file)
+            raise
+
+        print("I_MANIFEST")
+
+    def test_AJ_pageCache(self) -> None:
+        """
+        Every cache policy hashes the same bytes, O_DIRECT included (unaligned length and tail)
+        """
+        block: int = 256 * 1024
+        try:
+            for policy in E_Cache:
+                PageCache.SetPolicy(policy)
+                job: HashJob = HashJob(self.path, "sha256", self.SIZE)
+                job.treeChunk = HashEngine.BUFFER_SIZE
+                job.wait()
+                self.assertEqual(job.exitCode, 0)
+                self.assertEqual(job.bytes, self.SIZE)
+                self.assertEqual(job.leaves[-1], hashlib.sha256(self.data[3 * HashEngine.BUFFER_SIZE:]).hexdigest())
+
+                part: HashJob = HashJob(self.path, "md5", self.SIZE)
+                part.offset, part.length = block, block + 777
+                part.wait()
+                self.assertEqual(part.exitCode, 0)
+                self.assertEqual(part.digest, hashlib.md5(self.data[block:2 * block + 777]).hexdigest())
+
+                self.assertEqual(PageCache.Dd("oflag", self.path), {E_Cache.DEFAULT: [], E_Cache.DROP: ["oflag=nocache"],
+                                                                    E_Cache.DIRECT: ["oflag=direct"]}[policy])
+        except AssertionError:
+            print(policy)
+            raise
+        finally:
+            PageCache.SetPolicy(E_Cache.DEFAULT)
+
+        print("J_PAGE_CACHE")
+
+    def test_AK_progress(self) -> None:
+        """
+        Bytes, rate and ETA while hashing (driven by a HashStream), exact once finished
+        """
+        cksum: Checksum = Checksum(self.path)
+        cksum.cmd.filesize = self.SIZE
+        stream: HashStream = cksum.stream() # type: ignore
+        half: int = self.SIZE // 2
+
+        try:
+            stream.update(self.data[:half // 2])
+            cksum.cmd._sample(force=True)
+            time.sleep(0.05)
+            stream.update(self.data[half // 2:half])
+            cksum.cmd._sample(force=True)
+            progress: dict = cksum._asdict()["progress"]
+            self.assertEqual(progress["bytes"], half)
+            self.assertEqual(progress["total"], self.SIZE)
+            self.assertGreater(progress["rate"], 0)
+            self.assertGreater(progress["eta"], 0)
+
+            stream.update(self.data[half:])
+            stream.close()
+            cksum.wait()
+            progress = cksum._asdict()["progress"]
+            self.assertEqual(progress["bytes"], self.SIZE)
+            self.assertEqual(progress["eta"], 0)
+            self.assertGreater(progress["avg_rate"], 0)
+
+            files: List[File] = [File(n, self.path, self.tmp.name) for n in range(3)]
+            batch: ChecksumBatch = ChecksumBatch(files, force=True)
+            self.assertEqual(batch.eta(), -1)   # never started
+            batch.wait()
+            self.assertEqual(batch.eta(), 0)
+            self.assertEqual(batch.nextReady(), -1)
+            self.assertEqual(files[0].cksum.cmd.progress.current(), self.SIZE)
+        except AssertionError:
+            print(cksum)
+            raise
+
+        print("K_PROGRESS")
+
+    def test_AL_quickVerify(self) -> None:
+        """
+        Sampled spot check against the manifest: confidence report, damage found, truncation
+        found without reading (no detection claimed), escalation to a full validation, empty file
+        """
+        block: int = 256 * 1024
+        file: File = File(1, self.path, self.tmp.name)
+        file.cksum.setManifest("256K", 1)
+        file.createChecksum()
+        file.wait()
+        entries: int = len(file.cksum.manifest)
+
+        try:
+            report: dict = file.quickVerify(3)
+            self.assertEqual(report["result"], "OK")
+            self.assertEqual(report["sampled"], 3)
+            self.assertGreater(report["max_damage"], 0)
+            self.assertLess(report["detection"], 1)
+            self.assertEqual(file.cksum._asdict()["quick_verify"], report)
+
+            report = file.quickVerify(entries)  # everything sampled: certainty
+            self.assertEqual((report["detection"], report["max_damage"]), (1, 0))
+
+            with open(self.path, "r+b") as f:
+                f.seek(5 * block + 10)
+                f.write(b"rot")
+            report = file.quickVerify(entries)
+            self.assertEqual(report["bad_blocks"], [5])
+            self.assertEqual(file.state, FileState.MISMATCH)
+            self.assertEqual(file.cksum.badRange(), (5 * block, block))
+
+            file.state = FileState.IDLE
+            report = file.quickVerify(entries, escalate=True)
+            self.assertEqual(report["escalated"], True)
+            self.assertEqual(file.state, FileState.VALIDATING)
+            file.wait()
+            self.assertEqual(file.state, FileState.MISMATCH)
+
+            file.state = FileState.IDLE
+            os.truncate(self.path, 7 * block)
+            report = file.quickVerify(entries)
+            self.assertEqual(report["bad_blocks"], list(range(7, entries)))
+            self.assertEqual((report["sampled"], report["detection"]), (0, 0))
+
+            empty: File = File(2, os.path.join(self.tmp.name, "empty.bin"), self.tmp.name, createFile=True)
+            empty.cksum.setManifest("256K", 1)
+            empty.createChecksum()
+            empty.wait()
+            report = empty.quickVerify()
+            self.assertEqual((report["result"], report["blocks"], report["sampled"]), ("OK", 0, 0))
+            self.assertEqual(empty.state, FileState.IDLE)
+        except AssertionError:
+            print(file)
+            raise
+
+        print("L_QUICK_VERIFY")
+
+    def test_AM_sched(self) -> None:
+        """
+        Workers hash with Sched.BACKGROUND (per thread), the backend itself keeps its priority
+        """
+        def background(tid: int) -> bool:
+            # nice and ioprio are set one after the other, wait for both
+            try:
+                return (os.getpriority(os.PRIO_PROCESS, tid) == Sched.BACKGROUND.nice
+                        and Sched.GetIOPrio(tid) == (E_IOClass.BEST_EFFORT, 7))
+            except OSError:
+                return False    # thread exited meanwhile
+
+        def niced() -> List[int]:
+            return [int(tid) for tid in os.listdir("/proc/self/task") if background(int(tid))]
+
+        fifo: str = os.path.join(self.tmp.name, "fifo")
+        os.mkfifo(fifo)
+        own: int = os.getpriority(os.PRIO_PROCESS, 0)
+        job: HashJob = HashJob(fifo)
+        job.start()     # the worker blocks in open() until we write
+        try:
+            deadline: float = time.monotonic() + 2
+            while not niced() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertGreaterEqual(len(niced()), 1)
+            self.assertNotIn(os.getpid(), niced())
+            self.assertEqual(os.getpriority(os.PRIO_PROCESS, 0), own)
+        finally:
+            with open(fifo, "wb") as f:
+                f.write(b"data")
+            job.wait()
+
+        self.assertEqual(job.digest, hashlib.sha256(b"data").hexdigest())
+        print("M_SCHED")
+
+if __name__ == '__main__':
+    unittest.main()
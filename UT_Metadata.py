@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+# Module imports
+from backend.Metadata import Metadata
+
+
+class UT_Metadata(unittest.TestCase):
+
+    """_summary_
+    Depdencies:
+    - your favorite flavour of LINUX
+    - a writable temp dir
+    """
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root: str = self.tmp.name
+        for name, size in (("a.bin", 0), ("b.bin", 4096), ("it's c.bin", 7)):
+            with open(os.path.join(self.root, name), "wb") as f:
+                f.write(bytes(size))
+        os.mkdir(os.path.join(self.root, "sub"))
+        os.symlink(os.path.join(self.root, "b.bin"), os.path.join(self.root, "link"))
+        os.symlink(os.path.join(self.root, "missing"), os.path.join(self.root, "dangling"))
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_AA_exists(self) -> None:
+        """
+        Same as `find <path>`: symlinks are not followed, a dangling one still exists
+        """
+        self.assertTrue(Metadata.Exists(os.path.join(self.root, "a.bin")))
+        self.assertTrue(Metadata.Exists(os.path.join(self.root, "dangling")))
+        self.assertFalse(Metadata.Exists(os.path.join(self.root, "missing")))
+
+        print("A_EXISTS")
+
+    def test_AB_size(self) -> None:
+        sizes = Metadata.Sizes([os.path.join(self.root, name) for name in ("a.bin", "b.bin", "it's c.bin", "missing")])
+        self.assertEqual(sizes, [0, 4096, 7, -1])
+
+        print("B_SIZE")
+
+    def test_AC_listing(self) -> None:
+        """
+        Files() only lists regular files (no dirs, no symlinks), Dirs() only sub dirs
+        """
+        files = sorted(os.path.basename(path) for path in Metadata.Files(self.root))
+        self.assertEqual(files, ["a.bin", "b.bin", "it's c.bin"])
+        self.assertEqual(Metadata.Dirs(self.root), [os.path.join(self.root, "sub")])
+        self.assertEqual(Metadata.Files(os.path.join(self.root, "missing")), [])
+
+        print("C_LISTING")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import hashlib
+import unittest
+from time import time
+
+# Module imports
+from backend.Command import Command
+from backend.Pipeline import Pipeline
+
+
+class UT_Pipeline(unittest.TestCase):
+
+    AA_SRC: list = ["head", "-c", "33554432", "/dev/zero"]
+    AA_DST: list = ["sha256sum"]
+    AB_FAIL: list = ["false"]
+    AB_CAT: list = ["cat"]
+    AC_ENDLESS: list = ["yes"]
+    AC_SLEEP: list = ["sleep", "10"]
+
+    """_summary_
+    Depdencies:
+    - your favorite flavour of LINUX
+    - coreutils
+    """
+
+    def test_AA_stream(self) -> None:
+        """
+        32MiB of zeros are streamed through a kernel pipe into sha256sum
+            - the digest must match, so no byte got lost
+            - both stages report exitCode 0 and their own /proc I/O stats
+        """
+
+        p: Pipeline = Pipeline([Command(self.AA_SRC), Command(self.AA_DST)])
+        p.wait()
+
+        try:
+            self.assertEqual(p.running, False)
+            self.assertEqual(p.exitCodes, [0, 0])
+            self.assertEqual(p.exitCode, 0)
+            self.assertEqual(p.commands[0].stdout, [])  # went into the pipe, not into python
+            self.assertEqual(p.commands[1].stdout[0].split()[0], hashlib.sha256(bytes(33554432)).hexdigest())
+            self.assertEqual(len(p._asdict()["stages"]), 2)
+        except AssertionError:
+            print(p)
+            raise
+
+        print(".A_STREAM")
+
+    def test_AB_exitCodes(self) -> None:
+        """
+        Per-stage exit codes, the pipeline fails like with `set -o pipefail`
+        """
+
+        p: Pipeline = Pipeline([Command(self.AB_FAIL), Command(self.AB_CAT)])
+        p.wait()
+
+        try:
+            self.assertEqual(p.exitCodes, [1, 0])
+            self.assertEqual(p.exitCode, 1)
+        except AssertionError:
+            print(p)
+            raise
+
+        print("B_EXITCODES")
+
+    def test_AC_kill(self) -> None:
+        """
+        wait(timeout) kills the whole chain, kill() never starts a stage that did not run
+        """
+
+        p: Pipeline = Pipeline([Command(self.AC_ENDLESS), Command(self.AC_SLEEP)])
+        idle: Pipeline = Pipeline([Command(self.AC_ENDLESS), Command(self.AC_SLEEP)])
+        idle.kill()
+
+        beg_time = time()
+        p.wait(1)
+        end_time = time()
+
+        try:
+            self.assertLess((end_time - beg_time), 1.5)
+            self.assertEqual(p.running, False)
+            self.assertEqual(p.status_msg, ["Timeout reached, pipeline killed"])
+            self.assertNotEqual(p.exitCode, 0)
+            for c in p.commands:
+                self.assertEqual(c.closed, True)
+            self.assertEqual([c.process for c in idle.commands], [None, None])
+            self.assertEqual(idle.running, False)
+        except AssertionError:
+            print(p)
+            raise
+
+        print("C_KILL")
+
+if __name__ == '__main__':
+    unittest.main()
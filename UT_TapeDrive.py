@@ -0,0 +1,401 @@
+import hashlib
+import os
+import tempfile
+import time
+import unittest
+from typing import List
+
+# Module imports
+from backend.Checksum import ChecksumState, ChecksumType
+from backend.Command import Command
+from backend.File import File, FileState
+from backend.PageCache import E_Cache, PageCache
+from backend.TapeDrive import TapeDrive, TD_State
+
+
+class UT_TapeDrive(unittest.TestCase):
+
+    """_summary_
+    Depdencies:
+    - your favorite flavour of LINUX
+    - dd
+    - a writable temp dir, a plain file stands in for the tape (drive override)
+    """
+
+    SIZE: int = 5 * 1024 * 1024 + 4321    # not block aligned
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data: bytes = os.urandom(self.SIZE)
+        self.path: str = os.path.join(self.tmp.name, "it's data.bin")
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+        self.tape: str = os.path.join(self.tmp.name, "tape.img")
+        self.drive: TapeDrive = TapeDrive(self.tape, "", drive_override=True)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def _settle(self) -> None:
+        self.drive.command.wait()
+        self.drive._refresh()
+
+    def test_AA_teeWrite(self) -> None:
+        """
+        write() hashes the bytes on their way into dd, no checksum pass before
+        """
+        file: File = File(1, self.path, self.tmp.name)
+        self.drive.write(file)
+        file.wait()
+        self._settle()
+
+        try:
+            self.assertEqual(self.drive.state, TD_State.IDLE)
+            self.assertEqual(file.state, FileState.IDLE)
+            self.assertEqual(file.cksum.value, hashlib.sha256(self.data).hexdigest())
+            self.assertEqual(file.cksum.cmd.bytes, self.SIZE)
+            with open(self.tape, "rb") as f:
+                self.assertEqual(f.read(), self.data)
+        except AssertionError:
+            print(self.drive)
+            raise
+
+        print("A_TEE_WRITE")
+
+    def test_AB_teeRead(self) -> None:
+        """
+        read() validates the known checksum while writing the file, a corrupt tape ends in MISMATCH
+        """
+        with open(self.tape, "wb") as f:
+            f.write(self.data)
+
+        target: File = File(2, os.path.join(self.tmp.name, "restored.bin"), self.tmp.name, createFile=True)
+        target.cksum.value = hashlib.sha256(self.data).hexdigest()
+        self.drive.read(target)
+        target.wait()
+        self._settle()
+
+        try:
+            self.assertEqual(self.drive.state, TD_State.IDLE)
+            self.assertEqual(target.state, FileState.IDLE)
+            self.assertEqual(target.cksum.state, ChecksumState.IDLE)
+            self.assertEqual(target.cksum.cmd.bytes, self.SIZE)
+            self.assertEqual(self.drive.command._stdout.total, 0)    # the data bypassed the Reactor
+            with open(target.path.path, "rb") as f:
+                self.assertEqual(f.read(), self.data)
+
+            with open(self.tape, "r+b") as f:
+                f.seek(12345)
+                f.write(b"\0rot")
+            self.drive.read(target)
+            target.wait()
+            self._settle()
+            self.assertEqual(target.state, FileState.MISMATCH)
+        except AssertionError:
+            print(target)
+            raise
+
+        print("B_TEE_READ")
+
+    def test_AC_noChecksum(self) -> None:
+        """
+        ChecksumType.NONE keeps the plain dd path, nothing gets hashed
+        """
+        file: File = File(1, self.path, self.tmp.name)
+        file.cksum.setType(ChecksumType.NONE)
+        self.drive.write(file)
+        self._settle()
+
+        try:
+            self.assertEqual(self.drive.state, TD_State.IDLE)
+            self.assertEqual(file.cksum.cmd.didRun, False)
+            with open(self.tape, "rb") as f:
+                self.assertEqual(f.read(), self.data)
+        except AssertionError:
+            print(self.drive)
+            raise
+
+        print("C_NO_CHECKSUM")
+
+    def test_AD_readRange(self) -> None:
+        """
+        A damaged block of a restored file gets re-read from tape, nothing else
+        """
+        block: int = 256 * 1024
+        with open(self.tape, "wb") as f:
+            f.write(self.data)
+        file: File = File(1, self.path, self.tmp.name)
+        file.cksum.setManifest(self.drive.blocksize, 2)
+        file.createChecksum()
+        file.wait()
+
+        with open(self.path, "r+b") as f:
+            f.seek(7 * block)
+            f.write(b"rot")
+        file.validateIntegrity(file.cksum.value)
+        file.wait()
+
+        try:
+            self.assertEqual(file.cksum.bad_blocks, [3])
+            offset, length = file.cksum.badRange()
+            self.drive.readRange(file, offset, length)
+            self._settle()
+            self.assertEqual(self.drive.state, TD_State.IDLE)
+            self.assertIn("skip=6", self.drive.command.cmd)
+            self.assertIn("count=2", self.drive.command.cmd)
+            self.assertEqual(file.cksum.verifyBlocks(), [])
+            with open(self.path, "rb") as f:
+                self.assertEqual(f.read(), self.data)
+        except AssertionError:
+            print(self.drive)
+            raise
+
+        print("D_READ_RANGE")
+
+    def test_AE_verify(self) -> None:
+        """
+        TEST_READ hashes the tape content in memory against the known checksum, the File stays untouched
+        """
+        file: File = File(1, self.path, self.tmp.name)
+        file.cksum.setManifest(self.drive.blocksize, 1)
+        self.drive.write(file)
+        file.wait()
+        self._settle()
+        value: str = file.cksum.value
+
+        try:
+            self.drive.verify([file])
+            self.assertEqual(self.drive.state, TD_State.TEST_READ)
+            self.drive.verification.thread.join()
+            self._settle()
+            self.assertEqual(self.drive.state, TD_State.IDLE)
+            entry: dict = self.drive.verification.report[0]
+            self.assertEqual(entry["result"], "OK")
+            self.assertEqual(entry["bytes"], self.SIZE)
+            self.assertEqual(self.drive._asdict()["verification"]["summary"], {"OK": 1})
+
+            with open(self.tape, "r+b") as f:
+                f.seek(3 * 256 * 1024 + 1)
+                f.write(b"rot")
+            self.drive.verify([file])
+            self.drive.verification.thread.join()
+            self._settle()
+            entry = self.drive.verification.report[0]
+            self.assertEqual(entry["result"], "MISMATCH")
+            self.assertEqual(entry["bad_blocks"], [3])
+            self.assertEqual(file.cksum.value, value)
+            self.assertEqual(file.state, FileState.IDLE)
+
+            file.cksum.value = ""
+            self.drive.verify([file])
+            self.drive.verification.thread.join()
+            self._settle()
+            self.assertEqual(self.drive.verification.report[0]["result"], "UNVERIFIED")
+        except AssertionError:
+            print(self.drive)
+            raise
+
+        print("E_VERIFY")
+
+    def test_AF_direct(self) -> None:
+        """
+        O_DIRECT policy: the tee reads through aligned buffers, plain dd gets iflag/oflag=direct
+        """
+        PageCache.SetPolicy(E_Cache.DIRECT)
+        try:
+            file: File = File(1, self.path, self.tmp.name)
+            self.drive.write(file)
+            file.wait()
+            self._settle()
+            self.assertEqual(file.cksum.value, hashlib.sha256(self.data).hexdigest())
+            with open(self.tape, "rb") as f:
+                self.assertEqual(f.read(), self.data)
+
+            os.remove(self.tape)
+            file.cksum.setType(ChecksumType.NONE)
+            self.drive.write(file)
+            self._settle()
+            self.assertIn("iflag=fullblock,direct", self.drive.command.cmd)
+            self.assertEqual(self.drive.state, TD_State.IDLE)
+
+            target: File = File(2, os.path.join(self.tmp.name, "restored.bin"), self.tmp.name, createFile=True)
+            target.cksum.setType(ChecksumType.NONE)
+            self.drive.read(target)
+            self._settle()
+            self.assertIn("oflag=direct", self.drive.command.cmd)
+            with open(target.path.path, "rb") as f:
+                self.assertEqual(f.read(), self.data)
+        except AssertionError:
+            print(self.drive)
+            raise
+        finally:
+            PageCache.SetPolicy(E_Cache.DEFAULT)
+
+        print("F_DIRECT")
+
+    def test_AG_inlineEncryption(self) -> None:
+        """
+        openssl | dd on write, dd | openssl -d on read and verify: ciphertext on tape,
+        plaintext checksum, no .crypt file anywhere
+        """
+        file: File = File(1, self.path, self.tmp.name)
+        file.encryption_scheme.inline = True
+        self.drive.write(file)
+        file.wait()
+        self._settle()
+
+        try:
+            self.assertEqual(self.drive.state, TD_State.IDLE)
+            self.assertEqual(file.cksum.value, hashlib.sha256(self.data).hexdigest())
+            self.assertEqual(sorted(os.listdir(self.tmp.name)), sorted([os.path.basename(self.path), "tape.img"]))
+            with open(self.tape, "rb") as f:
+                self.assertNotEqual(f.read(len(self.data)), self.data)
+
+            target: File = File(2, os.path.join(self.tmp.name, "restored.bin"), self.tmp.name, createFile=True)
+            target.encryption_scheme = file.encryption_scheme
+            target.cksum.value = file.cksum.value
+            self.drive.read(target)
+            target.wait()
+            self._settle()
+            self.assertEqual(target.state, FileState.IDLE)
+            with open(target.path.path, "rb") as f:
+                self.assertEqual(f.read(), self.data)
+
+            self.drive.verify([file])
+            self.drive.verification.thread.join()
+            self._settle()
+            self.assertEqual(self.drive.verification.report[0]["result"], "OK")
+
+            os.remove(target.path.path)
+            target = File(3, os.path.join(self.tmp.name, "plain.bin"), self.tmp.name, createFile=True)
+            target.encryption_scheme = file.encryption_scheme
+            target.cksum.setType(ChecksumType.NONE)
+            self.drive.read(target)
+            self._settle()
+            self.assertEqual(self.drive.state, TD_State.IDLE)
+            with open(target.path.path, "rb") as f:
+                self.assertEqual(f.read(), self.data)
+            with self.assertRaises(ValueError):
+                self.drive.readRange(target, 0, 1)
+        except AssertionError:
+            print(self.drive)
+            raise
+
+        print("G_INLINE_ENCRYPTION")
+
+    def test_AH_verifyNoLeak(self) -> None:
+        """
+        A long TEST_READ pass cleans up every per-file dd, no pidfd stays open
+        """
+        def pidfds() -> int:
+            fds: List[str] = os.listdir("/proc/self/fd")
+            return sum(1 for fd in fds if "pidfd" in os.path.realpath("/proc/self/fd/" + fd))
+
+        file: File = File(1, self.path, self.tmp.name)
+        self.drive.write(file)
+        file.wait()
+        self._settle()
+        skipped: File = File(2, self.path, self.tmp.name)
+        skipped.cksum.setType(ChecksumType.NONE)
+        before: int = pidfds()
+
+        try:
+            self.drive.verify([file] * 20 + [skipped] * 5)
+            self.drive.verification.thread.join()
+            self._settle()
+            self.assertEqual(self.drive.state, TD_State.IDLE)
+            self.assertEqual(self.drive.verification._asdict()["summary"], {"OK": 20, "SKIPPED": 5})
+            deadline: float = time.monotonic() + 2    # the Reactor closes its dup after the exit callback
+            while pidfds() > before and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertLessEqual(pidfds(), before)
+        except AssertionError:
+            print(self.drive)
+            raise
+
+        print("H_VERIFY_NO_LEAK")
+
+    def test_AI_failingProbe(self) -> None:
+        """
+        A probe (inquiry / mode sense) exiting non-zero leaves the drive in ERROR, also on later refreshes
+        """
+        class FailingProbe(TapeDrive):
+            readModeSenseCommand: Command = Command(["false"])
+
+        drive: TapeDrive = FailingProbe(self.tape, os.path.join(self.tmp.name, "sg0"))
+        try:
+            self.assertEqual(drive.state, TD_State.ERROR)
+            drive._refresh()
+            self.assertEqual(drive.state, TD_State.ERROR)
+        except AssertionError:
+            print(drive)
+            raise
+
+        print("I_FAILING_PROBE")
+
+    def test_AJ_inlinePageCache(self) -> None:
+        """
+        Inline encryption without checksum follows the cache policy: dd | openssl | dd and back
+        """
+        file: File = File(1, self.path, self.tmp.name)
+        file.encryption_scheme.inline = True
+        file.cksum.setType(ChecksumType.NONE)
+        PageCache.SetPolicy(E_Cache.DROP)
+        try:
+            self.drive.write(file)
+            self._settle()
+            self.assertEqual(self.drive.state, TD_State.IDLE)
+            self.assertEqual([stage.cmd[0] for stage in self.drive.command.commands], ["dd", "openssl", "dd"])
+            self.assertIn("iflag=nocache", self.drive.command.commands[0].cmd)
+
+            target: File = File(2, os.path.join(self.tmp.name, "restored.bin"), self.tmp.name, createFile=True)
+            target.encryption_scheme = file.encryption_scheme
+            target.cksum.setType(ChecksumType.NONE)
+            self.drive.read(target)
+            self._settle()
+            self.assertEqual(self.drive.state, TD_State.IDLE)
+            self.assertIn("oflag=nocache", self.drive.command.commands[-1].cmd)
+            with open(target.path.path, "rb") as f:
+                self.assertEqual(f.read(), self.data)
+        except AssertionError:
+            print(self.drive)
+            raise
+        finally:
+            PageCache.SetPolicy(E_Cache.DEFAULT)
+
+        print("J_INLINE_PAGE_CACHE")
+
+    def test_AK_inlineEncryptOnce(self) -> None:
+        """
+        File.encrypt() leaves an inline File alone, the tape path encrypts it exactly once
+        """
+        file: File = File(1, self.path, self.tmp.name, inlineEncryption=True)
+        file.encrypt()
+        file.wait()
+        try:
+            self.assertEqual(file.state, FileState.IDLE)
+            self.assertEqual(file.path.path, self.path)
+            self.assertEqual(sorted(os.listdir(self.tmp.name)), [os.path.basename(self.path)])
+
+            self.drive.write(file)
+            file.wait()
+            self._settle()
+            target: File = File(2, os.path.join(self.tmp.name, "restored.bin"), self.tmp.name,
+                                createFile=True, inlineEncryption=True)
+            target.encryption_scheme = file.encryption_scheme
+            target.cksum.value = file.cksum.value
+            self.drive.read(target)
+            target.wait()
+            self._settle()
+            target.decrypt()
+            self.assertEqual(target.state, FileState.IDLE)
+            with open(target.path.path, "rb") as f:
+                self.assertEqual(f.read(), self.data)
+        except AssertionError:
+            print(self.drive)
+            raise
+
+        print("K_INLINE_ENCRYPT_ONCE")
+
+if __name__ == '__main__':
+    unittest.main()
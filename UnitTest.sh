@@ -4,14 +4,26 @@
 echo Command
 python3 UT_Command.py
 
+echo Pipeline
+python3 UT_Pipeline.py
+
+echo Metadata
+python3 UT_Metadata.py
+
 echo File
 python3 UT_File.py
 
+echo HashEngine
+python3 UT_HashEngine.py
+
 echo Checksum
 python3 UT_Checksum.py
 
 echo Encryption
 python3 UT_Encryption.py
 
+echo TapeDrive
+python3 UT_TapeDrive.py
+
 echo Tape
 python3 UT_Tape.py
@@ -1,7 +1,12 @@
 import json
+import os
+import random
 
 from enum import Enum
-from backend.Command import Command
+from typing import Dict, List, Tuple
+from backend.ChecksumCache import ChecksumCache
+from backend.HashEngine import HashEngine, HashJob, HashStream
+from backend.Tape import Tape
 
 class ChecksumState(Enum):
     CREATE = 1,     # when a new checksum shall be calculated
@@ -14,6 +19,11 @@ class ChecksumType(Enum):
     MD5 = 1
     SHA256 = 2
     SHA512 = 3 # TODO Unit_Test!
+    BLAKE2B = 4     # faster than SHA256 on CPUs without SHA extensions
+    CRC32 = 5       # zlib, corruption check only
+    CRC32C = 6      # optional: python module 'crc32c'
+    XXH64 = 7       # optional: python module 'xxhash'
+    XXH3_128 = 8    # optional: python module 'xxhash'
     NONE = 99
 
 class Checksum:
@@ -21,7 +31,8 @@ class Checksum:
     """
     #### === CHECKSUM =========================================================
 
-    Checksum.__init__(file_path: str, type: ChecksumType = ChecksumType.SHA256, value: str = "", target_value: str = ""):
+    Checksum.__init__(file_path: str, type: ChecksumType = ChecksumType.SHA256, value: str = "", target_value: str = "",
+                      extra_types: List[ChecksumType] = None):
     - Requires
         - file_path like "./foo/bar/baz/mreow.txt" OR "/opt/env/secret.txt"
     - Accepts:
@@ -29,43 +40,228 @@ class Checksum:
             - ChecksumType.SHA256
             - ChecksumType.SHA512
             - ChecksumType.MD5
+            - ChecksumType.BLAKE2B
+            - ChecksumType.CRC32, CRC32C, XXH64, XXH3_128 (fast, detect corruption only)
             - ChecksumType.NONE
+          `ChecksumType.name` is stored in the TOC, `ChecksumType[name]` restores it.
+          CRC32C / XXH64 / XXH3_128 need optional modules, see `HashEngine.Available()`
         - value: UNSAFE predefine value (useful to restore a known checksum)
         - target_value: Target value (needed for file validation)
+        - extra_types: Additional algorithms, e.g. MD5 for a legacy catalog next to SHA256.
+          Computed in the same read pass (CPU only, no extra disk or tape I/O),
+          results in `self.extra_values` {"MD5": "..."}
+
+    Hashing runs in-process on the shared `backend.HashEngine` thread pool, `self.cmd`
+    is the HashJob of the last run (same life cycle as a Command: reset/start/wait/status).
+
+    `create()` answers from the `backend.ChecksumCache` (if enabled) when the file (device, inode,
+    size, mtime) is unchanged since it was last hashed, `create(force=True)` re-hashes.
+    `validate()` always reads the file, silent corruption does not change mtime.
+
+    `stream()` hashes bytes that stream through Python anyway (tape write / read) instead
+    of reading the file: the digest is created, or validated when `self.value` is known.
+
+    `setTreeChunk()` switches to the tree hash of `HashJob` (parallel leaves, one root),
+    meant for single very large files. `self.value` is the root, `self.leaves` go into the
+    TOC. A validation with known leaves lists the damaged ones in `self.bad_leaves`
+    (leaf i covers bytes [i * tree_chunk, (i + 1) * tree_chunk)). Tree results bypass the cache.
+
+    `setManifest()` records a block manifest next to the digest: one CRC32 per `blocks`
+    tape blocks, aligned to `Tape.blocksize`. A validation lists the damaged entries in
+    `self.bad_blocks`, `badRange()` is the byte span to re-read from tape
+    (`TapeDrive.readRange()`), `verifyBlocks()` re-checks only those entries afterwards.
+    An interrupted restore shows up as missing trailing entries and resumes the same way.
+    `quickVerify()` spot-checks a random sample of entries, minutes instead of a full read.
+
+    `_asdict()["progress"]` reports the running hash: bytes, total, rate and avg_rate (bytes/sec.),
+    eta and elapsed (sec.), eta -1 while unknown. Schedulers read `self.cmd.progress` directly.
 
     #### --- EXCEPTIONS -------------------------------------------------------
 
     **SystemError**:  
     Checksum validation. Raises a SystemError when target checksum value is empty.
+
+    **ValueError**:  
+    `setType()` / `setExtraTypes()` with a type this host cannot compute (optional module missing).
     """
 
-    def __init__(self, file_path: str, type: ChecksumType = ChecksumType.SHA256, value: str = "", target_value: str = ""): # BUG If init with sha256 cant change to md5
+    MANIFEST_BLOCKS: int = 256  # tape blocks per manifest entry, 256 * 256K = 64MiB
+
+    # quickVerify(): sampled manifest entries, the confidence level of the damage bound
+    # and the damage share (of all entries) the detection probability refers to
+    QUICK_SAMPLES: int = 64
+    QUICK_CONFIDENCE: float = 0.95
+    QUICK_DAMAGE: float = 0.01
+
+    def __init__(self, file_path: str, type: ChecksumType = ChecksumType.SHA256, value: str = "", target_value: str = "",
+                 extra_types: List[ChecksumType] | None = None): # BUG If init with sha256 cant change to md5
         self.file_path: str = file_path
         self.value: str = value
         self.validation_target: str = target_value
+        self.extra_types: List[ChecksumType] = []
+        self.extra_values: Dict[str, str] = {}
+        self.extra_targets: Dict[str, str] = {}
+        self.tree_chunk: int = 0
+        self.leaves: List[str] = []
+        self.target_leaves: List[str] = []
+        self.bad_leaves: List[int] = []
+        self.manifest_block: int = 0
+        self.manifest_algorithm: str = "crc32"
+        self.manifest: List[str] = []
+        self.target_manifest: List[str] = []
+        self.bad_blocks: List[int] = []
+        self.quick: dict = {}   # report of the last quickVerify()
 
         # Set type and finish init.
         self.setType(type)
+        self.setExtraTypes(extra_types if extra_types is not None else [])   # drops the primary type
         self.state : ChecksumState = ChecksumState.IDLE
 
     # --- PUBLIC FUNCTIONS ----------------------------------------------------
 
     def setType(self, target_type: ChecksumType) -> None:
+        Checksum._require(target_type)
         self.type = target_type
         if not hasattr(self, "cmd"):
-            self.cmd: Command = Command("openssl " + self.type.name.lower() + " -r '" + self.file_path + "'")
+            self.cmd: HashJob = HashJob(self.file_path, self.type.name.lower())
             return
 
-    def create(self):
+    def setExtraTypes(self, extra_types: List[ChecksumType]) -> None:
+        # NONE and the primary type carry no extra information
+        for t in extra_types:
+            Checksum._require(t)
+        self.extra_types = [t for t in dict.fromkeys(extra_types) if t is not ChecksumType.NONE and t is not self.type]
+
+    def copy(self, file_path: str = "") -> "Checksum":
+        # Same configuration and known values (digest, extras, leaves, manifest), fresh state.
+        # Verifies the same content elsewhere (e.g. on tape) without touching this object.
+        c: Checksum = Checksum(file_path or self.file_path, self.type, self.value, extra_types=self.extra_types)
+        c.extra_values = dict(self.extra_values)
+        c.tree_chunk, c.leaves = self.tree_chunk, list(self.leaves)
+        c.manifest_block, c.manifest_algorithm, c.manifest = self.manifest_block, self.manifest_algorithm, list(self.manifest)
+        return c
+
+    def setTreeChunk(self, chunk: int) -> None:
+        # 0 disables the tree mode, e.g. HashEngine.TREE_CHUNK enables it
+        if chunk != self.tree_chunk:
+            self.leaves = []
+        self.tree_chunk = max(chunk, 0)
+
+    def setManifest(self, blocksize: str = "256K", blocks: int = MANIFEST_BLOCKS) -> None:
+        # blocks=0 disables the manifest, e.g. setManifest(tape.blocksize, 256) -> one entry per 64MiB
+        block: int = Tape.Bytes(blocksize) * max(blocks, 0)
+        if block != self.manifest_block:
+            self.manifest = []
+        self.manifest_block = block
+
+    def badRange(self) -> Tuple[int, int]:
+        # (offset, length) in bytes covering all bad blocks, (0, 0) if there are none
+        if not self.bad_blocks:
+            return (0, 0)
+        offset: int = min(self.bad_blocks) * self.manifest_block
+        return (offset, (max(self.bad_blocks) + 1) * self.manifest_block - offset)
+
+    def verifyBlocks(self, blocks: List[int] | None = None) -> List[int]:
+        """
+        Re-hashes only the given manifest entries (default: `self.bad_blocks`) of the
+        file on disk, e.g. after `TapeDrive.readRange()`. Blocks, returns and stores
+        the entries that still differ. The full digest is NOT re-checked, run
+        `validate()` once all blocks are fine.
+        """
+        target: List[str] = self.target_manifest or self.manifest
+        blocks = list(self.bad_blocks if blocks is None else blocks)
+        if self.manifest_block <= 0 or not target:
+            raise SystemError("[ERROR] Checksum: no block manifest to verify against!")
+
+        jobs: List[HashJob] = []
+        for block in blocks:
+            job: HashJob = HashJob(self.file_path, self.manifest_algorithm, self.manifest_block)
+            job.offset, job.length = block * self.manifest_block, self.manifest_block
+            jobs.append(job)
+        HashEngine.SubmitBatch(jobs)
+        for job in jobs:
+            job.wait()
+
+        self.bad_blocks = [block for block, job in zip(blocks, jobs)
+                           if block >= len(target) or job.exitCode != 0 or job.digest != target[block]]
+        return self.bad_blocks
+
+    def quickVerify(self, samples: int = QUICK_SAMPLES, escalate: bool = False, seed: int | None = None) -> dict:
+        """
+        Spot-checks a restored file: re-hashes `samples` random manifest entries (plus the
+        entry count against the file size) instead of the whole file. Blocks, returns and
+        stores the report in `self.quick`. Damaged entries land in `self.bad_blocks` as with
+        `verifyBlocks()`. `escalate=True` starts a full `validate()` against `self.value`
+        on any mismatch, `wait()` for it.
+
+        | Report       | Description                                                               |
+        |--------------|---------------------------------------------------------------------------|
+        | `result`     | "OK" or "MISMATCH"                                                        |
+        | `blocks`     | Manifest entries of the file                                              |
+        | `sampled`    | Entries re-hashed                                                         |
+        | `detection`  | Probability a damage of `QUICK_DAMAGE` of all entries would have been hit |
+        | `max_damage` | With `QUICK_CONFIDENCE`, at most this share of entries is damaged         |
+        """
+        target: List[str] = self.target_manifest or self.manifest
+        size: int = os.stat(self.file_path).st_size if os.path.exists(self.file_path) else -1
+        # An empty file has an empty manifest: nothing to sample, trivially OK
+        if self.manifest_block <= 0 or not (target or size == 0):
+            raise SystemError("[ERROR] Checksum: no block manifest to verify against!")
+
+        total: int = len(target)
+        present: int = -(-size // self.manifest_block) if size > 0 else 0
+        n: int = min(max(samples, 0), total)
+        # Sorted: the disk sees one forward sweep instead of random seeks
+        sample: List[int] = sorted(random.Random(seed).sample(range(total), n))
+
+        # A short (interrupted) restore fails without reading, that is the common case
+        if present != total:
+            bad: List[int] = list(range(present, total)) or [total - 1]    # or grown beyond the last entry
+        else:
+            bad = self.verifyBlocks(sample) if sample else []
+        self.bad_blocks = bad
+        read: int = n if present == total else 0    # entries actually re-hashed, the odds only count those
+
+        damaged: int = max(round(self.QUICK_DAMAGE * total), 1)
+        self.quick = {
+            "result": "MISMATCH" if bad else "OK",
+            "blocks": total,
+            "sampled": read,
+            "bad_blocks": bad,
+            "detection": round(1 - Checksum._miss(total, damaged, read), 4),
+            "damage": self.QUICK_DAMAGE,
+            "max_damage": round(Checksum._bound(total, read, self.QUICK_CONFIDENCE) / total, 4) if total else 0.0,
+            "confidence": self.QUICK_CONFIDENCE,
+            "escalated": False
+        }
+
+        if bad:
+            self.state = ChecksumState.MISMATCH
+            if escalate and self.value:
+                self.validate(self.value)
+                self.quick["escalated"] = True
+        return self.quick
+
+    def create(self, start: bool = True, force: bool = False):
+        # start=False only prepares self.cmd, a ChecksumBatch submits it
         if self.state not in {ChecksumState.IDLE, ChecksumState.MISMATCH} or self.type is ChecksumType.NONE:
             return
 
         self.state = ChecksumState.CREATE
-        self.cmd.reset()
-        self.cmd.cmd = "openssl " + self.type.name.lower() + " -r '" + self.file_path + "'"
-        self.cmd.start()
+        self._configure()
+        self.cmd.cache = self.tree_chunk == 0 and self.manifest_block == 0
 
-    def validate(self, target: str) -> None:
+        if not force and self.cmd.cache:
+            cached = ChecksumCache.Lookup(self.file_path, self.cmd.algorithms())
+            if cached is not None:
+                self.cmd.fromDigests(cached)
+                self._status()
+                return
+
+        if start:
+            self.cmd.start()
+
+    def validate(self, target: str, start: bool = True, extra_targets: Dict[str, str] | None = None) -> None:
         if self.state not in {ChecksumState.IDLE, ChecksumState.MISMATCH}:
             return
 
@@ -73,15 +269,73 @@ class Checksum:
             raise SystemError("[ERROR] Checksum validation: Target checksum empty!")
 
         self.validation_target = target
-        self.create()
+        self.extra_targets = extra_targets if extra_targets is not None else {}
+        self.target_leaves = list(self.leaves)   # known leaves (e.g. from the TOC) locate damage
+        self.target_manifest = list(self.manifest)
+        self.create(start, force=True)
 
         self.state = ChecksumState.VALIDATE
         self._status()
 
+    def stream(self) -> HashStream | None:
+        # None when there is nothing to hash (ChecksumType.NONE or busy)
+        if self.state not in {ChecksumState.IDLE, ChecksumState.MISMATCH} or self.type is ChecksumType.NONE:
+            return None
+
+        if self.value:
+            # Known value (e.g. restored from the TOC): the streamed bytes must match it
+            self.validation_target = self.value
+            self.extra_targets = dict(self.extra_values)
+            self.target_leaves = list(self.leaves)
+            self.target_manifest = list(self.manifest)
+            self.state = ChecksumState.VALIDATE
+        else:
+            self.state = ChecksumState.CREATE
+
+        self._configure()
+        return HashStream(self.cmd)
+
     def wait(self) -> None:
         self.cmd.wait()
         self._status()
 
+    @staticmethod
+    def _miss(total: int, damaged: int, sampled: int) -> float:
+        # Hypergeometric: probability that `sampled` entries drawn without replacement are all clean
+        p: float = 1.0
+        for i in range(sampled):
+            if total - damaged - i <= 0:
+                return 0.0
+            p *= (total - damaged - i) / (total - i)
+        return p
+
+    @staticmethod
+    def _bound(total: int, sampled: int, confidence: float) -> int:
+        # Largest count of damaged entries a clean sample still leaves plausible (miss prob. > 1 - confidence)
+        low, high = 0, total
+        while low < high:   # _miss() falls with the damage, binary search
+            mid: int = (low + high + 1) // 2
+            if Checksum._miss(total, mid, sampled) > 1 - confidence:
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    @staticmethod
+    def _require(t: ChecksumType) -> None:
+        if t is not ChecksumType.NONE and not HashEngine.Available(t.name.lower()):
+            raise ValueError("[ERROR] Checksum type " + t.name + " not available on this host")
+
+    def _configure(self) -> None:
+        self.cmd.reset()
+        self.cmd.path = self.file_path
+        self.cmd.algorithm = self.type.name.lower()
+        self.cmd.extra = [t.name.lower() for t in self.extra_types if t is not self.type]
+        self.cmd.treeChunk = self.tree_chunk
+        self.cmd.manifestBlock = self.manifest_block
+        self.cmd.manifestAlgorithm = self.manifest_algorithm
+        self.cmd.cache = False
+
     def _status(self) -> None:
         self.cmd.status()   # refresh current state
 
@@ -91,7 +345,7 @@ class Checksum:
         if not self.cmd.didRun:
             return      # abort if we never started
 
-        if self.cmd.exitCode != 0 or len(self.cmd.stdout) == 0:  # Annoy user if error occured, be eff. write-protect
+        if self.cmd.exitCode != 0 or len(self.cmd.digest) == 0:  # Annoy user if error occured, be eff. write-protect
             self.state = ChecksumState.ERROR
             return
 
@@ -104,17 +358,42 @@ class Checksum:
                 self._fin_validate()
 
     def _fin_create(self) -> None:
-        self.value = self.cmd.stdout[0].split()[0]
+        self.value = self.cmd.digest
+        self.leaves = list(self.cmd.leaves)
+        self.manifest = list(self.cmd.manifest)
+        self._fin_extra()
         self.state = ChecksumState.IDLE
 
     def _fin_validate(self) -> None:
-        self.value = self.cmd.stdout[0].split()[0]
+        self.value = self.cmd.digest
+        self.leaves = list(self.cmd.leaves)
+        self.manifest = list(self.cmd.manifest)
+        self._fin_extra()
 
-        if self.value != self.validation_target:
+        # Leaves / blocks that differ from the known ones locate the damage
+        self.bad_leaves = Checksum._diff(self.leaves, self.target_leaves)
+        self.bad_blocks = Checksum._diff(self.manifest, self.target_manifest)
+
+        # Every known extra value must match as well, e.g. the MD5 of a legacy catalog
+        extraMismatch: bool = any(self.extra_values.get(name) != value for name, value in self.extra_targets.items())
+
+        if self.value != self.validation_target or extraMismatch:
             self.state = ChecksumState.MISMATCH
         else:
             self.state = ChecksumState.IDLE
 
+    @staticmethod
+    def _diff(current: List[str], target: List[str]) -> List[int]:
+        # Differing indices, a missing or surplus entry counts as well. No target: nothing known
+        if not target:
+            return []
+        return [n for n in range(max(len(current), len(target)))
+                if n >= len(current) or n >= len(target) or current[n] != target[n]]
+
+    def _fin_extra(self) -> None:
+        self.extra_values = {t.name: self.cmd.digests[t.name.lower()] for t in self.extra_types
+                             if t.name.lower() in self.cmd.digests}
+
     def _asdict(self) -> dict:
         self._status()
         data = {
@@ -122,11 +401,32 @@ class Checksum:
             "state" : self.state.name,
             "path": self.file_path,
             "value" : self.value,
+            "progress": dict(self.cmd.progress._asdict(self.cmd.total()), total=self.cmd.total())
         }
 
         if len(self.validation_target) != 0: # add target value if necessary
             data.update({"target_value": self.validation_target}) 
 
+        if self.tree_chunk: # add the tree, the leaves are needed to locate damage later
+            tree: dict = {"chunk": self.tree_chunk, "leaves": self.leaves}
+            if self.bad_leaves:
+                tree.update({"bad_leaves": self.bad_leaves})
+            data.update({"tree": tree})
+
+        if self.manifest_block: # add the block manifest, partial verify / re-read needs it
+            manifest: dict = {"block": self.manifest_block, "algorithm": self.manifest_algorithm, "entries": self.manifest}
+            if self.bad_blocks:
+                manifest.update({"bad_blocks": self.bad_blocks})
+            data.update({"manifest": manifest})
+
+        if self.quick: # add the spot check report
+            data.update({"quick_verify": self.quick})
+
+        if self.extra_types: # add additional digests if configured
+            data.update({"extra_values": self.extra_values})
+            if self.extra_targets:
+                data.update({"extra_targets": self.extra_targets})
+
         data.update({"command": self.cmd._asdict()}) # type: ignore
         return data
 
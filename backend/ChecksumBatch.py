@@ -0,0 +1,133 @@
+import json
+from typing import List
+
+from backend.Checksum import ChecksumState
+from backend.File import File, FileState
+from backend.HashEngine import HashEngine
+
+class ChecksumBatch:
+
+    """
+    #### === CHECKSUMBATCH ====================================================
+
+    ChecksumBatch.__init__(files: List[File], targets: List[str] = None, force: bool = False):
+    - Requires
+        - The Files to hash, every one uses its own `File.cksum` (type, path)
+    - Accepts
+        - targets: known-good values, one per File -> validates instead of creates
+        - force: ignore the ChecksumCache and hash every File
+
+    Hashes a whole list of Files on the HashEngine pool in one go. Small files are
+    packed into shared worker tasks (`HashEngine.SubmitBatch()`), so a tree of
+    500k small files is not dominated by per-file overhead.
+    Results land in each `File.cksum` as usual. Errors are isolated per File:
+    one unreadable file ends in FileState.ERROR, all others finish normally.
+
+    | `ChecksumBatch.`          | Description                                              |
+    |---------------------------|----------------------------------------------------------|
+    | `ChecksumBatch.start()`   | Prepares every File and submits all jobs at once         |
+    | `ChecksumBatch.wait()`    | Blocks until every File is finished                      |
+    | `ChecksumBatch.drain()`   | Returns (and forgets) all Files finished since last call |
+    | `ChecksumBatch.status()`  | Refreshes all pending Files                              |
+    | `ChecksumBatch.nextReady()` | Sec. until the next pending File is hashed, -1 unknown |
+    | `ChecksumBatch.eta()`     | Sec. until all Files are hashed, -1 unknown              |
+
+    | Var             | Type         | Description                                   |
+    |-----------------|--------------|-----------------------------------------------|
+    | `self.pending`  | `List[File]` | Still hashing                                 |
+    | `self.finished` | `List[File]` | Done (IDLE, MISMATCH or ERROR), not drained   |
+    | `self.failed`   | `int`        | Files that ended in MISMATCH or ERROR         |
+    """
+
+    def __init__(self, files: List[File], targets: List[str] | None = None, force: bool = False) -> None:
+        if targets is not None and len(targets) != len(files):
+            raise ValueError("ERROR: ChecksumBatch needs one target per file")
+        self.files: List[File] = files
+        self.targets: List[str] | None = targets
+        self.force: bool = force
+        self.pending: List[File] = []
+        self.finished: List[File] = []
+        self.failed: int = 0
+        self.didRun: bool = False
+
+    def start(self) -> None:
+        if self.didRun:
+            return
+        self.didRun = True
+
+        for n, file in enumerate(self.files):
+            if self.targets is None:
+                file.createChecksum(start=False, force=self.force)
+            else:
+                file.validateIntegrity(self.targets[n], start=False)
+
+        # ChecksumType.NONE, cached or busy Files have nothing to hash, status() settles them
+        self.pending = list(self.files)
+        HashEngine.SubmitBatch(file.cksum.cmd for file in self.files
+                               if file.cksum.state in {ChecksumState.CREATE, ChecksumState.VALIDATE}
+                               and not file.cksum.cmd.didRun)
+        self.status()
+
+    def wait(self) -> None:
+        if not self.didRun:
+            self.start()
+        for file in self.pending:
+            if file.cksum.cmd.didRun:
+                file.cksum.cmd.wait()
+        self.status()
+
+    def drain(self) -> List[File]:
+        self.status()
+        drained, self.finished = self.finished, []
+        return drained
+
+    def status(self) -> None:
+        running: List[File] = []
+        for file in self.pending:
+            file.refresh()
+            if file.state in {FileState.CKSUM_CALC, FileState.VALIDATING}:
+                running.append(file)
+                continue
+            if file.state in {FileState.MISMATCH, FileState.ERROR}:
+                self.failed += 1
+            self.finished.append(file)
+        self.pending = running
+
+    def nextReady(self) -> float:
+        # Lets the WriteScheduler tell a slow hash from a stall, the drive waits meanwhile
+        self.status()
+        etas: List[float] = [file.cksum.cmd.progress.eta(file.cksum.cmd.total()) for file in self.pending]
+        known: List[float] = [eta for eta in etas if eta >= 0]
+        return min(known) if known else -1
+
+    def rate(self) -> float:
+        # The workers share the disk, the sum of all current rates is what the batch gets
+        return sum(file.cksum.cmd.progress.rate() for file in self.pending)
+
+    def eta(self) -> float:
+        self.status()
+        rate: float = self.rate()
+        if not self.didRun:
+            return -1
+        if not self.pending:
+            return 0
+        if rate <= 0 or any(file.cksum.cmd.total() < 0 for file in self.pending):
+            return -1
+        return sum(max(file.cksum.cmd.total() - file.cksum.cmd.bytes, 0) for file in self.pending) / rate
+
+    def _asdict(self) -> dict:
+        eta: float = self.eta()
+        return {
+            "did_ran": self.didRun,
+            "files": len(self.files),
+            "pending": len(self.pending),
+            "finished": len(self.finished),
+            "failed": self.failed,
+            "bytes": sum(file.cksum.cmd.bytes for file in self.files),
+            "rate": round(self.rate()),
+            "eta": round(eta, 1),
+            "next_ready": round(self.nextReady(), 1)
+        }
+
+    def __str__(self) -> str:
+        return json.dumps(self._asdict(), indent=2)
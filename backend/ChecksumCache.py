@@ -0,0 +1,189 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List
+
+class ChecksumCache:
+
+    """
+    #### === CHECKSUMCACHE ====================================================
+
+    Persistent SQLite cache of file digests, keyed by
+    `(device, inode, size, mtime_ns, algorithm)`. A weekly full backup of a
+    mostly static archive only hashes what changed since the last run.
+
+    The HashEngine stores a digest only if `fstat()` of the open file is the same
+    before and after hashing, a file modified meanwhile is never cached.
+    `Checksum.create()` consults the cache, `force=True` re-hashes anyway.
+    `Checksum.validate()` always reads the file: bit rot does not touch mtime.
+
+    Off by default (`PATH = ""`): a match on (device, inode, size, mtime) is trusted
+    without reading the file, so the operator opts in, e.g. via `Host.setChecksumCache()`
+    with `DEFAULT_PATH`.
+
+    | `ChecksumCache.`          | Description                                                   |
+    |---------------------------|---------------------------------------------------------------|
+    | `ChecksumCache.Open()`    | Uses `path` as database ("" disables), resets the stats       |
+    | `ChecksumCache.Lookup()`  | Digests of `path` for ALL given algorithms, None on any miss  |
+    | `ChecksumCache.Store()`   | Stores digests for the file described by `stat`               |
+    | `ChecksumCache.Evict()`   | Drops entries unused for `MAX_AGE` sec., then the oldest ones |
+    |                           | beyond `MAX_ENTRIES`. Runs once when the database is opened   |
+    | `ChecksumCache.Stats()`   | Hits, misses, stores and entries                              |
+
+    A broken database (read-only home, disk full, ...) disables the cache with a
+    warning, it never fails a checksum.
+    """
+
+    DEFAULT_PATH: str = os.path.join(os.path.expanduser("~"), ".cache", "rutbs4", "checksums.sqlite")
+    PATH: str = ""      # "" disables, Open() sets it
+    MAX_ENTRIES: int = 2_000_000
+    MAX_AGE: float = 180 * 24 * 3600    # sec. since the last hit or store
+
+    _db: sqlite3.Connection | None = None
+    _opened: bool = False
+    _lock: threading.Lock = threading.Lock()
+    _stats: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0}
+
+    @staticmethod
+    def Open(path: str) -> None:
+        with ChecksumCache._lock:
+            ChecksumCache._close()
+            ChecksumCache.PATH = path
+            ChecksumCache._opened = False
+            ChecksumCache._stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    @staticmethod
+    def Lookup(path: str, algorithms: List[str]) -> Dict[str, str] | None:
+        try:
+            st: os.stat_result = os.stat(path)
+        except OSError:
+            return None
+
+        with ChecksumCache._lock:
+            db: sqlite3.Connection | None = ChecksumCache._connect()
+            if db is None:
+                return None
+            try:
+                digests: Dict[str, str] = {}
+                for algorithm in algorithms:
+                    row = db.execute(
+                        "SELECT digest FROM checksums WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND algorithm=?",
+                        (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, algorithm)).fetchone()
+                    if row is None:
+                        ChecksumCache._stats["misses"] += 1
+                        return None
+                    digests[algorithm] = row[0]
+
+                db.execute("UPDATE checksums SET used=? WHERE dev=? AND ino=? AND size=? AND mtime_ns=?",
+                           (time.time(), st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns))
+                db.commit()
+                ChecksumCache._stats["hits"] += 1
+                return digests
+            except sqlite3.Error as e:
+                ChecksumCache._disable(e)
+                return None
+
+    @staticmethod
+    def Store(st: os.stat_result, digests: Dict[str, str]) -> None:
+        with ChecksumCache._lock:
+            db: sqlite3.Connection | None = ChecksumCache._connect()
+            if db is None:
+                return
+            try:
+                now: float = time.time()
+                for algorithm, digest in digests.items():
+                    # An older version of the same file is stale for good
+                    db.execute("DELETE FROM checksums WHERE dev=? AND ino=? AND algorithm=?",
+                               (st.st_dev, st.st_ino, algorithm))
+                    db.execute("INSERT INTO checksums VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, algorithm, digest, now))
+                db.commit()
+                ChecksumCache._stats["stores"] += 1
+            except sqlite3.Error as e:
+                ChecksumCache._disable(e)
+
+    @staticmethod
+    def Evict(maxAge: float | None = None, maxEntries: int | None = None) -> int:
+        with ChecksumCache._lock:
+            db: sqlite3.Connection | None = ChecksumCache._connect()
+            if db is None:
+                return 0
+            try:
+                return ChecksumCache._evict(db, maxAge, maxEntries)
+            except sqlite3.Error as e:
+                ChecksumCache._disable(e)
+                return 0
+
+    @staticmethod
+    def Stats() -> Dict[str, int]:
+        with ChecksumCache._lock:
+            stats: Dict[str, int] = dict(ChecksumCache._stats)
+            stats["entries"] = 0
+            db: sqlite3.Connection | None = ChecksumCache._connect()
+            if db is None:
+                return stats
+            try:
+                stats["entries"] = db.execute("SELECT COUNT(*) FROM checksums").fetchone()[0]
+            except sqlite3.Error as e:
+                ChecksumCache._disable(e)
+            return stats
+
+    # --- PRIVATE -------------------------------------------------------------
+
+    @staticmethod
+    def _connect() -> sqlite3.Connection | None:
+        # Lazy, the first caller opens (and evicts) - caller holds the lock
+        if ChecksumCache._opened:
+            return ChecksumCache._db
+        ChecksumCache._opened = True
+        if not ChecksumCache.PATH:
+            return None
+
+        try:
+            os.makedirs(os.path.dirname(ChecksumCache.PATH) or ".", exist_ok=True)
+            db: sqlite3.Connection = sqlite3.connect(ChecksumCache.PATH, check_same_thread=False)
+            # WAL + NORMAL: a commit does not fsync, losing the last entries on a crash is fine for a cache
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS checksums (
+                dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, algorithm TEXT,
+                digest TEXT, used REAL,
+                PRIMARY KEY (dev, ino, size, mtime_ns, algorithm)) WITHOUT ROWID""")
+            db.execute("CREATE INDEX IF NOT EXISTS checksums_used ON checksums (used)")
+            ChecksumCache._evict(db, None, None)
+        except (OSError, sqlite3.Error) as e:
+            ChecksumCache._disable(e)
+            return None
+
+        ChecksumCache._db = db
+        return db
+
+    @staticmethod
+    def _evict(db: sqlite3.Connection, maxAge: float | None, maxEntries: int | None) -> int:
+        maxAge = ChecksumCache.MAX_AGE if maxAge is None else maxAge
+        maxEntries = ChecksumCache.MAX_ENTRIES if maxEntries is None else maxEntries
+
+        removed: int = db.execute("DELETE FROM checksums WHERE used < ?", (time.time() - maxAge,)).rowcount
+        surplus: int = db.execute("SELECT COUNT(*) FROM checksums").fetchone()[0] - maxEntries
+        if surplus > 0:
+            removed += db.execute("""DELETE FROM checksums WHERE (dev, ino, size, mtime_ns, algorithm) IN
+                (SELECT dev, ino, size, mtime_ns, algorithm FROM checksums ORDER BY used LIMIT ?)""", (surplus,)).rowcount
+        db.commit()
+        return removed
+
+    @staticmethod
+    def _disable(e: Exception) -> None:
+        print("[ERROR] ChecksumCache disabled: " + str(e), file=sys.stderr)
+        ChecksumCache._close()
+        ChecksumCache._opened = True    # stay disabled until the next Open()
+
+    @staticmethod
+    def _close() -> None:
+        if ChecksumCache._db is not None:
+            try:
+                ChecksumCache._db.close()
+            except sqlite3.Error:
+                pass
+        ChecksumCache._db = None
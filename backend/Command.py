@@ -1,54 +1,365 @@
+import errno
 import os
+import re
+import select
+import shlex
+import shutil
 import signal
 import subprocess
 import json
+import tempfile
 import threading
-from time import sleep
-from typing import List
+from collections import deque
+from enum import Enum
+from time import monotonic, sleep
+from typing import BinaryIO, Callable, Deque, Dict, Iterable, List
+
+from backend.IOSampler import IOSampler
+from backend.Reactor import Reactor
+from backend.Scheduling import Sched
+from backend.Snapshot import Snapshot
+
+class E_Capture(Enum):
+    KEEP = 0        # all lines in memory (DEFAULT)
+    DISCARD = 1     # drop everything, only bytes get counted
+    RING = 2        # keep the last N lines (RAW: last N bytes)
+    SPOOL = 3       # write everything into a temp file
+    CALLBACK = 4    # hand every line (RAW: every chunk) to a callable
+
+class Capture:
+
+    """
+    Capture policy for STDOUT and STDERR of a Command.
+
+    | Capture.     | Type       | Description                                           |
+    |--------------|------------|-------------------------------------------------------|
+    | `policy`     | E_Capture  | What happens with the output                          |
+    | `lines`      | int        | RING: lines to keep                                   |
+    | `bytes`      | int        | RING + RAW: bytes to keep                             |
+    | `callback`   | Callable   | CALLBACK: `callback("STDOUT", line)`, RAW gets bytes  |
+
+    ```python
+    >>> c = Command("dd if=/dev/sda of=/dev/nst0 status=progress", capture=Capture(E_Capture.RING, lines=10))
+    ```
+    """
+
+    def __init__(self, policy: E_Capture = E_Capture.KEEP, lines: int = 100, bytes: int = 65536,
+                 callback: Callable[[str, str | bytes], None] | None = None) -> None:
+        if policy is E_Capture.CALLBACK and callback is None:
+            raise ValueError("ERROR: Capture policy CALLBACK needs a callback")
+        self.policy: E_Capture = policy
+        self.lines: int = lines
+        self.bytes: int = bytes
+        self.callback = callback
+
+    def _asdict(self) -> dict:
+        return {
+            "policy": self.policy.name,
+            "lines": self.lines,
+            "bytes": self.bytes,
+        }
+
+class _Output:
+
+    """
+    Captured STDOUT or STDERR of a Command.
+
+    Text mode splits the stream into utf-8 lines. RAW mode appends all bytes to
+    `self.data` (linear, no per-byte formatting) and renders hex only on `view()`.
+    When a line cannot be decoded the output switches to RAW, keeping all bytes
+    received so far (the line terminators included).
+
+    How much is kept is decided by the Capture policy, see `E_Capture`.
+    DISCARD and SPOOL never decode, SPOOL writes the stream byte-exact to `self.path`.
+    """
+
+    def __init__(self, name: str, raw: bool = False, capture: Capture | None = None) -> None:
+        self.name: str = name
+        self.raw: bool = raw
+        self.capture: Capture = capture if capture is not None else Capture()
+        self.total: int = 0     # bytes received, independent of the policy
+        self.lines: List[str] | Deque[str] = []
+        self.data: bytearray = bytearray()
+        self.path: str = ""
+        self._spool = None
+        self._partial: bytearray = bytearray()   # incomplete trailing line
+        self.eof: threading.Event = threading.Event()
+
+        if self.capture.policy is E_Capture.RING:
+            self.lines = deque(maxlen=self.capture.lines)
+
+    def feed(self, chunk: bytes) -> bool:
+        # Returns False when this chunk forced the switch to RAW
+        self.total += len(chunk)
+
+        match self.capture.policy:
+            case E_Capture.DISCARD:
+                return True
+            case E_Capture.SPOOL:
+                self._spoolWrite(chunk)
+                return True
+
+        if self.raw:
+            self._store(chunk)
+            return True
+
+        start: int = 0
+        scan: int = len(self._partial)  # bytes before were already searched for "\n"
+        self._partial += chunk
+        while (end := self._partial.find(b"\n", scan)) >= 0:
+            try:
+                self._line(self._partial[start:end].decode('utf-8'))
+            except UnicodeDecodeError:
+                del self._partial[:start]
+                self._toRaw()
+                return False
+            start = scan = end + 1
+        del self._partial[:start]
+        return True
+
+    def close(self) -> bool:
+        # Flushes the last line without terminator, False when switched to RAW
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+
+        if self.raw or not self._partial:
+            return True
+        try:
+            self._line(self._partial.decode('utf-8'))
+            self._partial.clear()
+        except UnicodeDecodeError:
+            self._toRaw()
+            return False
+        return True
+
+    def remove(self) -> None:
+        # Deletes the spool file (if any)
+        self.close()
+        if self.path:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = ""
+
+    def view(self) -> List[str]:
+        if self.capture.policy in {E_Capture.DISCARD, E_Capture.SPOOL}:
+            return []
+        if not self.raw:
+            return self.lines if type(self.lines) is list else list(self.lines)
+        if not self.data:
+            return []
+        return [self.data.hex()]
+
+    def _asdict(self) -> dict:
+        data = {
+            "policy": self.capture.policy.name,
+            "bytes": self.total
+        }
+        if self.path:
+            data.update({"spool": self.path})
+        return data
+
+    def _line(self, line: str) -> None:
+        if self.capture.policy is E_Capture.CALLBACK:
+            self.capture.callback(self.name, line) # type: ignore
+        else:
+            self.lines.append(line)
+
+    def _store(self, chunk: bytes | bytearray) -> None:
+        match self.capture.policy:
+            case E_Capture.CALLBACK:
+                self.capture.callback(self.name, bytes(chunk)) # type: ignore
+            case E_Capture.RING:
+                self.data += chunk
+                if len(self.data) > self.capture.bytes:
+                    del self.data[:len(self.data) - self.capture.bytes]
+            case _:
+                self.data += chunk
+
+    def _spoolWrite(self, chunk: bytes) -> None:
+        if self._spool is None:
+            self._spool = tempfile.NamedTemporaryFile(
+                prefix="rutbs_", suffix="." + self.name.lower(), delete=False)
+            self.path = self._spool.name
+        self._spool.write(chunk)
+
+    def _toRaw(self) -> None:
+        _tmp: bytearray = bytearray()
+        for line in self.lines:
+            _tmp += line.encode('utf-8')
+            _tmp += b"\n"    # this adds the line terminator, which was prior the list seperator
+        _tmp += self._partial
+        self.lines.clear()
+        self._partial.clear()
+        self.raw = True
+        self._store(_tmp)
+
+class _Input:
+
+    """
+    STDIN feed of a Command.
+
+    Producers append bytes from any thread, the Reactor writes them into the
+    non-blocking pipe whenever the child is ready. At most `limit` bytes are
+    buffered, `write()` blocks beyond that (backpressure) so a fast producer
+    can't outrun e.g. a tape drive.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit: int = limit
+        self.fd: int = -1
+        self.total: int = 0         # bytes written into the pipe
+        self.buffered: int = 0      # bytes waiting in self._chunks
+        self.closed: bool = False   # no more data will follow
+        self.broken: bool = False   # child closed its STDIN (EPIPE)
+        self._chunks: Deque[memoryview] = deque()
+        self._armed: bool = False
+        self._cond: threading.Condition = threading.Condition()
+
+    def write(self, data: bytes | bytearray | memoryview, timeout: float | None = None) -> None:
+        if len(data) == 0:
+            return
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.buffered < self.limit or self.broken or self.closed, timeout):
+                raise TimeoutError("[ERROR] STDIN: child does not consume data")
+            if self.broken:
+                raise BrokenPipeError("[ERROR] STDIN: child closed its input")
+            if self.closed:
+                raise ValueError("[ERROR] STDIN: already closed")
+            self._chunks.append(memoryview(bytes(data)))
+            self.buffered += len(data)
+        self._arm()
+
+    def close(self) -> None:
+        with self._cond:
+            if self.closed:
+                return
+            self.closed = True
+        self._arm()
+
+    def drained(self, timeout: float | None = None) -> bool:
+        # Blocks until everything was handed to the child
+        with self._cond:
+            return self._cond.wait_for(lambda: self.buffered == 0 or self.broken, timeout)
+
+    def onWritable(self, fd: int) -> int:
+        # Runs in the Reactor thread
+        with self._cond:
+            while self._chunks:
+                try:
+                    written: int = os.write(fd, self._chunks[0])
+                except BlockingIOError:
+                    return Reactor.KEEP
+                except OSError:     # BrokenPipeError, child is gone
+                    self.broken = True
+                    self._chunks.clear()
+                    self.buffered = 0
+                    self._cond.notify_all()
+                    return Reactor.CLOSE
+
+                self.total += written
+                self.buffered -= written
+                if written == len(self._chunks[0]):
+                    self._chunks.popleft()
+                else:
+                    self._chunks[0] = self._chunks[0][written:]
+                self._cond.notify_all()
+
+            if self.closed:
+                return Reactor.CLOSE
+            self._armed = False
+            return Reactor.PAUSE
+
+    def _arm(self) -> None:
+        with self._cond:
+            if self._armed or self.fd < 0:
+                return
+            self._armed = True
+        Reactor.Writable(self.fd, self.onWritable)
+
+    def _asdict(self) -> dict:
+        return {
+            "bytes": self.total,
+            "buffered": self.buffered,
+            "closed": self.closed,
+            "broken": self.broken
+        }
 
 class Command:
 
     """
     #### === COMMAND ==========================================================
 
-    Command.__init__(cmd: str, filesize: int = -1, raw: bool = False):
+    Command.__init__(cmd: str | List[str], filesize: int = -1, raw: bool = False, capture: Capture = None,
+                     stdin: bool = False, sched: Sched = None):
     - Requires
-        - The command e.g. "cat foo.txt"
+        - The command e.g. "cat foo.txt" (runs via /bin/sh)
+        - OR an argv list e.g. ["cat", "foo's.txt"] (spawned directly, no shell, no quoting)
     - Supports
         - Filesize
         - Binary / RAW output (0xa5 6a -> "a56a")
+        - Capture policy for STDOUT/STDERR (keep, discard, ring buffer, spool file, callback)
+        - STDIN stream (stdin=True), fed from python via `write()` / `feed()`
+        - Scheduling class (nice, ionice, CPU affinity, rlimits), see `backend.Scheduling.Sched`
     
     | `Command.`             | Description                                                            |
     |------------------------|------------------------------------------------------------------------|
     | `Command.start()`      | Starts the command in the background                                   |
-    | `Command.wait()`       | Blocks until command has exited                                        |
+    | `Command.wait()`       | Blocks until command has exited (kernel wakeup via pidfd, no polling)  |
+    | `Command.join()`       | Blocks until exited and STDOUT/STDERR drained, safe from any thread    |
+    | `Command.write()`      | STDIN: queues bytes, blocks while the child lags behind (backpressure) |
+    | `Command.feed()`       | STDIN: streams bytes / iterable / file object, then closes STDIN       |
+    | `Command.closeStdin()` | STDIN: signals EOF to the child                                        |
     | `Command.kill()`       | Blocks until command is killed (SIGTERM, timeout 100ms)                |
     | `Command.cleanup()`    | Get called before running ← false, does close STDOUT/STDERR            |
-    | `Command.reset()`      | Calls self.cleanup() and clears all vars EXCEPT cmd, filesize and raw  |
+    | `Command.reset()`      | Calls self.cleanup() and clears all vars EXCEPT cmd, filesize, raw,    |
+    |                        | capture, stdin and sched, spool files get deleted                      |
     | `Command.status()`     | Refreshes all vars, always call this!                                  |
 
+    | `Command.`                     | Description                                                    |
+    |--------------------------------|----------------------------------------------------------------|
+    | `Command.Statistics()`         | rusage aggregated per executable (argv[0]), e.g. to size limits|
+    | `Command.ResetStatistics()`    | Clears the aggregated statistics                               |
+
+    STDOUT and STDERR are drained by the shared `backend.Reactor` thread, so the thread count
+    stays flat no matter how many Commands are running.
+
     ### --- VARIABLES ---------------------------------------------------------
 
     **Core Variables:**
     | Var            | Type               | Description                                                |
     |----------------|--------------------|------------------------------------------------------------|
     | `self.process` | `subprocess.Popen` | MAIN INTERFACE, process instance for OS communication      |
-    | `self.cmd`     | `str`              | Main command string                                        |
+    | `self.cmd`     | `str`, `List[str]` | Main command string (shell) or argv list (no shell)        |
     | `self.running` | `bool`             | Set by `wait()` or `start()`, cleared by `self.refresh()`  |
     | `self.pid`     | `int`              | Process ID provided by `self.process`                      |
+    | `self.pidfd`   | `int`              | pidfd of the process, readable on exit (-1 if unsupported) |
 
     **Command Results**
-    | Var              | Type         | Description                  |
-    |------------------|--------------|------------------------------|
-    | `self.stdout`    | `List[str]`  | All lines of STDOUT          |
-    | `self.stderr`    | `List[str]`  | All lines of STDERR          |
-    | `self.exitCode`  | `int`        | Exit code of `self.process`  |
+    | Var              | Type         | Description                                  |
+    |------------------|--------------|----------------------------------------------|
+    | `self.stdout`    | `List[str]`  | All lines of STDOUT (RAW: one hex string)    |
+    | `self.stderr`    | `List[str]`  | All lines of STDERR (RAW: one hex string)    |
+    | `self.stdoutRaw` | `bytearray`  | STDOUT bytes in RAW mode, no hex conversion  |
+    | `self.stderrRaw` | `bytearray`  | STDERR bytes in RAW mode, no hex conversion  |
+    | `self.capture`   | `Capture`    | Capture policy, see `E_Capture`              |
+    | `self.stdoutSpool` | `str`      | SPOOL: path of the STDOUT temp file          |
+    | `self.stderrSpool` | `str`      | SPOOL: path of the STDERR temp file          |
+    | `self.exitCode`  | `int`        | Exit code of `self.process`                  |
 
     **Block I/O (Disk or Tape)**
-    | Var              | Type         | Description                          |
-    |------------------|--------------|--------------------------------------|
-    | `self.io_path`   | `str`        | Path to the file: `"/proc/<PID>/io"` |
-    | `self.io`        | `List[str]`  | Content of the `/proc/<PID>/io` file |
+    | Var              | Type         | Description                                      |
+    |------------------|--------------|--------------------------------------------------|
+    | `self.io_path`   | `str`        | Path to the file: `"/proc/<PID>/io"`             |
+    | `self.io`        | `List[str]`  | Content of the `/proc/<PID>/io` file             |
+    | `self.ioSampler` | `IOSampler`  | Parsed counters, rate, avg. rate and ETA         |
+
+    **Resource Usage (set once the process got reaped via `wait4()`)**
+    | Var              | Type               | Description                                          |
+    |------------------|--------------------|------------------------------------------------------|
+    | `self.rusage`    | `Dict[str, float]` | wall/user/sys time, max RSS, block I/O, ctx switches |
 
     **Object-Related Variables**
     | Var               | Type        | Description                                         |
@@ -59,6 +370,8 @@ class Command:
     | `self.didRun`     | `bool`      | Tracks whether the command has already been started |
     | `self.closed`     | `bool`      | Monitors whether STDIN or STDOUT streams are closed |
 
+    `_asdict()` is cached (see `backend.Snapshot`), a finished Command is serialized only once.
+
     Are self.didRun and self.closed equal?
     - No!
 
@@ -77,121 +390,284 @@ class Command:
     self.didRun is a "sticky bit" that shows if a cmd got exectuted AT LEAST ONCE
     """
 
-    def __init__(self, cmd: str, filesize: int = -1, raw: bool = False) -> None:
-        self.cmd: str = cmd
+    DRAIN_TIMEOUT: float = 1.0    # sec. to wait for STDOUT/STDERR EOF after exit
+    STDIN_LIMIT: int = 4 * 1024 * 1024  # max. bytes buffered for STDIN before write() blocks
+
+    _executables: Dict[str, str] = {}   # argv[0] -> resolved path, saves a PATH walk per spawn
+    _statistics: Dict[str, Dict[str, float]] = {}   # executable -> aggregated rusage
+    _statisticsLock: threading.Lock = threading.Lock()
+    _REDIRECT: re.Pattern = re.compile(r"\d*(>>|>&|<&|&>|>|<)")   # shell syntax in front of the executable
+    _ASSIGNMENT: re.Pattern = re.compile(r"[A-Za-z_]\w*=")
+
+    def __init__(self, cmd: str | List[str], filesize: int = -1, raw: bool = False,
+                 capture: Capture | None = None, stdin: bool = False, sched: Sched | None = None) -> None:
+        self.cmd: str | List[str] = cmd
         self.filesize: int = filesize
         self.raw: bool = raw
+        self.capture: Capture = capture if capture is not None else Capture()
+        self.stdin: bool = stdin
+        self.sched: Sched | None = sched
+        self._reapLock: threading.Lock = threading.Lock()  # outlives reset(), the Reactor may still hold a callback
+        self._pidfdLock: threading.Lock = threading.Lock()
+        self._snapshot: Snapshot = Snapshot()   # cached _asdict(), rebuilt only when _snapshotKey() changes
         self._clear() # This defaults all vars
 
 # --- PUBLIC FUNCTIONS ----------------------------------------------------------------------------
 
     def start(self):
-        if self.cmd == "":
+        if not self.cmd:
             # Constructor needs a string but a literal "" is valid, but not for me!
             raise ValueError("ERROR: Process cannot be initiated, command string empty")
 
-        self.process = subprocess.Popen(
-            args="exec " + self.cmd,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=False
-        )
+        # The reactor owns the read ends, the child gets the write ends.
+        # A Pipeline may have wired STDOUT to the next stage instead.
+        out_r, out_w = os.pipe() if self._stdoutTarget is None else (-1, self._stdoutTarget)
+        err_r, err_w = os.pipe()
+        in_r, in_w = os.pipe() if self.stdin and self._stdinSource is None else (-1, -1)
+        if in_r >= 0:
+            self._stdinSource = in_r
+        try:
+            self._startTime = monotonic()
+            self.process = self._spawn(out_w, err_w)
+        except OSError as e:    # argv only: binary not found / not executable
+            self._closeFds(out_r, err_r, in_w)
+            self._spawnFailed(e)
+            return
+        except:
+            self._closeFds(out_r, err_r, in_w)
+            raise
+        finally:
+            self._closeFds(out_w if self._stdoutTarget is None else -1, err_w, in_r)
+            if in_r >= 0:
+                self._stdinSource = None
+
         self.closed = False
         self.pid = self.process.pid
         self.running = True
         self.didRun = True
-        self.io_path = f"/proc/{self.pid}/io"
+        self.ioSampler = IOSampler(self.pid)
+        self.io_path = self.ioSampler.path
+        self.pidfd = self._openPidfd()
+        if self.pidfd >= 0:
+            # Reactor gets its own copy, it closes it after the exit callback
+            Reactor.Watch(os.dup(self.pidfd), lambda p=self.process: self._onExit(p))
+
+        if self.sched is not None:
+            self.status_msg += self.sched.apply(self.pid)
 
         # Get Status of Process after spawn
-        threading.Thread(target=self._read_stdout, daemon=True).start()
-        threading.Thread(target=self._read_stderr, daemon=True).start()
+        if out_r >= 0:
+            Reactor.Register(out_r, lambda chunk, o=self._stdout: self._onData(o, chunk), lambda o=self._stdout: self._onClose(o))
+        else:
+            self._stdout.eof.set()
+        Reactor.Register(err_r, lambda chunk, o=self._stderr: self._onData(o, chunk), lambda o=self._stderr: self._onClose(o))
+        if in_w >= 0:
+            self._stdin.fd = in_w
+            self._stdin._arm()  # pick up data written before start()
+        Reactor.Every(IOSampler.INTERVAL, self.ioSampler.tick)
         self.status()
         if not self.quiet:
             print("[EXEC] " + json.dumps(self._asdict(), indent=2))
 
-    def wait(self, timeout: int = 0) -> None:
+    def wait(self, timeout: float = 0) -> None:
         """
         Command.wait(timeout=XXX)
         This wait for Command to complete or terminates the process if Timeout is reached
         - Does start the process if needed
-        - Timeout is N in 10ms
+        - Timeout is wall-clock time in seconds, 0 waits forever (DEFAULT)
         - Command.reset() needed when restarting a process
 
-        Command("sleep 10").wait(500) -> Does wait for 5000ms (5sec) until this process gets terminated
+        Command("sleep 10").wait(5) -> Does wait for 5sec until this process gets terminated
         Command.status_msg will contain the "Timeout reached" string
 
-        Three Design scenarios:
-        1. Command finishes semi-instant (run time <10ms)
-        2. Command runs as long as it takes (like a dd process) -> timeout=0, inf. runtime, DEFAULT
-        3. Command needs to finish within n * 10 ms
+        The caller sleeps in the kernel until the process exits (pidfd becomes readable),
+        so short commands return immediately and long ones cost no CPU while waiting.
+        Kernels without pidfd support (< 5.3) fall back to Popen.wait().
         """
 
         # Start only if process did not run prior
         if not self.didRun:
             self.start()
 
-        sleep(.01)      # Wait 10ms for early completion
-        self.status()   # Fill status vars
-
-        if not self.running:    # Case 1)   Process finishes semi-instant
-            return
-
-        if timeout == 0:        # Case 2)   inf. loop until process finishes
-            while self.running:
-                sleep(.01)
+        if self._waitExit(timeout if timeout > 0 else None):
+            self.status()
+            if self.running:
+                self._reap(block=True)  # the Reactor was reaping meanwhile, the poll missed it
                 self.status()
             return
 
-        if timeout != 0:        # Case 3)   Command.kill() on timeout reached
-            for n in range(timeout - 1):    # minus first one from 1)
-                self.status()
-                if not self.running:
-                    return
-                sleep(.01)
-            self.kill()
-            self.status_msg.append("Timeout reached, process killed")
-            self.status()
+        self.kill()
+        self.status_msg.append("Timeout reached, process killed")
+        self.status()
+
+    def join(self, timeout: float | None = None) -> int | None:
+        """
+        Blocks until the process has exited and every byte of STDOUT/STDERR went through
+        the capture. Unlike `wait()` it neither starts, kills nor cleans up the Command,
+        so a helper thread (e.g. a STDIN feeder) can wait while the owner keeps polling.
+        Returns the exit code, None on timeout or when never started.
+        """
+        process: subprocess.Popen = self.process
+        if process is None or not self._waitExit(timeout):
+            return None
+        self._reap(block=True)
+        self._stdout.eof.wait(self.DRAIN_TIMEOUT)
+        self._stderr.eof.wait(self.DRAIN_TIMEOUT)
+        return process.returncode
+
+    def write(self, data: bytes | bytearray | memoryview, timeout: float | None = None) -> None:
+        """
+        Queues `data` for STDIN (needs `Command(..., stdin=True)`), blocks while
+        more than STDIN_LIMIT bytes are waiting. Raises BrokenPipeError when the
+        child closed its STDIN.
+        """
+        if not self.stdin:
+            raise ValueError("ERROR: Command was not created with stdin=True")
+        self._stdin.write(data, timeout)
+
+    def feed(self, source: bytes | bytearray | memoryview | Iterable[bytes] | BinaryIO, close: bool = True) -> None:
+        """
+        Streams bytes, an iterable of bytes or a binary file object into STDIN,
+        chunk by chunk with backpressure. Closes STDIN afterwards unless close=False.
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            view: memoryview = memoryview(source)
+            for offset in range(0, len(view), Reactor.CHUNK_SIZE):
+                self.write(view[offset:offset + Reactor.CHUNK_SIZE])
+        elif hasattr(source, "read"):
+            while chunk := source.read(Reactor.CHUNK_SIZE): # type: ignore
+                self.write(chunk)
+        else:
+            for chunk in source: # type: ignore
+                self.write(chunk)
+
+        if close:
+            self.closeStdin()
+
+    def closeStdin(self) -> None:
+        self._stdin.close()
 
     def kill(self) -> None:
         self.status()
         if self.process:
             try:
-                os.kill(self.pid, signal.SIGTERM)
-                self.exitCode = self.process.wait()
+                self._signal(signal.SIGTERM)
+                self._reap(block=True)
+                self.exitCode = self.process.returncode
                 self.status()
             except Exception as e:
                 self.status_msg.append(f"[ERROR] killing process: {str(e)}")
 
     def cleanup(self) -> None:
         if self.process and not self.closed:
-            self.process.stdout.close() # type: ignore
-            self.process.stderr.close() # type: ignore
-            self.process.wait()
+            self._reap(block=True)
+            self._stdin.close()     # child is gone, reactor drops the pipe
+
+            # Let the reactor drain the pipes, it closes them on EOF
+            self._stdout.eof.wait(self.DRAIN_TIMEOUT)
+            self._stderr.eof.wait(self.DRAIN_TIMEOUT)
+
+            self._closePidfd()
+            self.ioSampler.stop()
             self.closed = True
 
     def reset(self) -> None:
         self.cleanup()
+        self._stdout.remove()
+        self._stderr.remove()
         self._clear()
 
     def status(self) -> None:
         if self.process is None:
             return
 
-        if self.process.poll() is None:
-            self.running = True
+        # /proc/<PID>/io stays readable until the process is reaped,
+        # so an exited process still yields its final counters here.
+        # While running the Reactor samples at a fixed cadence, this only tops up stale data.
+        if self.process.returncode is None and not self.permError:
+            self._pollIOfile(force=self._waitExit(0))
 
-            if not self.permError: 
-                self._pollIOfile()
+        if not self._reap():
+            self.running = True
         else:
             self.running = False
             self.exitCode = self.process.returncode
             self.cleanup()
 
+    @staticmethod
+    def Statistics() -> Dict[str, Dict[str, float]]:
+        """
+        Aggregated rusage of all reaped Commands per executable, e.g.
+        `{"openssl": {"runs": 12, "wall": 80.1, "cpu": 0.97, ...}, "dd": {...}}`
+        `cpu` = (user + sys) / wall: ~1.0 is CPU-bound, ~0.0 waits on I/O.
+        """
+        with Command._statisticsLock:
+            stats: Dict[str, Dict[str, float]] = {}
+            for name, total in Command._statistics.items():
+                stats[name] = dict(total)
+                stats[name]["wall_avg"] = round(total["wall"] / total["runs"], 6)
+                stats[name]["cpu"] = round((total["utime"] + total["stime"]) / total["wall"], 3) if total["wall"] > 0 else 0.0
+            return stats
+
+    @staticmethod
+    def ResetStatistics() -> None:
+        with Command._statisticsLock:
+            Command._statistics.clear()
+
+    @property
+    def io(self) -> List[str]:
+        return self.ioSampler.lines
+
+    @property
+    def stdout(self) -> List[str]:
+        return self._stdout.view()
+
+    @property
+    def stderr(self) -> List[str]:
+        return self._stderr.view()
+
+    @property
+    def stdoutRaw(self) -> bytearray:
+        return self._stdout.data
+
+    @property
+    def stderrRaw(self) -> bytearray:
+        return self._stderr.data
+
+    @property
+    def stdoutSpool(self) -> str:
+        return self._stdout.path
+
+    @property
+    def stderrSpool(self) -> str:
+        return self._stderr.path
+
     def _asdict(self) -> dict:
         self.status()
+        return self._snapshot.get(self._snapshotKey(), self._build)
+
+    def __str__(self):
+        if self.quiet:
+            return json.dumps(self._asdict())
+        return json.dumps(self._asdict(), indent=2)
+
+# --- PRIVATE FUNCTIONS ---------------------------------------------------------------------------
+
+    def _snapshotKey(self) -> tuple:
+        # Everything _build() depends on that can change without a new Command
+        return (
+            self.cmd if isinstance(self.cmd, str) else tuple(self.cmd),
+            self.process, self.running, self.closed, self.exitCode, self.quiet,
+            len(self.status_msg), self.filesize, self.raw, self.permError, self.sched, self.capture,
+            self.ioSampler, self.ioSampler.samples, bool(self.rusage),
+            self._stdin.total, self._stdin.buffered, self._stdin.closed, self._stdin.broken,
+            self._stdout.total, self._stdout.eof.is_set(),
+            self._stderr.total, self._stderr.eof.is_set()
+        )
+
+    def _build(self) -> dict:
         data = {
-            "cmd": self.cmd,
+            "cmd": self.cmd if isinstance(self.cmd, str) else shlex.join(self.cmd),
             "pid": self.pid,
             "running": self.running,
             "quiet": self.quiet,
@@ -201,113 +677,264 @@ class Command:
             "did_ran": self.didRun,
             "status_msg": self.status_msg,
 
+            "sched": self.sched._asdict() if self.sched is not None else None,
             "filesize": self.filesize,
             "permission_error": self.permError,
             "io_path": self.io_path,
             "io": self.io,
+            "io_stats": self.ioSampler._asdict(self.filesize),
+            "rusage": self.rusage,
 
             "raw": self.raw,
             "exitCode": self.exitCode,
+            "stdin": self._stdin._asdict() if self.stdin else None,
             "stdout": self.stdout,
             "stderr": self.stderr,
+            "capture": {
+                "stdout": self._stdout._asdict(),
+                "stderr": self._stderr._asdict()
+            },
         }
         return data
 
-    def __str__(self):
-        if self.quiet:
-            return json.dumps(self._asdict())
-        return json.dumps(self._asdict(), indent=2)
-
-# --- PRIVATE FUNCTIONS ---------------------------------------------------------------------------
-
     def _clear(self) -> None:
         # This clears ALL VARIABLES to default
         # ONLY if self.cleanup() was called!
 
         self.pid: int = -1
+        self.pidfd: int = -1
         self.running: bool = False
         self.quiet: bool = True
         self.process: subprocess.Popen = None # type: ignore
+        self._stdinSource: int | None = None    # set by Pipeline: fd for STDIN
+        self._stdoutTarget: int | None = None   # set by Pipeline: fd for STDOUT, no capture
 
         self.closed: bool = True
         self.didRun: bool = False
         self.status_msg: List[str] = []
 
         self.permError: bool = False
-        self.io: List[str] = []
+        self.ioSampler: IOSampler = IOSampler()
         self.io_path: str = ""
 
         self.exitCode: int = -1
-        self.stdout: List[str] = []
-        self.stderr: List[str] = []
+        self.rusage: Dict[str, float] = {}
+        self._startTime: float = 0.0
+        self._exitTime: float = 0.0
+        self._stdin: _Input = _Input(self.STDIN_LIMIT)
+        self._stdout: _Output = _Output("STDOUT", self.raw, self.capture)
+        self._stderr: _Output = _Output("STDERR", self.raw, self.capture)
+
+    def _spawn(self, stdout: int, stderr: int) -> subprocess.Popen:
+        if isinstance(self.cmd, str):
+            return subprocess.Popen(
+                args="exec " + self.cmd,
+                shell=True,
+                stdin=self._stdinSource,
+                stdout=stdout,
+                stderr=stderr,
+                text=False
+            )
+
+        # argv: no /bin/sh in between and no quoting. All fds of this backend are
+        # O_CLOEXEC, so close_fds=False is safe and together with an absolute
+        # executable lets CPython use posix_spawn (vfork otherwise)
+        return subprocess.Popen(
+            args=self.cmd,
+            executable=self._which(self.cmd[0]),
+            close_fds=False,
+            stdin=self._stdinSource,
+            stdout=stdout,
+            stderr=stderr,
+            text=False
+        )
 
-    def _pollIOfile(self) -> None:
-        if not self.permError:
+    def _spawnFailed(self, e: OSError) -> None:
+        # Behave like the shell would have: exit code 127 (not found) or 126 (not executable)
+        self.didRun = True
+        self.running = False
+        self.closed = True
+        self.exitCode = 126 if isinstance(e, PermissionError) else 127
+        self.status_msg.append("[ERROR] Cannot execute '" + self.cmd[0] + "': " + str(e))
+        self._stdout.eof.set()
+        self._stderr.eof.set()
+
+    @staticmethod
+    def _closeFds(*fds: int) -> None:
+        for fd in fds:
+            if fd >= 0:
+                os.close(fd)
+
+    @staticmethod
+    def _which(name: str) -> str:
+        if os.sep in name:
+            return name
+        if name not in Command._executables:
+            path: str | None = shutil.which(name)
+            if path is None:
+                raise FileNotFoundError(errno.ENOENT, "command not found", name)
+            Command._executables[name] = path
+        return Command._executables[name]
+
+    def _openPidfd(self) -> int:
+        try:
+            return os.pidfd_open(self.pid)
+        except (AttributeError, OSError):   # Python < 3.9 or Kernel < 5.3
+            return -1
+
+    def _closePidfd(self) -> None:
+        # cleanup() may run in two threads, a second close() could hit a reused fd
+        with self._pidfdLock:
+            if self.pidfd >= 0:
+                os.close(self.pidfd)
+                self.pidfd = -1
+
+    def _waitExit(self, timeout: float | None) -> bool:
+        # Blocks until the process has exited, returns False if timeout was reached
+        if self.process is None or self.process.returncode is not None:
+            return True
+
+        if self.pidfd < 0:
+            if timeout is None:
+                return self._reap(block=True)
+            # Same busy loop as Popen.wait(timeout)
+            deadline: float = monotonic() + timeout
+            delay: float = 0.0005
+            while not self._reap():
+                remaining: float = deadline - monotonic()
+                if remaining <= 0:
+                    return False
+                sleep(min(delay, remaining))
+                delay = min(delay * 2, 0.05)
+            return True
+
+        poller = select.poll()
+        poller.register(self.pidfd, select.POLLIN)
+        return len(poller.poll(None if timeout is None else timeout * 1000)) > 0
+
+    def _reap(self, block: bool = False) -> bool:
+        """
+        The ONLY place that reaps the child. wait4() instead of Popen.wait()/poll()
+        yields the rusage, Popen just gets its returncode set.
+        Like Popen.poll() a non-blocking call returns False while another thread reaps.
+        """
+        process: subprocess.Popen = self.process   # reset() may clear it meanwhile
+        if process is None or process.returncode is not None:
+            return True
+        if not self._reapLock.acquire(blocking=block):
+            return False
+        try:
+            if process.returncode is not None:
+                return True
             try:
-                with open(self.io_path, "r") as f:
-                    self.io = [line.rstrip('\n') for line in f.readlines()]
-            except PermissionError:
-                self.status_msg.append("[INFO] Insufficient Permissions: Can't read file " + self.io_path)
-                self.permError = True
-
-    def _read_stdout(self):
-        _current : str = ""
-        for element in self.process.stdout: # type: ignore
-
-            if self.raw:
-                _current = ''.join(format(byte, '02x') for byte in element)
-                if len(self.stdout) == 0:
-                    self.stdout.append("")
-                self.stdout[0] += _current
-
-            else:
-                try:
-                    _current = element.decode('utf-8').rstrip('\n')
-                    self.stdout.append(_current)
-
-                except UnicodeDecodeError:
-                    self.status_msg.append("[ERROR] String cannot be parsed, STDOUT converted to hex")
-                    self.raw = True
-                    self._convertToRaw(element)
-
-    def _read_stderr(self):
-        _current : str = ""
-        for element in self.process.stderr: # type: ignore
-
-            if self.raw:
-                _current = ''.join(format(byte, '02x') for byte in element)
-                if len(self.stderr) == 0:
-                    self.stderr.append("")
-                self.stderr[0] += _current
-
-            else:
-                try:
-                    _current = element.decode('utf-8').rstrip('\n')
-                    self.stderr.append(_current)
-
-                except UnicodeDecodeError:
-                    self.status_msg.append("[ERROR] String cannot be parsed, STDERR converted to hex")
-                    self.raw = True
-                    self._convertToRaw(element, stderr=True)
-                
-    def _convertToRaw(self, element: bytes, stderr: bool = False) -> None:
-        _tmp: List[str] = []
-        _current: str = ""
-
-        if not stderr:
-            _tmp = self.stdout
-        else:
-            _tmp = self.stderr
-
-        for line in _tmp:
-            _current += ''.join(format(char, '02x') for char in line.encode('utf-8'))
-            _current += "0a"   # this adds the line terminator, which was prior the list seperator
-        _current += ''.join(format(byte, '02x') for byte in element)
-
-        _tmp.clear()    # delete all encoded data
-        _tmp.append(_current)   # append all data
-
-        if not stderr:
-            self.stdout = _tmp
+                # WNOWAIT leaves a zombie, the PID stays ours while the sampler takes
+                # its last look and stops. After wait4() the PID may belong to anyone.
+                if os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT | (0 if block else os.WNOHANG)) is None:
+                    return False
+                self.ioSampler.finish()
+                pid, status, usage = os.wait4(process.pid, 0)
+            except ChildProcessError:
+                # Someone else reaped it (SIGCHLD ignored?), Popen does the same
+                process.returncode = 0
+                return True
+
+            self._exitTime = self._exitTime or monotonic()
+            self.rusage = {
+                "wall": round(self._exitTime - self._startTime, 6),
+                "utime": round(usage.ru_utime, 6),
+                "stime": round(usage.ru_stime, 6),
+                "maxrss": usage.ru_maxrss,      # KiB
+                "minflt": usage.ru_minflt,
+                "majflt": usage.ru_majflt,
+                "inblock": usage.ru_inblock,    # 512 byte blocks
+                "oublock": usage.ru_oublock,
+                "nvcsw": usage.ru_nvcsw,        # voluntary: waited for I/O
+                "nivcsw": usage.ru_nivcsw       # involuntary: preempted
+            }
+            process.returncode = os.waitstatus_to_exitcode(status)
+        finally:
+            self._reapLock.release()
+
+        self._account()
+        return True
+
+    def _program(self) -> str:
+        # Statistics key: the executable that ran, not the shell syntax around it
+        if isinstance(self.cmd, list):
+            words: List[str] = self.cmd
         else:
-            self.stderr = _tmp
\ No newline at end of file
+            try:
+                words = shlex.split(self.cmd)
+            except ValueError:  # unbalanced quotes, the shell failed on it anyway
+                words = self.cmd.split()
+        target: bool = False
+        for word in words:
+            redirect: re.Match | None = Command._REDIRECT.match(word)
+            if target or redirect or word == "exec" or Command._ASSIGNMENT.match(word):
+                # "2> log" names its target in the next word, ">&2" / "<in" carry it along
+                target = redirect is not None and redirect.end() == len(word)
+                continue
+            try:
+                return os.path.basename(Command._which(word))
+            except FileNotFoundError:
+                return os.path.basename(word)
+        return "sh"
+
+    def _account(self) -> None:
+        name: str = self._program()
+        with Command._statisticsLock:
+            total: Dict[str, float] = Command._statistics.setdefault(name, {
+                "runs": 0, "wall": 0.0, "utime": 0.0, "stime": 0.0, "maxrss": 0,
+                "inblock": 0, "oublock": 0, "nvcsw": 0, "nivcsw": 0, "rchar": 0, "wchar": 0
+            })
+            total["runs"] += 1
+            for key in ("wall", "utime", "stime"):
+                total[key] = round(total[key] + self.rusage[key], 6)
+            for key in ("inblock", "oublock", "nvcsw", "nivcsw"):
+                total[key] += self.rusage[key]
+            total["maxrss"] = max(total["maxrss"], self.rusage["maxrss"])
+            total["rchar"] += self.ioSampler.counters.get("rchar", 0)
+            total["wchar"] += self.ioSampler.counters.get("wchar", 0)
+
+    def _signal(self, signum: int) -> None:
+        # pidfd makes this race-free: a reaped PID may already belong to someone else
+        if self.process.returncode is not None:
+            return
+        if self.pidfd >= 0:
+            try:
+                signal.pidfd_send_signal(self.pidfd, signum)
+            except ProcessLookupError:
+                pass
+            return
+        os.kill(self.pid, signum)
+
+    def _onExit(self, process: subprocess.Popen) -> None:
+        # Runs in the Reactor thread as soon as the pidfd turns readable
+        if process is not self.process:
+            return      # callback of a previous run, Command got reset in between
+        self._exitTime = monotonic()
+        self._reap()    # samples /proc/<PID>/io a last time before releasing the PID
+
+    def _pollIOfile(self, force: bool = False) -> None:
+        if not self.ioSampler.sample(force) and self.ioSampler.permError:
+            self.status_msg.append("[INFO] Insufficient Permissions: Can't read file " + self.io_path)
+            self.permError = True
+
+    def _onData(self, output: _Output, chunk: bytes) -> None:
+        # Runs in the Reactor thread
+        try:
+            if not output.feed(chunk):
+                self.status_msg.append("[ERROR] String cannot be parsed, " + output.name + " converted to hex")
+                self.raw = True
+        except Exception as e:  # e.g. a failing Capture callback
+            self.status_msg.append("[ERROR] " + output.name + " capture failed: " + str(e))
+            raise
+
+    def _onClose(self, output: _Output) -> None:
+        # Runs in the Reactor thread
+        try:
+            if not output.close():
+                self.status_msg.append("[ERROR] String cannot be parsed, " + output.name + " converted to hex")
+                self.raw = True
+        finally:
+            output.eof.set()
@@ -1,8 +1,12 @@
 import json
+import os
 from typing import List
 from enum import Enum
 
-from backend.Command import Command
+from backend.Command import Capture, Command, E_Capture
+from backend.PageCache import E_Cache, PageCache
+from backend.Pipeline import Pipeline
+from backend.Scheduling import Sched
 
 class KeyLength(Enum):
     # aes does not allow larger keys
@@ -12,29 +16,17 @@ class KeyLength(Enum):
 class Key:
 
     def __init__(self, length: KeyLength = KeyLength.medium):
-        # Generate Key
-        self.cmd = Command("openssl rand " + str(length.value), raw=True)
-        self.cmd.wait()
+        # Generate Key and Init. Vektor from the kernel CSPRNG (same source as `openssl rand`),
+        # two openssl processes per File made building large file lists slow
         self.length: KeyLength = length
-        self.value: str = self.cmd.stdout[0]
-
-        if len(self.value) != self.length.value * 2:
-            self.iv = "CRASHED"
-            print(self)
-            raise SystemError("[ERROR] Keylength wrong, check logs!")
-
-        # Generate Init. Vektor
-        self.cmd.reset()
-        self.cmd.cmd = "openssl rand 16"
-        self.cmd.wait()
-        self.iv: str = self.cmd.stdout[0]
+        self.value: str = os.urandom(length.value).hex()
+        self.iv: str = os.urandom(16).hex()
 
     def _asdict(self) -> dict:
         data = {
             "length": self.length.name,
             "value": self.value,
-            "iv": self.iv,
-            "cmd": self.cmd._asdict()
+            "iv": self.iv
         }
         return data
 
@@ -56,29 +48,56 @@ class E_Mode(Enum):
 
 class Encryption:
 
+    """
+    #### === ENCRYPTION =======================================================
+
+    Encryption.__init__(key: Key, mode: E_Mode = E_Mode.AES256CBC, keepOrig: bool = True, inline: bool = False):
+
+    | `Encryption.`               | Description                                                        |
+    |-----------------------------|--------------------------------------------------------------------|
+    | `Encryption.encrypt()`      | `<path>` -> `<path>.crypt` (staging copy next to the source)       |
+    | `Encryption.decrypt()`      | `<path>.crypt` -> `<path>`                                         |
+    | `Encryption.wait()`         | Blocks until encrypt / decrypt finished                            |
+    | `Encryption.streamArgv()`   | openssl argv for a Pipeline stage, file or STDIN -> file or STDOUT |
+    | `Encryption.streamStages()` | openssl plus the disk side as Pipeline stages, see below           |
+
+    `inline=True` encrypts on the tape path instead: `TapeDrive.write()` runs
+    `openssl | dd` and `TapeDrive.read()` runs `dd | openssl -d`. No `.crypt` copy, no
+    scratch space, the file keeps its plain path and `File.cksum` describes the plaintext.
+    `self.active` tells whether the File gets encrypted at all (mode not NONE).
+
+    Disk files follow `PageCache.POLICY`: with DROP / DIRECT a dd reads the source and
+    writes the target with `PageCache.Dd()` flags, openssl itself only sees pipes.
+    `self.cmd` is always the openssl stage, `self.pipeline` the whole chain.
+    """
+
     MODE_CMD = {
-        E_Mode.AES128CBC: "openssl aes-128-cbc -pbkdf2 ",
-        E_Mode.AES256CBC: "openssl aes-256-cbc -pbkdf2 ",
-        E_Mode.AES128CTR: "openssl aes-128-ctr -pbkdf2 ",
-        E_Mode.AES256CTR: "openssl aes-256-ctr -pbkdf2 ",
+        E_Mode.AES128CBC: ["openssl", "aes-128-cbc", "-pbkdf2"],
+        E_Mode.AES256CBC: ["openssl", "aes-256-cbc", "-pbkdf2"],
+        E_Mode.AES128CTR: ["openssl", "aes-128-ctr", "-pbkdf2"],
+        E_Mode.AES256CTR: ["openssl", "aes-256-ctr", "-pbkdf2"],
     }
+    DD_BLOCK: str = "1M"    # bs of the disk side dd stages
 
-    def __init__(self, key: Key, mode: E_Mode = E_Mode.AES256CBC, keepOrig: bool = True):
+    def __init__(self, key: Key, mode: E_Mode = E_Mode.AES256CBC, keepOrig: bool = True, inline: bool = False):
         self.key = key
         self.mode = mode
-        self.cmd = Command("")
+        self.cmd = Command("", capture=Capture(E_Capture.RING), sched=Sched.BACKGROUND)   # openssl can be chatty on errors
+        self.pipeline: Pipeline = Pipeline([self.cmd])
         self.state: E_State = E_State.IDLE
+        self.sourcePath = ""
         self.targetPath = ""
         self.keepOrig: bool = keepOrig
+        self.inline: bool = inline
 
     def refresh(self) -> None:
-        self.cmd.status()
+        self.pipeline.status()
 
-        if self.cmd.running:    # do nothing if status still same
+        if self.pipeline.running:    # do nothing if status still same
             return
 
         if self.state in [E_State.ENCRYPT, E_State.DECRYPT ]:
-            if self.cmd.exitCode != 0:
+            if self.pipeline.exitCode != 0:
                 self.state = E_State.ERROR
             else:
                 self.state = E_State.IDLE
@@ -91,13 +110,10 @@ class Encryption:
 
         self.state = E_State.DECRYPT
 
+        self.sourcePath = path
         self.targetPath = ".".join([part for part in path.split('.')[:-1]]) # removes ".tail"
 
-        self.cmd.reset()
-        self.cmd.cmd = self.MODE_CMD[self.mode] + "-d -iv " + self.key.iv + " -k " + self.key.value + " -in '" + path + "' -out '" + self.targetPath + "'"
-        self.cmd.start()
-
-        self.refresh()
+        self._start(True)
 
     def encrypt(self, path: str) -> None:
         if self.state != E_State.IDLE:
@@ -105,11 +121,52 @@ class Encryption:
 
         self.state = E_State.ENCRYPT
 
+        self.sourcePath = path
         self.targetPath = path + ".crypt"
 
+        self._start(False)
+
+    def wait(self) -> None:
+        self.pipeline.wait()
+        self.refresh()
+
+    @property
+    def active(self) -> bool:
+        return self.mode in self.MODE_CMD
+
+    def streamArgv(self, decrypt: bool = False, path: str = "", target: str = "") -> List[str]:
+        # No -in: reads STDIN, no -out: writes STDOUT. openssl enc streams, CBC included
+        argv: List[str] = self.MODE_CMD[self.mode] + ["-d" if decrypt else "-e", "-iv", self.key.iv, "-k", self.key.value]
+        if path:
+            argv += ["-in", path]
+        if target:
+            argv += ["-out", target]
+        return argv
+
+    def streamStages(self, decrypt: bool = False, path: str = "", target: str = "",
+                     filesize: int = -1, sched: Sched | None = None) -> List[Command]:
+        # openssl between an optional disk source and target, the caller adds the tape side
+        def stage(argv: List[str]) -> Command:
+            return Command(argv, filesize=filesize, capture=Capture(E_Capture.RING), sched=sched)
+
+        if PageCache.POLICY is E_Cache.DEFAULT:
+            return [stage(self.streamArgv(decrypt, path, target))]  # openssl reads / writes the files itself
+        stages: List[Command] = []
+        if path:
+            stages.append(stage(["dd", "if=" + path, "bs=" + self.DD_BLOCK, "status=none"] + PageCache.Dd("iflag", path)))
+        stages.append(stage(self.streamArgv(decrypt)))
+        if target:
+            # fullblock: O_DIRECT needs whole blocks, only the last one may be short
+            stages.append(stage(["dd", "of=" + target, "bs=" + self.DD_BLOCK, "iflag=fullblock", "status=none"]
+                                + PageCache.Dd("oflag", target)))
+        return stages
+
+    def _start(self, decrypt: bool) -> None:
         self.cmd.reset()
-        self.cmd.cmd = self.MODE_CMD[self.mode] + "-e -iv " + self.key.iv + " -k " + self.key.value + " -in '" + path + "' -out '" + self.targetPath + "'"
-        self.cmd.start()
+        stages: List[Command] = self.streamStages(decrypt, self.sourcePath, self.targetPath, self.cmd.filesize, Sched.BACKGROUND)
+        self.cmd = next(stage for stage in stages if stage.cmd[0] == "openssl")
+        self.pipeline = Pipeline(stages)
+        self.pipeline.start()
 
         self.refresh()
 
@@ -119,6 +176,7 @@ class Encryption:
             "state": self.state.name,
             "mode": self.mode.name,
             "keepOrigFile": self.keepOrig,
+            "inline": self.inline,
             "newFilePath": self.targetPath,
             "key": self.key._asdict(),
             "cmd": self.cmd._asdict()
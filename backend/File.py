@@ -2,11 +2,13 @@ import json
 import os
 from enum import Enum
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 
 from backend.Checksum import Checksum, ChecksumState
 from backend.Command import Command
 from backend.Encryption import E_State, Encryption, Key
+from backend.HashEngine import HashStream
+from backend.Metadata import Metadata
 
 DEBUG: bool = True
 
@@ -41,19 +43,10 @@ class FilePath():
         if not self.path.startswith(self.context):
             raise FileNotFoundError("[ERROR] Invalid context path!")
 
-        # Full path validation
-        cmd: Command = Command("find " + self.path)
-        cmd.wait()
-
-        try:
-            if cmd.stdout[0] != self.path:
-                raise FileNotFoundError("[ERROR] Invalid Path given!")
-        except IndexError: # if len(stdout) == 0...
+        # Full path validation, in-process (no find)
+        if not Metadata.Exists(self.path):
             raise FileNotFoundError("[ERROR] Invalid Path given!")
 
-        if cmd.exitCode != 0:
-            raise SystemError("[ERROR] FIND command on path failed with unkown reason!")
-
     def refresh(self) -> None:
         self.relPath: str = os.path.relpath(self.path, self.context)
         self.name: str = os.path.basename(self.path)
@@ -94,6 +87,7 @@ class File:
         - File path (string)
     - Accepts:
         - createFile (bool): Creates the file if it does not exist (optional)
+        - inlineEncryption (bool): Encrypt on the tape path, no `.crypt` staging copy (optional)
     - Responsibilities:
         - Validates file path integrity → raises FileNotFoundError if invalid
         - Generates absolute and relative file paths
@@ -128,6 +122,7 @@ class File:
     |----------------------------|-------------------------------------------------|
     | `File.createChecksum()`    | Computes a checksum for the file                |
     | `File.validateIntegrity()` | Validates file integrity based on its checksum  |
+    | `File.streamChecksum()`    | Hashes bytes streamed elsewhere (tape transfer) |
 
     **Encryption:**
     | `File.`          | Description                                                         |
@@ -135,6 +130,9 @@ class File:
     | `File.encrypt()` | Encrypts the file and optionally removes the original after success |
     | `File.decrypt()` | Decrypts the file using a specified encryption scheme               |
 
+    Both do nothing for an inline scheme (`Encryption.inline`): the file stays plaintext
+    on disk, `TapeDrive.write()` / `read()` encrypt and decrypt it on the tape path.
+
     ### === VARIABLES ======================================================
 
     | Variable          | Type        | Description                                        |
@@ -165,7 +163,8 @@ class File:
 
     """
 
-    def __init__(self, id: int, path: str, path_context: str, createFile: bool = False) -> None:
+    def __init__(self, id: int, path: str, path_context: str, createFile: bool = False,
+                 inlineEncryption: bool = False) -> None:
         self.state: FileState = FileState.INIT
         self.state_msg: List[str] = []
         self.cmd: Command = Command("")
@@ -178,7 +177,7 @@ class File:
 
         self.path: FilePath = FilePath(path, path_context)
         self.cksum: Checksum = Checksum(self.path.path)
-        self.encryption_scheme: Encryption = Encryption(Key())
+        self.encryption_scheme: Encryption = Encryption(Key(), inline=inlineEncryption)
 
         self.readSize()
 
@@ -248,7 +247,7 @@ class File:
             return
 
         if self.state in {FileState.ENCRYPT, FileState.DECRYPT}:
-            self.encryption_scheme.cmd.wait()
+            self.encryption_scheme.wait()
             self.refresh()
             return
 
@@ -354,49 +353,69 @@ class File:
         self.cksum = c
         self.cksum.cmd.filesize = self.size
 
-    def createChecksum(self) -> None:
+    def createChecksum(self, start: bool = True, force: bool = False) -> None:
         if self.cksum.file_path != self.path.path:
             self.cksum.file_path = self.path.path
 
         if self.state is FileState.IDLE:
             self.state = FileState.CKSUM_CALC
-            self.cksum.create() # start the checksumming process
+            self.cksum.create(start, force) # start the checksumming process
 
-    def validateIntegrity(self, validationTarget: str) -> None: 
+    def validateIntegrity(self, validationTarget: str, start: bool = True, extraTargets: Dict[str, str] | None = None) -> None: 
         if self.cksum.file_path != self.path.path:
             self.cksum.file_path = self.path.path
 
         self.state = FileState.VALIDATING
-        self.cksum.validate(validationTarget)
+        self.cksum.validate(validationTarget, start, extraTargets)
+
+    def streamChecksum(self) -> HashStream | None:
+        # The caller feeds the file content, e.g. while it streams to or from tape.
+        # Validates against self.cksum.value if known, creates it otherwise.
+        if self.state is not FileState.IDLE:
+            return None
+
+        if self.cksum.file_path != self.path.path:
+            self.cksum.file_path = self.path.path
+
+        stream: HashStream | None = self.cksum.stream()
+        if stream is not None:
+            self.state = FileState.VALIDATING if self.cksum.state is ChecksumState.VALIDATE else FileState.CKSUM_CALC
+        return stream
+
+    def quickVerify(self, samples: int = Checksum.QUICK_SAMPLES, escalate: bool = False) -> dict:
+        # Spot check of a restored file, see Checksum.quickVerify(). Escalated -> VALIDATING
+        if self.state is not FileState.IDLE:
+            return {}
+
+        if self.cksum.file_path != self.path.path:
+            self.cksum.file_path = self.path.path
+
+        report: dict = self.cksum.quickVerify(samples, escalate)
+        if report["escalated"]:
+            self.state = FileState.VALIDATING
+        elif report["result"] == "MISMATCH":
+            self.state_msg.append("[ERROR] Quick verify: damaged blocks " + str(report["bad_blocks"]))
+            self.state = FileState.MISMATCH
+        return report
 
 # --- ENCRYPTION --------------------------------------------------------------
 
     def decrypt(self) -> None:
-        if self.state is FileState.IDLE:
+        if self.state is FileState.IDLE and not self.encryption_scheme.inline:
             self.state = FileState.DECRYPT
             self.encryption_scheme.decrypt(self.path.path)
 
     def encrypt(self) -> None:
-        if self.state is FileState.IDLE:
+        # Inline: TapeDrive.write() encrypts, a staging copy would get encrypted twice
+        if self.state is FileState.IDLE and not self.encryption_scheme.inline:
             self.state = FileState.ENCRYPT
             self.encryption_scheme.encrypt(self.path.path)
 
 # === INTERNAL METHOD =========================================================
 
     def readSize(self) -> None:
-        self.cmd.reset()
-        self.cmd.cmd = "stat -c %s '" + self.path.path + "'"
-        self.cmd.wait()
-
-        try:
-            self.size = int(self.cmd.stdout[0])
-        except TypeError:
-            self.size = 0
-        except IndexError:
-            self.size = 0
-        except Exception as e:
-            self.state_msg.append("[ERROR] cannot determine file size of file" + str(self) + "   Exception: " + str(e))
-            raise
+        # In-process lstat (no stat command), unreadable or missing files count as 0 bytes
+        self.size = max(Metadata.Size(self.path.path), 0)
 
         self.cksum.cmd.filesize = self.size
         self.encryption_scheme.cmd.filesize = self.size
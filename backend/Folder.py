@@ -4,22 +4,22 @@ from typing import List
 
 from backend.Encryption import E_Mode
 from backend.File import File
-from backend.Command import Command
 from backend.Checksum import ChecksumType
+from backend.Metadata import Metadata
 
 class Folder:
 
 
-    def __init__(self, path: str, checksumType: ChecksumType, encryptionMode: E_Mode = E_Mode.NONE):
+    def __init__(self, path: str, checksumType: ChecksumType, encryptionMode: E_Mode = E_Mode.NONE,
+                 inlineEncryption: bool = True):
         self.files: List[File] = []
         self.path: str = ""
         self.encMode: E_Mode = encryptionMode
+        self.inlineEnc: bool = inlineEncryption    # encrypt on the tape path, no .crypt staging copy
+        self.cksumType: ChecksumType = checksumType
         self.path = path
-        _find_cmd: str = "find '" + path + "' -maxdepth 1 -type f"
         _id = 0
-        find_files: Command = Command(_find_cmd)
-        find_files.wait()   # wait until the find process is finished, shall be instant
-        for file in find_files.stdout:
+        for file in Metadata.Files(path):   # in-process, no find
             pass
             #self.files.append(file)
 
@@ -37,6 +37,8 @@ class Folder:
         data = {
             "path": self.path,
             "encryption_type": self.encMode.name,
+            "encryption_inline": self.inlineEnc,
+            "checksum_type": self.cksumType.name,
             "files" : [file._asdict() for file in self.files]
         }
         return data
\ No newline at end of file
@@ -0,0 +1,599 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import zlib
+from time import monotonic
+from typing import Callable, Dict, Iterable, List
+
+from backend.ChecksumCache import ChecksumCache
+from backend.IOSampler import IOSampler, Throughput
+from backend.PageCache import PageCache
+from backend.Scheduling import Sched
+
+# Optional accelerated algorithms, ChecksumType.CRC32C / XXH64 / XXH3_128 need them
+try:
+    import crc32c  # type: ignore
+except ImportError:
+    crc32c = None
+try:
+    import xxhash  # type: ignore
+except ImportError:
+    xxhash = None
+
+class _CRC:
+
+    """
+    hashlib-like wrapper (`update()`, `hexdigest()`) around a CRC function
+    `crc(data, value) -> int`. The digest is the 32 bit value as 8 hex digits.
+    """
+
+    def __init__(self, crc: Callable[[bytes, int], int]) -> None:
+        self.crc: Callable[[bytes, int], int] = crc
+        self.value: int = 0
+
+    def update(self, data: bytes | bytearray | memoryview) -> None:
+        self.value = self.crc(data, self.value)
+
+    def hexdigest(self) -> str:
+        return format(self.value & 0xFFFFFFFF, "08x")
+
+class _Manifest:
+
+    """
+    Block manifest of a byte stream: one `algorithm` digest per `block` bytes,
+    the last block may be shorter. Fed with buffers of any size.
+    """
+
+    def __init__(self, algorithm: str, block: int) -> None:
+        self.algorithm: str = algorithm
+        self.block: int = block
+        self.entries: List[str] = []
+        self._hash = HashEngine.New(algorithm)
+        self._filled: int = 0
+
+    def update(self, chunk: bytes | bytearray | memoryview) -> None:
+        view: memoryview = memoryview(chunk)
+        while len(view) > 0:
+            n: int = min(len(view), self.block - self._filled)
+            self._hash.update(view[:n])
+            self._filled += n
+            view = view[n:]
+            if self._filled == self.block:
+                self._next()
+
+    def close(self) -> List[str]:
+        if self._filled > 0:
+            self._next()
+        return self.entries
+
+    def _next(self) -> None:
+        self.entries.append(self._hash.hexdigest())
+        self._hash = HashEngine.New(self.algorithm)
+        self._filled = 0
+
+class HashJob:
+
+    """
+    #### === HASHJOB ==========================================================
+
+    HashJob.__init__(path: str = "", algorithm: str = "sha256", filesize: int = -1, extra: List[str] = None):
+
+    One file hashed in-process by the HashEngine. Same life cycle as a Command
+    (`start()`, `wait()`, `status()`, `reset()`), so it can stand in wherever a
+    checksum Command used to run.
+
+    `extra` algorithms are computed in the SAME read pass: every buffer feeds
+    all hash objects, so an additional digest costs CPU only, no extra I/O.
+    `cache = True` stores the result in the ChecksumCache, `fromCache` marks a
+    job that was answered by it.
+
+    Tree mode (`treeChunk > 0`): the file is split into chunks of `treeChunk` bytes,
+    the chunks (leaves) are hashed in parallel on the pool and combined into a root:
+
+        leaf[i] = H(bytes[i * treeChunk : (i + 1) * treeChunk])
+        digest  = H(leaf[0] || leaf[1] || ...)     (binary leaf digests)
+
+    One huge file then scales with the cores, `self.leaves` pinpoints damaged regions.
+    The root differs from the plain digest, both sides must use the same `treeChunk`.
+
+    Block manifest (`manifestBlock > 0`): additionally one `manifestAlgorithm` digest
+    per `manifestBlock` bytes in `self.manifest`, same read pass. In tree mode
+    `treeChunk` must be a multiple of `manifestBlock`.
+
+    | `HashJob.`          | Description                                                |
+    |---------------------|------------------------------------------------------------|
+    | `HashJob.start()`   | Queues the job on the HashEngine                           |
+    | `HashJob.wait()`    | Blocks until hashed, timeout (sec.) cancels the job        |
+    | `HashJob.cancel()`  | Stops hashing after the current buffer                     |
+    | `HashJob.reset()`   | Cancels and clears all vars EXCEPT path, algorithm(s), filesize |
+    | `HashJob.status()`  | Refreshes `running` and `exitCode`                         |
+
+    | Var               | Type        | Description                                      |
+    |-------------------|-------------|--------------------------------------------------|
+    | `self.digest`     | `str`       | Hex digest, "" until finished                    |
+    | `self.digests`    | `Dict[str, str]` | algorithm -> hex digest, incl. `extra`      |
+    | `self.bytes`      | `int`       | Bytes hashed so far                              |
+    | `self.progress`   | `Throughput`| `bytes` over time: rate, avg. rate and ETA       |
+    | `self.fromCache`  | `bool`      | Digests taken from the ChecksumCache, no read    |
+    | `self.leaves`     | `List[str]` | Tree mode: leaf digests of the primary algorithm |
+    | `self.manifest`   | `List[str]` | Block manifest, one digest per `manifestBlock`   |
+    | `self.exitCode`   | `int`       | -1 running / never ran, 0 success, 1 failed      |
+    | `self.status_msg` | `List[str]` | Message string for error handling                |
+    """
+
+    def __init__(self, path: str = "", algorithm: str = "sha256", filesize: int = -1,
+                 extra: List[str] | None = None) -> None:
+        self.path: str = path
+        self.algorithm: str = algorithm
+        self.filesize: int = filesize
+        self.extra: List[str] = extra if extra is not None else []
+        self.cache: bool = False
+        self.treeChunk: int = 0     # bytes per leaf, 0: plain digest
+        self.manifestBlock: int = 0 # bytes per manifest entry, 0: no manifest
+        self.manifestAlgorithm: str = "crc32"
+        self.offset: int = 0        # byte range to hash, set on leaves only
+        self.length: int = -1
+        self._parent: HashJob | None = None
+        self._clear()
+
+    def start(self) -> None:
+        self._prepare()
+        HashEngine.Submit(self)
+
+    def wait(self, timeout: float = 0) -> None:
+        if not self.didRun:
+            self.start()
+        if not self._done.wait(timeout if timeout > 0 else None):
+            self.cancel()
+            self._done.wait()
+            self.status_msg.append("Timeout reached, hashing cancelled")
+        self.status()
+
+    def cancel(self) -> None:
+        self._cancelled = True
+        for part in self._parts:
+            part.cancel()
+        if self._stream is not None:
+            self._stream.close("Hashing cancelled")    # no worker would ever finish it
+
+    def reset(self) -> None:
+        if self.running:
+            self.cancel()
+            self._done.wait()
+        self._clear()
+
+    def status(self) -> None:
+        if self._done.is_set():
+            self.running = False
+        if self.running:
+            self._sample()
+
+    def total(self) -> int:
+        # Bytes this job has to hash, -1 if unknown
+        return self.length if self.length >= 0 else self.filesize
+
+    def _asdict(self) -> dict:
+        self.status()
+        return {
+            "path": self.path,
+            "algorithm": self.algorithm,
+            "running": self.running,
+            "did_ran": self.didRun,
+            "status_msg": self.status_msg,
+            "filesize": self.filesize,
+            "bytes": self.bytes,
+            "progress": self.progress._asdict(self.total()),
+            "exitCode": self.exitCode,
+            "fromCache": self.fromCache,
+            "tree_chunk": self.treeChunk,
+            "leaves": len(self.leaves),
+            "manifest": len(self.manifest),
+            "digest": self.digest,
+            "digests": self.digests
+        }
+
+    def __str__(self) -> str:
+        return json.dumps(self._asdict(), indent=2)
+
+    def fromDigests(self, digests: Dict[str, str]) -> None:
+        # Finishes the job without hashing, e.g. with digests of the ChecksumCache
+        self._prepare()
+        self.fromCache = True
+        self._finish(digests)
+        self.status()
+
+    def _prepare(self) -> None:
+        if not self.path:
+            raise ValueError("ERROR: HashJob cannot be started, path empty")
+        for algorithm in self.algorithms():
+            HashEngine.New(algorithm)   # unknown algorithm raises here, not in a worker
+        if self.manifestBlock > 0:
+            HashEngine.New(self.manifestAlgorithm)
+            if self.treeChunk % self.manifestBlock != 0:
+                raise ValueError("ERROR: HashJob treeChunk must be a multiple of manifestBlock")
+        self.progress = Throughput()    # time in the queue counts, it delays the result as well
+        self.running = True
+        self.didRun = True
+
+    def _clear(self) -> None:
+        self.running: bool = False
+        self.didRun: bool = False
+        self.digest: str = ""
+        self.digests: Dict[str, str] = {}
+        self.bytes: int = 0
+        self.progress: Throughput = Throughput()
+        self._sampled: float = 0.0
+        self.fromCache: bool = False
+        self.exitCode: int = -1
+        self.status_msg: List[str] = []
+        self._cancelled: bool = False
+        self._stream: HashStream | None = None
+        self.leaves: List[str] = []
+        self.manifest: List[str] = []
+        self._parts: List[HashJob] = []  # tree mode: leaf jobs still owned by this job
+        self._pending: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._done: threading.Event = threading.Event()
+
+    def algorithms(self) -> List[str]:
+        # Primary first, duplicates dropped
+        return list(dict.fromkeys([self.algorithm] + self.extra))
+
+    def _sample(self, force: bool = False) -> None:
+        # Pull model like the IOSampler: sampled when somebody asks, at most every INTERVAL
+        with self._lock:
+            now: float = monotonic()
+            if not force and now - self._sampled < IOSampler.INTERVAL:
+                return
+            self._sampled = now
+            if self._parts:     # tree mode: leaves count while they run, not only once finished
+                self.bytes = sum(part.bytes for part in self._parts)
+            self.progress.add(self.bytes, now)
+
+    def _finish(self, digests: Dict[str, str], error: str = "") -> None:
+        # Runs in a HashEngine worker
+        if not self.fromCache:
+            self._sample(force=True)    # exact average rate and elapsed time
+        self.digests = digests
+        self.digest = digests.get(self.algorithm, "")
+        self.exitCode = 1 if error else 0
+        if error:
+            self.status_msg.append("[ERROR] " + error)
+        self._done.set()
+        if self._parent is not None:
+            self._parent._leafDone()
+
+    def _finishTree(self, leaves: Dict[str, List[str]]) -> None:
+        # Root of every algorithm over its binary leaf digests
+        self.leaves = leaves[self.algorithm]
+        roots: Dict[str, str] = {}
+        for algorithm, digests in leaves.items():
+            root = HashEngine.New(algorithm)
+            for digest in digests:
+                root.update(bytes.fromhex(digest))
+            roots[algorithm] = root.hexdigest()
+        self._finish(roots)
+
+    def _split(self) -> List["HashJob"]:
+        # Tasks to queue: the job itself, or its leaves in tree mode
+        if self.treeChunk <= 0:
+            return [self]
+        size: int = self.filesize
+        if size < 0:
+            try:
+                size = os.stat(self.path).st_size
+            except OSError:
+                return [self]   # the worker reports the error
+        if size <= self.treeChunk:
+            return [self]       # single leaf, hashed as a whole
+
+        for offset in range(0, size, self.treeChunk):
+            part: HashJob = HashJob(self.path, self.algorithm, min(self.treeChunk, size - offset), self.extra)
+            part.offset, part.length, part._parent = offset, part.filesize, self
+            part.manifestBlock, part.manifestAlgorithm = self.manifestBlock, self.manifestAlgorithm
+            part._prepare()
+            self._parts.append(part)
+        self._pending = len(self._parts)
+        return self._parts
+
+    def _leafDone(self) -> None:
+        # Runs in a HashEngine worker, the last leaf computes the root
+        with self._lock:
+            self._pending -= 1
+            self.bytes = sum(part.bytes for part in self._parts)
+            if self._pending > 0:
+                return
+
+        for part in self._parts:
+            if part.exitCode != 0:
+                self._finish({}, "Leaf at offset " + str(part.offset) + ": " + part.status_msg[-1].removeprefix("[ERROR] "))
+                return
+        self.manifest = [entry for part in self._parts for entry in part.manifest]
+        self._finishTree({algorithm: [part.digests[algorithm] for part in self._parts] for algorithm in self.algorithms()})
+
+class HashStream:
+
+    """
+    #### === HASHSTREAM =======================================================
+
+    HashStream.__init__(job: HashJob):
+
+    Computes the digests of a HashJob from bytes that pass through Python anyway,
+    e.g. the tape data path, instead of reading `job.path` once more. The job
+    runs from construction until `close()`, results land in it as usual.
+    Tree mode produces the same leaves and root as the parallel HashEngine path.
+
+    | `HashStream.`           | Description                                         |
+    |-------------------------|-----------------------------------------------------|
+    | `HashStream.update()`   | Hashes the next chunk (all algorithms of the job)   |
+    | `HashStream.close()`    | Finishes the job, `error` fails it instead          |
+    """
+
+    def __init__(self, job: HashJob) -> None:
+        job._prepare()
+        job._stream = self
+        self.job: HashJob = job
+        self._hashes = [HashEngine.New(algorithm) for algorithm in job.algorithms()]
+        self._leaves: Dict[str, List[str]] = {algorithm: [] for algorithm in job.algorithms()}
+        self._leafBytes: int = 0
+        self._manifest: _Manifest | None = _Manifest(job.manifestAlgorithm, job.manifestBlock) if job.manifestBlock > 0 else None
+
+    def update(self, chunk: bytes | bytearray | memoryview) -> None:
+        self.job.bytes += len(chunk)
+        if self._manifest is not None:
+            self._manifest.update(chunk)
+        if self.job.treeChunk <= 0:
+            for digest in self._hashes:
+                digest.update(chunk)
+            return
+
+        view: memoryview = memoryview(chunk)
+        while len(view) > 0:
+            n: int = min(len(view), self.job.treeChunk - self._leafBytes)
+            for digest in self._hashes:
+                digest.update(view[:n])
+            self._leafBytes += n
+            view = view[n:]
+            if self._leafBytes == self.job.treeChunk:
+                self._closeLeaf()
+
+    def _closeLeaf(self) -> None:
+        for algorithm, digest in zip(self.job.algorithms(), self._hashes):
+            self._leaves[algorithm].append(digest.hexdigest())
+        self._hashes = [HashEngine.New(algorithm) for algorithm in self.job.algorithms()]
+        self._leafBytes = 0
+
+    def close(self, error: str = "") -> None:
+        if self.job._done.is_set():
+            return
+        if error:
+            self.job._finish({}, error)
+            return
+        if self._manifest is not None:
+            self.job.manifest = self._manifest.close()
+        if self.job.treeChunk > 0:
+            if self._leafBytes > 0 or not self._leaves[self.job.algorithm]:
+                self._closeLeaf()
+            self.job._finishTree(self._leaves)
+            return
+        self.job._finish({algorithm: digest.hexdigest() for algorithm, digest in zip(self.job.algorithms(), self._hashes)})
+
+class HashEngine:
+
+    """
+    #### === HASHENGINE =======================================================
+
+    In-process checksumming with `hashlib` on a pool of worker threads. Replaces one
+    `openssl <algo> -r` process per file: no fork/exec, no STDOUT parsing.
+
+    Every worker owns one preallocated buffer and streams files with `readinto()`,
+    so hashing allocates nothing per chunk. `hashlib` releases the GIL while
+    digesting, the workers really run in parallel. Reads follow `PageCache.POLICY`.
+
+    Workers are started on demand up to the thread limit (`Host.threadLimit`)
+    and exit after `IDLE_TIMEOUT` sec. without work. Every worker runs with `SCHED`
+    (`Sched.BACKGROUND`, like the hashing Commands did), so it never starves the tape stream. Tree mode jobs are queued as
+    one task per leaf, see `HashJob`.
+
+    | `HashEngine.`                  | Description                                  |
+    |--------------------------------|----------------------------------------------|
+    | `HashEngine.Submit()`          | Queues a HashJob                             |
+    | `HashEngine.SubmitBatch()`     | Queues many HashJobs, small files grouped    |
+    | `HashEngine.SetThreadLimit()`  | Max. parallel workers, default: CPU count    |
+    | `HashEngine.ThreadCount()`     | Workers currently alive                      |
+    | `HashEngine.New()`             | Hash object for an algorithm name            |
+    | `HashEngine.Available()`       | True if an algorithm can be used here        |
+
+    Algorithms are named like `ChecksumType` members in lower case. Everything
+    `hashlib` knows works (md5, sha256, sha512, blake2b, ...), plus:
+
+    | Algorithm   | Provided by            | Digest                              |
+    |-------------|------------------------|-------------------------------------|
+    | `crc32`     | `zlib` (always)        | 8 hex digits                        |
+    | `crc32c`    | `crc32c` (optional)    | 8 hex digits, SSE4.2 / ARMv8 CRC    |
+    | `xxh64`     | `xxhash` (optional)    | 16 hex digits                       |
+    | `xxh3_128`  | `xxhash` (optional)    | 32 hex digits                       |
+
+    CRCs and xxHash detect corruption, not tampering - use SHA256 / BLAKE2b where
+    the checksum has to prove authenticity.
+    """
+
+    BUFFER_SIZE: int = 1024 * 1024  # per worker
+    IDLE_TIMEOUT: float = 10.0      # sec. until an idle worker exits
+    SCHED: Sched | None = Sched.BACKGROUND  # nice / ionice of every worker thread, None: the backend's own
+
+    # SubmitBatch(): files below SMALL_FILE are packed into one task until
+    # GROUP_BYTES or GROUP_FILES is reached, one queue round trip per group
+    SMALL_FILE: int = 4 * 1024 * 1024
+    GROUP_BYTES: int = 64 * 1024 * 1024
+    GROUP_FILES: int = 1024
+
+    # Tree mode: 256MiB leaves keep the leaf list of a 4TB file at 16k entries
+    TREE_CHUNK: int = 256 * 1024 * 1024
+
+    _limit: int = os.cpu_count() or 1
+    _workers: int = 0
+    _idle: int = 0
+    _lock: threading.Lock = threading.Lock()
+    _queue: "queue.SimpleQueue[List[HashJob]]" = queue.SimpleQueue()
+
+    @staticmethod
+    def Submit(job: HashJob) -> None:
+        for task in job._split():
+            HashEngine._queue.put([task])
+        HashEngine._spawn()
+
+    @staticmethod
+    def SubmitBatch(jobs: Iterable[HashJob]) -> None:
+        """
+        Starts all jobs. Large files get a task of their own (they parallelize),
+        small ones are grouped. Every job still gets its own result: a failing
+        file never affects the others of its group.
+        """
+        jobs = list(jobs)
+        for job in jobs:
+            job._prepare()  # raises before anything got queued
+
+        # Split small files evenly across the workers, so short batches still run in parallel
+        small: List[HashJob] = [job for job in jobs if 0 <= job.filesize < HashEngine.SMALL_FILE and job.treeChunk <= 0]
+        maxBytes: int = min(HashEngine.GROUP_BYTES, max(sum(job.filesize for job in small) // HashEngine._limit, 1))
+        maxFiles: int = min(HashEngine.GROUP_FILES, max(len(small) // HashEngine._limit, 1))
+
+        group: List[HashJob] = []
+        groupBytes: int = 0
+        for job in jobs:
+            if not 0 <= job.filesize < HashEngine.SMALL_FILE or job.treeChunk > 0:
+                for task in job._split():
+                    HashEngine._queue.put([task])
+                continue
+            group.append(job)
+            groupBytes += job.filesize
+            if groupBytes >= maxBytes or len(group) >= maxFiles:
+                HashEngine._queue.put(group)
+                group, groupBytes = [], 0
+        if group:
+            HashEngine._queue.put(group)
+        HashEngine._spawn()
+
+    @staticmethod
+    def SetThreadLimit(count: int) -> None:
+        with HashEngine._lock:
+            HashEngine._limit = max(count, 1)
+        HashEngine._spawn()     # surplus workers exit after their current job
+
+    @staticmethod
+    def ThreadCount() -> int:
+        with HashEngine._lock:
+            return HashEngine._workers
+
+    @staticmethod
+    def New(algorithm: str):
+        # Raises ValueError for unknown or unavailable algorithms, like hashlib.new()
+        match algorithm:
+            case "crc32":
+                return _CRC(zlib.crc32)
+            case "crc32c":
+                if crc32c is None:
+                    raise ValueError("unsupported hash type crc32c, python module 'crc32c' missing")
+                return _CRC(crc32c.crc32c)
+            case "xxh64" | "xxh3_128":
+                if xxhash is None:
+                    raise ValueError("unsupported hash type " + algorithm + ", python module 'xxhash' missing")
+                return getattr(xxhash, algorithm)()
+        return hashlib.new(algorithm)
+
+    @staticmethod
+    def Available(algorithm: str) -> bool:
+        try:
+            HashEngine.New(algorithm)
+        except ValueError:
+            return False
+        return True
+
+    # --- PRIVATE -------------------------------------------------------------
+
+    @staticmethod
+    def _spawn() -> None:
+        with HashEngine._lock:
+            while HashEngine._workers < HashEngine._limit and HashEngine._queue.qsize() > HashEngine._idle:
+                HashEngine._workers += 1
+                HashEngine._idle += 1   # counts as idle until it picked its first job
+                threading.Thread(target=HashEngine._work, name="HashEngine", daemon=True).start()
+
+    @staticmethod
+    def _work() -> None:
+        if HashEngine.SCHED is not None:
+            HashEngine.SCHED.applyThread()  # best effort, a worker hashes at any priority
+        view: memoryview = PageCache.Buffer(HashEngine.BUFFER_SIZE)    # aligned for O_DIRECT
+        while True:
+            try:
+                task: List[HashJob] | None = HashEngine._queue.get(timeout=HashEngine.IDLE_TIMEOUT)
+            except queue.Empty:
+                task = None
+
+            with HashEngine._lock:
+                HashEngine._idle -= 1
+                if task is None:
+                    if HashEngine._queue.qsize() > 0:
+                        HashEngine._idle += 1   # Submit() raced our timeout and counted on us
+                        continue
+                    HashEngine._workers -= 1
+                    return
+
+            for job in task:
+                HashEngine._hash(job, view)
+
+            with HashEngine._lock:
+                if HashEngine._workers > HashEngine._limit:
+                    HashEngine._workers -= 1
+                    return
+                HashEngine._idle += 1
+
+    @staticmethod
+    def _hash(job: HashJob, view: memoryview) -> None:
+        if job._cancelled:  # cancelled while queued
+            job._finish({}, "Hashing cancelled")
+            return
+        try:
+            digests = [HashEngine.New(algorithm) for algorithm in job.algorithms()]
+            manifest: _Manifest | None = _Manifest(job.manifestAlgorithm, job.manifestBlock) if job.manifestBlock > 0 else None
+            with PageCache.Open(job.path, job.offset) as f:
+                before: os.stat_result = os.fstat(f.fileno())
+                if job.filesize < 0 and job.length < 0:
+                    job.filesize = before.st_size - job.offset   # known now, makes the ETA work
+                position: int = job.offset
+                remaining: int = job.length     # -1: up to EOF
+                # O_DIRECT reads whole blocks, the surplus of the last one is not hashed
+                while remaining != 0 and (n := f.readinto(view if remaining < 0 else view[:min(len(view), PageCache.Round(remaining))])):
+                    if job._cancelled:
+                        job._finish({}, "Hashing cancelled")
+                        return
+                    if remaining > 0:
+                        n = min(n, remaining)
+                    chunk: memoryview = view[:n]
+                    for digest in digests:
+                        digest.update(chunk)
+                    if manifest is not None:
+                        manifest.update(chunk)
+                    job.bytes += n
+                    PageCache.Consumed(f.fileno(), position, n)
+                    position += n
+                    if remaining > 0:
+                        remaining -= n
+                after: os.stat_result = os.fstat(f.fileno())
+        except Exception as e:  # OSError mostly, but a worker must never die
+            job._finish({}, "Cannot hash '" + job.path + "': " + str(e))
+            return
+
+        result: Dict[str, str] = {algorithm: digest.hexdigest() for algorithm, digest in zip(job.algorithms(), digests)}
+        if manifest is not None:
+            job.manifest = manifest.close()
+        if job.treeChunk > 0:
+            job._finishTree({algorithm: [digest] for algorithm, digest in result.items()})   # single leaf
+            return
+        # Modified while hashing? Then the digest matches no state of the file, never cache it
+        if job.cache and (before.st_size, before.st_mtime_ns) == (after.st_size, after.st_mtime_ns):
+            ChecksumCache.Store(before, result)
+        job._finish(result)
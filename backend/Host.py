@@ -10,6 +10,9 @@ import psutil
 
 from backend.Response import Response
 from backend.Command import Command
+from backend.ChecksumCache import ChecksumCache
+from backend.HashEngine import HashEngine
+from backend.PageCache import E_Cache, PageCache
 
 from backend.Mount import Mount
 from tbk.TDv2 import TapeDrive
@@ -65,6 +68,7 @@ class Host():
             "CPUbyCore": self.CPUbyCore,
             "threadCount": self.threadCount,
             "threadLimit": self.threadLimit,
+            "cachePolicy": PageCache.POLICY.name,
             "mem": self.mem,
             "load": self.load,
             "tape_drives": self.drives
@@ -86,6 +90,7 @@ class Host():
 
         if (count <= self.threadLimit):
             self.threadLimit = count
+            HashEngine.SetThreadLimit(count)
             _response_text = "ThreadLimit set: " + str(self.threadLimit) + " of " + str(self.threadCount)
             _status_code = 200
         else:
@@ -99,6 +104,33 @@ class Host():
         )
         return self.response
 
+    def setChecksumCache(self, path: str = ChecksumCache.DEFAULT_PATH) -> Response:
+        # Opt-in: unchanged files (device, inode, size, mtime) are not hashed again, "" disables
+        ChecksumCache.Open(path)
+        self.response = Response(
+            response= "ChecksumCache " + ("enabled: " + path if path else "disabled"),
+            mimetype="text/plain",
+            status=200
+        )
+        return self.response
+
+    def setCachePolicy(self, policy: str) -> Response:
+        # DEFAULT, DROP or DIRECT - see PageCache
+        if policy.upper() in E_Cache.__members__:
+            PageCache.SetPolicy(E_Cache[policy.upper()])
+            _response_text = "CachePolicy set: " + PageCache.POLICY.name
+            _status_code = 200
+        else:
+            _response_text = "Unknown CachePolicy '" + policy + "'! Currently: " + PageCache.POLICY.name
+            _status_code = 400
+
+        self.response = Response(
+            response= _response_text,
+            mimetype="text/plain",
+            status=_status_code
+        )
+        return self.response
+
 
     def status(self) -> Response:
         self.refresh_status()
@@ -116,6 +148,7 @@ class Host():
             "threadLimit": self.threadLimit,
             "mem": self.mem,
             "load": self.load,
+            "command_stats": Command.Statistics(),
             "tape_drives": _drives
         }
 
@@ -173,6 +206,7 @@ class Host():
 
         if (self.threadLimit == 0):     # if ThreadLimit not initialized, then set it to max.
             self.threadLimit = self.threadCount
+            HashEngine.SetThreadLimit(self.threadLimit)
 
         self.mem = psutil.virtual_memory()._asdict()
         self.load = psutil.getloadavg() if hasattr(psutil, "getloadavg") else "N/A"
@@ -0,0 +1,155 @@
+import threading
+from collections import deque
+from time import monotonic
+from typing import Deque, Dict, List, Tuple
+
+class Throughput:
+
+    """
+    #### === THROUGHPUT =======================================================
+
+    Small time-stamped history of a growing byte counter.
+
+    | `Throughput.`      | Description                                                     |
+    |--------------------|-----------------------------------------------------------------|
+    | `add(value)`       | Appends a sample (timestamp = now)                              |
+    | `rate()`           | Current bytes/sec over the last `WINDOW` samples                |
+    | `average()`        | Average bytes/sec since the first sample                        |
+    | `eta(total)`       | Seconds until `total` bytes are reached, -1 if unknown          |
+    """
+
+    HISTORY: int = 120      # samples kept
+    WINDOW: int = 5         # samples used for the current rate
+
+    def __init__(self, start: float = -1) -> None:
+        self.history: Deque[Tuple[float, int]] = deque(maxlen=self.HISTORY)
+        self.start: float = monotonic() if start < 0 else start
+        self.first: Tuple[float, int] = (self.start, 0)
+
+    def add(self, value: int, timestamp: float = -1) -> None:
+        self.history.append((monotonic() if timestamp < 0 else timestamp, value))
+
+    def current(self) -> int:
+        return self.history[-1][1] if self.history else 0
+
+    def rate(self) -> float:
+        if not self.history:
+            return 0.0
+        window: List[Tuple[float, int]] = list(self.history)[-self.WINDOW:]
+        if len(window) < 2:
+            window.insert(0, self.first)
+        return self._rate(window[0], window[-1])
+
+    def average(self) -> float:
+        if not self.history:
+            return 0.0
+        return self._rate(self.first, self.history[-1])
+
+    def eta(self, total: int) -> float:
+        rate: float = self.rate() or self.average()
+        if total <= 0 or rate <= 0:
+            return -1
+        return max(total - self.current(), 0) / rate
+
+    def _asdict(self, total: int = -1) -> dict:
+        return {
+            "bytes": self.current(),
+            "rate": round(self.rate()),
+            "avg_rate": round(self.average()),
+            "eta": round(self.eta(total), 1),
+            "elapsed": round((self.history[-1][0] if self.history else self.start) - self.start, 3)
+        }
+
+    @staticmethod
+    def _rate(a: Tuple[float, int], b: Tuple[float, int]) -> float:
+        if b[0] <= a[0]:
+            return 0.0
+        return (b[1] - a[1]) / (b[0] - a[0])
+
+class IOSampler:
+
+    """
+    #### === IOSAMPLER ========================================================
+
+    Parses `/proc/<PID>/io` into integers at a fixed cadence (`INTERVAL`) and keeps
+    a Throughput history for `rchar` (bytes read) and `wchar` (bytes written).
+
+    Progress is measured on `rchar`: every bulk command here (dd, openssl) reads its
+    input exactly once, so `rchar` against `Command.filesize` gives a usable ETA.
+
+    Thread-safe, Reactor timer and `Command.status()` may sample concurrently.
+    `finish()` takes the last sample and stops for good, `Command._reap()` calls it
+    while the child is a zombie: once the PID is released (and maybe reused by an
+    unrelated process) nothing reads `/proc/<PID>/io` anymore.
+    """
+
+    INTERVAL: float = 0.5   # sec. between two samples
+
+    def __init__(self, pid: int = -1) -> None:
+        self.path: str = f"/proc/{pid}/io" if pid >= 0 else ""
+        self.lines: List[str] = []
+        self.counters: Dict[str, int] = {}
+        self.read: Throughput = Throughput()
+        self.write: Throughput = Throughput()
+        self.permError: bool = False
+        self.stopped: bool = pid < 0
+        self.samples: int = 0   # successful samples, changes whenever the counters may have
+        self._last: float = 0.0
+        self._lock: threading.Lock = threading.Lock()
+
+    def sample(self, force: bool = False) -> bool:
+        """Returns False when the file cannot be read (anymore)"""
+        with self._lock:
+            return self._sample(force)
+
+    def finish(self) -> None:
+        # Last sample and stop in one step, no timer tick can slip in between
+        with self._lock:
+            self._sample(force=True)
+            self.stopped = True
+
+    def tick(self) -> bool:
+        # Reactor timer callback, returning False ends the timer
+        return self.sample()
+
+    def stop(self) -> None:
+        with self._lock:
+            self.stopped = True
+
+    def _asdict(self, filesize: int = -1) -> dict:
+        return {
+            "counters": dict(self.counters),
+            "read": self.read._asdict(filesize),
+            "write": self.write._asdict()
+        }
+
+    def _sample(self, force: bool) -> bool:
+        # Caller holds self._lock
+        if self.stopped or self.permError:
+            return False
+
+        now: float = monotonic()
+        if not force and now - self._last < self.INTERVAL:
+            return True
+
+        try:
+            with open(self.path, "r") as f:
+                lines: List[str] = [line.rstrip('\n') for line in f.readlines()]
+        except PermissionError:
+            self.permError = True
+            return False
+        except (FileNotFoundError, ProcessLookupError):
+            return False    # gone, keep last snapshot
+
+        self._last = now
+        self.samples += 1
+        self.lines = lines
+        for line in lines:
+            key, _, value = line.partition(":")
+            try:
+                self.counters[key] = int(value)
+            except ValueError:
+                pass
+        self.read.add(self.counters.get("rchar", 0), now)
+        self.write.add(self.counters.get("wchar", 0), now)
+        return True
@@ -0,0 +1,56 @@
+import os
+from typing import Callable, Iterable, List
+
+class Metadata:
+
+    """
+    #### === METADATA =========================================================
+
+    In-process answers for the small metadata questions that used to spawn
+    `find` / `stat`. A fork+exec per question costs milliseconds, a syscall
+    microseconds - 100k `File` objects are built in seconds instead of minutes.
+
+    Results follow the semantics of the replaced commands (no symlinks followed):
+
+    | `Metadata.`         | Replaces                                  | Result                        |
+    |---------------------|-------------------------------------------|-------------------------------|
+    | `Exists(path)`      | `find <path>`                             | True if the entry exists      |
+    | `Size(path)`        | `stat -c %s <path>`                       | Size in bytes, -1 on error    |
+    | `Sizes(paths)`      | `stat -c %s <path> ...` (batched)         | Sizes in input order          |
+    | `Files(path)`       | `find <path> -maxdepth 1 -type f`         | Paths of all regular files    |
+    | `Dirs(path)`        | `find <path> -mindepth 1 -maxdepth 1 -type d` | Paths of all sub dirs     |
+    """
+
+    @staticmethod
+    def Exists(path: str) -> bool:
+        return os.path.lexists(path)
+
+    @staticmethod
+    def Size(path: str) -> int:
+        try:
+            return os.lstat(path).st_size
+        except (OSError, ValueError):   # ValueError: embedded NUL byte
+            return -1
+
+    @staticmethod
+    def Sizes(paths: Iterable[str]) -> List[int]:
+        return [Metadata.Size(path) for path in paths]
+
+    @staticmethod
+    def Files(path: str) -> List[str]:
+        return Metadata._scan(path, lambda entry: entry.is_file(follow_symlinks=False))
+
+    @staticmethod
+    def Dirs(path: str) -> List[str]:
+        return Metadata._scan(path, lambda entry: entry.is_dir(follow_symlinks=False))
+
+    # --- PRIVATE -------------------------------------------------------------
+
+    @staticmethod
+    def _scan(path: str, match: Callable[[os.DirEntry], bool]) -> List[str]:
+        # scandir() hands out the d_type of readdir(), no stat() per entry
+        try:
+            with os.scandir(path) as entries:
+                return [entry.path for entry in entries if match(entry)]
+        except (NotADirectoryError, FileNotFoundError, PermissionError):
+            return []
@@ -0,0 +1,118 @@
+import mmap
+import os
+from enum import Enum
+from typing import BinaryIO, List
+
+class E_Cache(Enum):
+    DEFAULT = 0     # no hints, everything read or written stays in the page cache
+    DROP = 1        # sequential readahead, pages are dropped right after they were consumed
+    DIRECT = 2      # O_DIRECT with aligned buffers, the page cache is bypassed (falls back to DROP)
+
+class PageCache:
+
+    """
+    #### === PAGECACHE ========================================================
+
+    Page cache policy of the bulk streams (hashing, encryption, tape transfers).
+    A backup reads every byte once - cached, tens of TB evict everything useful
+    the co-located workloads had in memory, and nobody ever hits those pages again.
+
+    | `PageCache.`            | Description                                                    |
+    |-------------------------|----------------------------------------------------------------|
+    | `PageCache.SetPolicy()` | Policy for all streams started afterwards                      |
+    | `PageCache.Open()`      | Unbuffered reader, SEQUENTIAL hint, O_DIRECT where possible    |
+    | `PageCache.Buffer()`    | Page aligned buffer, required by O_DIRECT reads                |
+    | `PageCache.Round()`     | Read size rounded up to `ALIGN` (O_DIRECT needs aligned sizes) |
+    | `PageCache.Consumed()`  | Drops a range that was read / written (DONTNEED)               |
+    | `PageCache.Dd()`        | `iflag=` / `oflag=` arguments for dd on a disk file            |
+
+    The policy is DEFAULT unless the operator selects DROP or DIRECT, e.g. via
+    `Host.setCachePolicy()`. Only the ranges a stream consumed itself are dropped,
+    never whole files - other readers of the same file keep their pages.
+
+    Everything is a hint: a filesystem without O_DIRECT (tmpfs, some FUSE) falls
+    back to DROP, a failing fadvise is ignored. Dirty pages are never dropped,
+    written data leaves the cache once the kernel wrote it back.
+    """
+
+    POLICY: E_Cache = E_Cache.DEFAULT
+    ALIGN: int = 4096                   # logical block size O_DIRECT has to respect
+    WINDOW: int = 64 * 1024 * 1024      # writers drop behind this distance, written back by then
+
+    @staticmethod
+    def SetPolicy(policy: E_Cache) -> None:
+        PageCache.POLICY = policy
+
+    @staticmethod
+    def Open(path: str, offset: int = 0) -> BinaryIO:
+        # open() owns the fd from the opener on: closed on any error, errors name `path`
+        return open(path, "rb", buffering=0, opener=lambda name, flags: PageCache._open(name, offset))
+
+    @staticmethod
+    def Buffer(size: int) -> memoryview:
+        # Anonymous mmap starts on a page boundary, a bytearray does not
+        return memoryview(mmap.mmap(-1, PageCache.Round(size)))
+
+    @staticmethod
+    def Round(size: int) -> int:
+        return -(-size // PageCache.ALIGN) * PageCache.ALIGN
+
+    @staticmethod
+    def Consumed(fd: int, offset: int, length: int) -> None:
+        if PageCache.POLICY != E_Cache.DEFAULT and length > 0:
+            PageCache._advise(fd, offset, length, os.POSIX_FADV_DONTNEED)
+
+    @staticmethod
+    def Dd(flag: str, path: str, flags: List[str] | None = None) -> List[str]:
+        """
+        dd argument for `flag` ("iflag" / "oflag") of the disk file `path`, merged with `flags`.
+        Only for the disk side: a tape or a pipe knows neither nocache nor O_DIRECT.
+        """
+        flags = list(flags or [])
+        if PageCache.POLICY == E_Cache.DIRECT and PageCache._direct(path):
+            flags.append("direct")  # dd itself drops O_DIRECT for a short last block
+        elif PageCache.POLICY != E_Cache.DEFAULT:
+            flags.append("nocache")
+        return [flag + "=" + ",".join(flags)] if flags else []
+
+    # --- PRIVATE -------------------------------------------------------------
+
+    @staticmethod
+    def _open(path: str, offset: int) -> int:
+        fd: int = -1
+        if PageCache.POLICY == E_Cache.DIRECT and offset % PageCache.ALIGN == 0:
+            try:
+                fd = os.open(path, os.O_RDONLY | os.O_DIRECT)
+            except OSError:
+                fd = -1     # EINVAL: no O_DIRECT on this filesystem
+        if fd < 0:
+            fd = os.open(path, os.O_RDONLY)
+        try:
+            if PageCache.POLICY != E_Cache.DEFAULT:
+                PageCache._advise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            if offset > 0:
+                os.lseek(fd, offset, os.SEEK_SET)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    @staticmethod
+    def _advise(fd: int, offset: int, length: int, advice: int) -> None:
+        try:
+            os.posix_fadvise(fd, offset, length, advice)
+        except OSError:
+            pass    # ESPIPE on pipes, a hint never fails a stream
+
+    @staticmethod
+    def _direct(path: str) -> bool:
+        # dd fails hard on EINVAL, so probe first (the file or the dir it ends up in)
+        for probe in [path, os.path.dirname(path) or "."]:
+            try:
+                os.close(os.open(probe, os.O_RDONLY | os.O_DIRECT))
+                return True
+            except FileNotFoundError:
+                continue
+            except OSError:
+                return False
+        return False
@@ -0,0 +1,152 @@
+import fcntl
+import json
+import os
+import signal
+from time import monotonic
+from typing import List
+
+from backend.Command import Command
+
+class Pipeline:
+
+    """
+    #### === PIPELINE =========================================================
+
+    Pipeline.__init__(commands: List[Command]):
+    - Requires
+        - At least one Command, e.g.
+          `Pipeline([Command(["openssl", "aes-256-ctr", ...]), Command(["dd", "of=/dev/nst0", "bs=256K"])])`
+
+    Links STDOUT of every stage with STDIN of the next one through a kernel pipe,
+    like `openssl ... | dd ...` in a shell but without the shell and without any
+    intermediate file. Data never passes through Python.
+    STDERR of every stage and STDOUT of the LAST stage are captured as usual.
+
+    | `Pipeline.`           | Description                                                    |
+    |-----------------------|----------------------------------------------------------------|
+    | `Pipeline.start()`    | Wires all stages and starts them                               |
+    | `Pipeline.wait()`     | Blocks until all stages exited, timeout (sec.) kills the chain |
+    | `Pipeline.kill()`     | SIGTERM to every stage that is still running                   |
+    | `Pipeline.reset()`    | Resets every stage                                             |
+    | `Pipeline.status()`   | Refreshes all stages, always call this!                        |
+
+    | Var               | Type            | Description                                      |
+    |-------------------|-----------------|--------------------------------------------------|
+    | `self.commands`   | `List[Command]` | All stages, per-stage exit code and I/O stats    |
+    | `self.running`    | `bool`          | True while at least one stage is running         |
+    | `self.exitCodes`  | `List[int]`     | Exit code of every stage                         |
+    | `self.exitCode`   | `int`           | First non-zero exit code (like `pipefail`) or 0  |
+    | `self.status_msg` | `List[str]`     | Message string for error handling                |
+    """
+
+    PIPE_SIZE: int = 1024 * 1024    # 1MiB (default pipe-max-size), fewer wakeups per stage
+
+    def __init__(self, commands: List[Command]) -> None:
+        if len(commands) == 0:
+            raise ValueError("ERROR: Pipeline needs at least one command")
+        self.commands: List[Command] = commands
+        self.running: bool = False
+        self.didRun: bool = False
+        self.status_msg: List[str] = []
+
+    def start(self) -> None:
+        pipes: List[int] = []
+        try:
+            for upstream, downstream in zip(self.commands, self.commands[1:]):
+                r, w = os.pipe()
+                pipes += [r, w]
+                self._resize(w)
+                upstream._stdoutTarget = w
+                downstream._stdinSource = r
+
+            for command in self.commands:
+                command.start()
+        finally:
+            # Every child holds its own copy now, the parent must let go of
+            # them or the readers would never see EOF
+            for fd in pipes:
+                os.close(fd)
+            for command in self.commands:
+                command._stdinSource = None
+                command._stdoutTarget = None
+
+        self.didRun = True
+        self.status()
+
+    def wait(self, timeout: float = 0) -> None:
+        if not self.didRun:
+            self.start()
+
+        deadline: float = monotonic() + timeout
+        for command in self.commands:
+            remaining: float | None = None if timeout <= 0 else deadline - monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            if not command._waitExit(remaining):
+                break
+
+        self.status()
+        if self.running:
+            self.kill()
+            self.status_msg.append("Timeout reached, pipeline killed")
+
+    def kill(self) -> None:
+        # Only stages that were spawned, wait() would start the ones that never ran
+        started: List[Command] = [command for command in self.commands if command.process is not None]
+        for command in started:
+            command.status()
+            if command.running:
+                try:
+                    command._signal(signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+        for command in started:
+            command.cleanup()
+        self.status()
+
+    def reset(self) -> None:
+        for command in self.commands:
+            command.reset()
+        self.running = False
+        self.didRun = False
+        self.status_msg = []
+
+    def status(self) -> None:
+        for command in self.commands:
+            command.status()
+        self.running = any(command.running for command in self.commands)
+
+    @property
+    def exitCodes(self) -> List[int]:
+        return [command.exitCode for command in self.commands]
+
+    @property
+    def exitCode(self) -> int:
+        if self.running or not self.didRun:
+            return -1
+        for code in self.exitCodes:
+            if code != 0:
+                return code
+        return 0
+
+    def _asdict(self) -> dict:
+        self.status()
+        data = {
+            "running": self.running,
+            "did_ran": self.didRun,
+            "status_msg": self.status_msg,
+            "exitCode": self.exitCode,
+            "exitCodes": self.exitCodes,
+            "stages": [command._asdict() for command in self.commands]
+        }
+        return data
+
+    def __str__(self) -> str:
+        return json.dumps(self._asdict(), indent=2)
+
+    @staticmethod
+    def _resize(fd: int) -> None:
+        try:
+            fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, Pipeline.PIPE_SIZE)  # type: ignore
+        except (AttributeError, OSError):
+            pass    # Python < 3.10 or limited by /proc/sys/fs/pipe-max-size
@@ -0,0 +1,194 @@
+import heapq
+import os
+import selectors
+import sys
+import threading
+from collections import deque
+from itertools import count
+from time import monotonic
+from typing import Callable, Deque, List, Tuple
+
+class Reactor:
+
+    """
+    #### === REACTOR ==========================================================
+
+    One background thread that multiplexes the pipes of ALL running Commands
+    via `selectors` (epoll on Linux). Without it every Command would need two
+    reader threads, so a 64-file checksum run would spawn 128 threads.
+
+    The thread is started on the first registration and lives as long as the backend.
+    All selector modifications are queued and executed by the reactor thread itself,
+    so callers never touch the selector while it is polled.
+
+    | `Reactor.`              | Description                                                      |
+    |-------------------------|------------------------------------------------------------------|
+    | `Reactor.Register()`    | Reads `fd` until EOF, every chunk goes to `onData(chunk)`        |
+    |                         | then the fd gets closed and `onClose()` is called                |
+    | `Reactor.Writable()`    | Calls `onWritable()` whenever `fd` accepts data, the return value|
+    |                         | decides: KEEP polling, PAUSE (re-arm with `Writable()`) or CLOSE |
+    | `Reactor.Watch()`       | Calls `onReady()` ONCE when `fd` becomes readable, then closes it|
+    |                         | (e.g. a pidfd: exact exit time without a waiting thread)         |
+    | `Reactor.Every()`       | Calls `callback()` every `interval` sec. until it returns False  |
+    | `Reactor.ThreadCount()` | Number of reactor threads (0 or 1), useful for tests             |
+
+    NOTE: The reactor OWNS every registered fd and closes it after EOF. Never close it yourself!
+    NOTE: Callbacks run in the reactor thread, keep them short - they block all other pipes.
+    """
+
+    CHUNK_SIZE: int = 65536     # max. bytes per read
+
+    # onWritable() results
+    KEEP: int = 0
+    PAUSE: int = 1
+    CLOSE: int = 2
+
+    _selector: selectors.BaseSelector = None # type: ignore
+    _thread: threading.Thread = None # type: ignore
+    _lock: threading.Lock = threading.Lock()
+    _pending: Deque[Callable[[], None]] = deque()
+    _wakeup_r: int = -1
+    _wakeup_w: int = -1
+    _timers: List[Tuple[float, int, float, Callable[[], bool]]] = []
+    _sequence = count()     # tie-breaker, callbacks are not comparable
+
+    @staticmethod
+    def Register(fd: int, onData: Callable[[bytes], None], onClose: Callable[[], None]) -> None:
+        os.set_blocking(fd, False)
+        Reactor._submit(lambda: Reactor._selector.register(
+            fd, selectors.EVENT_READ, (onData, onClose)))
+
+    @staticmethod
+    def Writable(fd: int, onWritable: Callable[[int], int]) -> None:
+        os.set_blocking(fd, False)
+        Reactor._submit(lambda: Reactor._selector.register(
+            fd, selectors.EVENT_WRITE, onWritable))
+
+    @staticmethod
+    def Watch(fd: int, onReady: Callable[[], None]) -> None:
+        Reactor._submit(lambda: Reactor._selector.register(
+            fd, selectors.EVENT_READ, onReady))
+
+    @staticmethod
+    def Every(interval: float, callback: Callable[[], bool]) -> None:
+        Reactor._submit(lambda: heapq.heappush(Reactor._timers,
+            (monotonic() + interval, next(Reactor._sequence), interval, callback)))
+
+    @staticmethod
+    def ThreadCount() -> int:
+        return 1 if Reactor._thread is not None and Reactor._thread.is_alive() else 0
+
+    # --- PRIVATE -------------------------------------------------------------
+
+    @staticmethod
+    def _submit(operation: Callable[[], None]) -> None:
+        with Reactor._lock:
+            if Reactor._thread is None:
+                Reactor._start()
+            Reactor._pending.append(operation)
+        os.write(Reactor._wakeup_w, b"\0")
+
+    @staticmethod
+    def _start() -> None:
+        Reactor._selector = selectors.DefaultSelector()
+        Reactor._wakeup_r, Reactor._wakeup_w = os.pipe()
+        os.set_blocking(Reactor._wakeup_r, False)
+        Reactor._selector.register(Reactor._wakeup_r, selectors.EVENT_READ, None)
+        Reactor._thread = threading.Thread(target=Reactor._run, name="Reactor", daemon=True)
+        Reactor._thread.start()
+
+    @staticmethod
+    def _run() -> None:
+        while True:
+            for key, mask in Reactor._selector.select(Reactor._runTimers()):
+                if key.data is None:
+                    Reactor._drainPending()
+                elif key.events & selectors.EVENT_WRITE:
+                    Reactor._write(key.fd, key.data)
+                elif isinstance(key.data, tuple):
+                    Reactor._read(key.fd, *key.data)
+                else:
+                    Reactor._watch(key.fd, key.data)
+
+    @staticmethod
+    def _runTimers() -> float | None:
+        # Fires all due timers, returns the select() timeout until the next one
+        while Reactor._timers:
+            deadline, sequence, interval, callback = Reactor._timers[0]
+            now: float = monotonic()
+            if deadline > now:
+                return deadline - now
+
+            heapq.heappop(Reactor._timers)
+            try:
+                again: bool = callback()
+            except Exception as e:
+                print("[ERROR] Reactor: timer callback failed: " + str(e), file=sys.stderr)
+                again = False
+            if again:
+                heapq.heappush(Reactor._timers, (max(deadline + interval, now), sequence, interval, callback))
+        return None
+
+    @staticmethod
+    def _drainPending() -> None:
+        try:
+            while os.read(Reactor._wakeup_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        while True:
+            with Reactor._lock:
+                if not Reactor._pending:
+                    return
+                operation = Reactor._pending.popleft()
+            try:
+                operation()
+            except Exception as e:
+                print("[ERROR] Reactor: " + str(e), file=sys.stderr)
+
+    @staticmethod
+    def _read(fd: int, onData: Callable[[bytes], None], onClose: Callable[[], None]) -> None:
+        try:
+            chunk: bytes = os.read(fd, Reactor.CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            chunk = b""
+
+        try:
+            if chunk:
+                onData(chunk)
+                return
+        except Exception as e:
+            print("[ERROR] Reactor: reader callback failed, closing fd " + str(fd) + ": " + str(e), file=sys.stderr)
+
+        Reactor._selector.unregister(fd)
+        os.close(fd)
+        try:
+            onClose()
+        except Exception as e:
+            print("[ERROR] Reactor: close callback failed: " + str(e), file=sys.stderr)
+
+    @staticmethod
+    def _write(fd: int, onWritable: Callable[[int], int]) -> None:
+        try:
+            result: int = onWritable(fd)
+        except Exception as e:
+            print("[ERROR] Reactor: writer callback failed, closing fd " + str(fd) + ": " + str(e), file=sys.stderr)
+            result = Reactor.CLOSE
+
+        if result == Reactor.KEEP:
+            return
+        Reactor._selector.unregister(fd)
+        if result == Reactor.CLOSE:
+            os.close(fd)
+
+    @staticmethod
+    def _watch(fd: int, onReady: Callable[[], None]) -> None:
+        Reactor._selector.unregister(fd)
+        os.close(fd)
+        try:
+            onReady()
+        except Exception as e:
+            print("[ERROR] Reactor: watch callback failed: " + str(e), file=sys.stderr)
@@ -0,0 +1,145 @@
+import ctypes
+import os
+import platform
+import resource
+import threading
+from enum import Enum
+from typing import Dict, List, Set, Tuple
+
+class E_IOClass(Enum):
+    NONE = 0            # keep the kernel default (best-effort, derived from nice)
+    REALTIME = 1        # needs CAP_SYS_ADMIN
+    BEST_EFFORT = 2
+    IDLE = 3            # only gets disk time when nobody else wants it
+
+class Sched:
+
+    """
+    #### === SCHED ============================================================
+
+    Scheduling class of a Command: CPU priority (nice), I/O priority (ionice),
+    CPU affinity and resource limits. Applied to the child right after it was
+    spawned (no preexec_fn, so posix_spawn/vfork stay usable). Threads created
+    later by the child inherit all of it.
+
+    Sched.__init__(name: str = "custom", nice: int = None, ioClass: E_IOClass = E_IOClass.NONE,
+                   ioLevel: int = 4, cpus: Set[int] = None, rlimits: Dict[int, Tuple[int, int]] = None)
+
+    | Sched.      | Type                   | Description                                          |
+    |-------------|------------------------|------------------------------------------------------|
+    | `nice`      | int                    | -20 (highest) ... 19 (lowest), None keeps the parent |
+    | `ioClass`   | E_IOClass              | I/O scheduling class                                 |
+    | `ioLevel`   | int                    | 0 (highest) ... 7 (lowest), ignored for IDLE         |
+    | `cpus`      | Set[int]               | CPU affinity mask, None = all CPUs                   |
+    | `rlimits`   | Dict[int, (soft,hard)] | e.g. `{resource.RLIMIT_AS: (2**30, 2**30)}`          |
+
+    **Presets:**
+    | Preset             | Use case                                                         |
+    |--------------------|------------------------------------------------------------------|
+    | `Sched.STREAMING`  | dd feeding the tape drive, an underrun makes the drive shoe-shine |
+    | `Sched.BACKGROUND` | hashing / encryption, must not starve the tape stream            |
+
+    `applyThread()` applies the same to the calling thread instead (e.g. in-process
+    hashing workers), nice, I/O priority and affinity are per thread on Linux.
+    Resource limits are per process and skipped there.
+
+    Raising the priority (negative nice, REALTIME) needs privileges. A failing step
+    never aborts the Command, it is reported via `apply()` and ends up in `Command.status_msg`.
+    So `Sched.STREAMING` only asks for a negative nice when running as root, otherwise it
+    keeps the parent's nice and relies on the highest best-effort I/O level.
+    """
+
+    # ioprio_set / ioprio_get have no libc wrapper, syscall numbers per architecture
+    _IOPRIO_SYSCALLS: Dict[str, Tuple[int, int]] = {
+        "x86_64": (251, 252),
+        "i386": (289, 290),
+        "i686": (289, 290),
+        "aarch64": (30, 31),
+        "armv7l": (314, 315),
+        "armv6l": (314, 315),
+        "riscv64": (30, 31),
+        "ppc64le": (273, 274),
+    }
+    _IOPRIO_WHO_PROCESS: int = 1
+    _IOPRIO_CLASS_SHIFT: int = 13
+
+    STREAMING: "Sched"
+    BACKGROUND: "Sched"
+
+    def __init__(self, name: str = "custom", nice: int | None = None, ioClass: E_IOClass = E_IOClass.NONE,
+                 ioLevel: int = 4, cpus: Set[int] | None = None,
+                 rlimits: Dict[int, Tuple[int, int]] | None = None) -> None:
+        self.name: str = name
+        self.nice: int | None = nice
+        self.ioClass: E_IOClass = ioClass
+        self.ioLevel: int = ioLevel
+        self.cpus: Set[int] | None = cpus
+        self.rlimits: Dict[int, Tuple[int, int]] = rlimits if rlimits is not None else {}
+
+    def apply(self, pid: int) -> List[str]:
+        """Applies everything to `pid`, returns one message per failed step"""
+        errors: List[str] = []
+
+        if self.nice is not None:
+            try:
+                os.setpriority(os.PRIO_PROCESS, pid, self.nice)
+            except OSError as e:
+                errors.append("[INFO] Sched '" + self.name + "': cannot set nice " + str(self.nice) + ": " + str(e))
+
+        if self.ioClass is not E_IOClass.NONE:
+            try:
+                Sched._ioprio(0, pid, (self.ioClass.value << Sched._IOPRIO_CLASS_SHIFT) | (self.ioLevel & 0x7))
+            except OSError as e:
+                errors.append("[INFO] Sched '" + self.name + "': cannot set I/O class " + self.ioClass.name + ": " + str(e))
+
+        if self.cpus is not None:
+            try:
+                os.sched_setaffinity(pid, self.cpus)
+            except OSError as e:
+                errors.append("[INFO] Sched '" + self.name + "': cannot set CPU affinity: " + str(e))
+
+        for limit, values in self.rlimits.items():
+            try:
+                resource.prlimit(pid, limit, values)
+            except (OSError, ValueError) as e:
+                errors.append("[INFO] Sched '" + self.name + "': cannot set rlimit " + str(limit) + ": " + str(e))
+
+        return errors
+
+    def applyThread(self) -> List[str]:
+        """Applies everything but rlimits to the calling thread, returns one message per failed step"""
+        return Sched(self.name, self.nice, self.ioClass, self.ioLevel, self.cpus).apply(threading.get_native_id())
+
+    @staticmethod
+    def GetIOPrio(pid: int) -> Tuple[E_IOClass, int]:
+        value: int = Sched._ioprio(1, pid)
+        return E_IOClass(value >> Sched._IOPRIO_CLASS_SHIFT), value & 0x7
+
+    def _asdict(self) -> dict:
+        return {
+            "name": self.name,
+            "nice": self.nice,
+            "ioClass": self.ioClass.name,
+            "ioLevel": self.ioLevel,
+            "cpus": sorted(self.cpus) if self.cpus is not None else None,
+            "rlimits": {str(limit): list(values) for limit, values in self.rlimits.items()}
+        }
+
+    @staticmethod
+    def _ioprio(get: int, pid: int, value: int = 0) -> int:
+        numbers: Tuple[int, int] | None = Sched._IOPRIO_SYSCALLS.get(platform.machine())
+        if numbers is None:
+            raise OSError("ioprio syscalls unknown on " + platform.machine())
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        if get:
+            result: int = libc.syscall(numbers[1], Sched._IOPRIO_WHO_PROCESS, pid)
+        else:
+            result = libc.syscall(numbers[0], Sched._IOPRIO_WHO_PROCESS, pid, value)
+        if result < 0:
+            errno: int = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return result
+
+Sched.STREAMING = Sched("streaming", nice=-5 if os.geteuid() == 0 else None, ioClass=E_IOClass.BEST_EFFORT, ioLevel=0)
+Sched.BACKGROUND = Sched("background", nice=10, ioClass=E_IOClass.BEST_EFFORT, ioLevel=7)
@@ -0,0 +1,34 @@
+from typing import Callable, Hashable
+
+class Snapshot:
+
+    """
+    #### === SNAPSHOT =========================================================
+
+    Caches the serialized form (`_asdict()`) of an object until its state key changes.
+    The key is a cheap tuple of everything that can alter the output (counters, flags,
+    lengths), so polling a finished object at 1 Hz costs one tuple compare.
+
+    | `Snapshot.`      | Description                                                     |
+    |------------------|-----------------------------------------------------------------|
+    | `get(key, build)`| Returns the cached dict, calls `build()` only if `key` changed  |
+    | `invalidate()`   | Forces a rebuild on the next `get()`                            |
+    | `builds`         | Number of rebuilds, useful for tests                            |
+
+    NOTE: The returned dict is shared between callers, treat it as read-only!
+    """
+
+    def __init__(self) -> None:
+        self.key: Hashable = None
+        self.data: dict | None = None
+        self.builds: int = 0
+
+    def get(self, key: Hashable, build: Callable[[], dict]) -> dict:
+        if self.data is None or key != self.key:
+            self.data = build()
+            self.key = key
+            self.builds += 1
+        return self.data
+
+    def invalidate(self) -> None:
+        self.data = None
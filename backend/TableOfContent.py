@@ -5,8 +5,8 @@ from datetime import datetime
 from typing import List
 
 from backend.TapeDrive import TapeDrive
-from backend.Command import Command
 from backend.Folder import Folder
+from backend.Metadata import Metadata
 
 """_summary_
     Host must create a suitable TOC, with a valid TapeDrive object.
@@ -68,10 +68,8 @@ class TableOfContent:
 
 
     def _scanSubDirs(self):
-        # -mindepth 1 is used so the root dir is not element of folder{}
-        self.command = Command("find '" + self.rootFolder.path + "' -mindepth 1 -maxdepth 1 -type d")
-        self.command.wait()
-        for folder in self.command.stdout:
+        # Sub dirs only, the root dir is not element of folder{}
+        for folder in Metadata.Dirs(self.rootFolder.path):
             self.folder.append(Folder(folder))
 
     def __init__(self, rootFolder: Folder, header: TOC_Header) -> None:
@@ -82,8 +82,22 @@ class Tape():
     | state            | E_Tape | Enum for basic state machine                   |
     | blocksize        | str    | Allows different blocksizes                    |
 
+    `Tape.Bytes("256K")` converts a dd-style size (K, M, G, T suffix = powers of 1024) into bytes.
     """
 
+    @staticmethod
+    def Bytes(size: str) -> int:
+        units: dict = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+        number: str = size.strip().upper().removesuffix("B")
+        unit: str = number[-1] if number and number[-1] in "KMGT" else ""
+        try:
+            value: int = int(number[:len(number) - len(unit)]) * units[unit]
+        except ValueError:
+            raise ValueError("[ERROR] Invalid blocksize '" + size + "'")
+        if value <= 0:
+            raise ValueError("[ERROR] Invalid blocksize '" + size + "'")
+        return value
+
     def __init__(self, hardware_id: str, blocksize: str = "256K")-> None:
 
         self.lto_version: E_LTOv = E_LTOv.NONE
@@ -1,10 +1,18 @@
 import json
-from time import sleep
+import os
+import threading
+from time import monotonic, sleep
 from enum import Enum
-import uuid
+from typing import BinaryIO, List
 
+from backend.Checksum import Checksum, ChecksumState
 from backend.File import File
-from backend.Command import Command
+from backend.Command import Capture, Command, E_Capture
+from backend.Encryption import Encryption
+from backend.HashEngine import HashEngine, HashStream
+from backend.PageCache import PageCache
+from backend.Pipeline import Pipeline
+from backend.Scheduling import Sched
 
 from backend.Tape import Tape, E_Tape
 
@@ -151,16 +159,237 @@ class TD_State(Enum):
     TEST_READ = 7,
     ERROR = -1
 
+class _Tee:
+
+    """
+    Hashes the data of a tape transfer while it streams through Python, the
+    file is read (or written) exactly once:
+    - write: file -> HashStream -> dd STDIN -> tape
+    - read:  tape -> dd STDOUT -> HashStream -> file
+    - verify: tape -> dd STDOUT -> HashStream (no target, nothing touches the disk)
+
+    Inline encryption puts openssl between Python and dd as a Pipeline, the ciphertext
+    only passes a kernel pipe: file -> HashStream -> openssl | dd -> tape and back.
+    The HashStream always sees the plaintext.
+
+    A helper thread feeds the first stage (write) or drains STDOUT of the last one through
+    its own pipe (read), hashing and disk writes never run in the shared Reactor thread.
+    It closes the HashStream once every stage exited, so `File.wait()` returns without
+    anyone polling the TapeDrive.
+    A failing stage, source or target fails the checksum as well.
+    Source and target follow `PageCache.POLICY`, the target is written buffered.
+    The thread runs with `Sched.STREAMING` like its dd: it hashes on the tape's data
+    path, `Sched.BACKGROUND` there would throttle the drive it feeds.
+    """
+
+    def __init__(self, stream: HashStream, source: str = "", target: str = "") -> None:
+        self.command: Command | None = None     # the stage Python feeds (write) or reads (read)
+        self.stages: List[Command] = []
+        self.stream: HashStream = stream
+        self.source: str = source
+        self.target: BinaryIO | None = None
+        self.error: str = ""
+        self.written: int = 0
+        self.dropped: int = 0
+        self._pipe: int = -1    # read end of the last stage's STDOUT (read / verify)
+        self.thread: threading.Thread = threading.Thread(target=self._run, name="TapeDrive", daemon=True)
+        if target:
+            try:
+                self.target = open(target, "wb")
+            except OSError as e:
+                self.error = "Cannot write '" + target + "': " + str(e)
+
+    def start(self, command: Command | Pipeline) -> None:
+        self.stages = command.commands if isinstance(command, Pipeline) else [command]
+        self.command = self.stages[0] if self.source else self.stages[-1]
+        if self.source:
+            command.start()
+        else:
+            # Wired like a Pipeline stage: STDOUT bypasses the Reactor, the kernel pipe is the bounded queue
+            self._pipe, w = os.pipe()
+            Pipeline._resize(w)
+            self.command._stdoutTarget = w # type: ignore
+            try:
+                command.start()
+            finally:
+                os.close(w)     # the child holds its copy, EOF once the last stage exited
+                self.command._stdoutTarget = None # type: ignore
+        self.thread.start()
+
+    def _consume(self, chunk: memoryview) -> None:
+        if self.error:
+            return  # keep draining, the stage must not block on a full pipe
+        if self.target is not None:
+            try:
+                self.target.write(chunk)
+            except OSError as e:
+                self.error = "Cannot write '" + self.target.name + "': " + str(e)
+                return
+            self.written += len(chunk)
+            if self.written - self.dropped > 2 * PageCache.WINDOW:
+                # Only clean pages go, the last WINDOW is most likely still dirty
+                PageCache.Consumed(self.target.fileno(), self.dropped, self.written - PageCache.WINDOW - self.dropped)
+                self.dropped = self.written - PageCache.WINDOW
+        self.stream.update(chunk)
+
+    def _run(self) -> None:
+        Sched.STREAMING.applyThread()   # best effort, like the stages
+        if self.source:
+            self._feed()
+        else:
+            self._drain()
+
+        exitCodes: List[int | None] = [stage.join() for stage in self.stages]
+        if self.target is not None:
+            try:
+                self.target.flush()
+                PageCache.Consumed(self.target.fileno(), self.dropped, self.written - self.dropped)
+                self.target.close()
+            except OSError as e:
+                self.error = self.error or "Cannot write '" + self.target.name + "': " + str(e)
+
+        for stage, exitCode in zip(self.stages, exitCodes):
+            if not self.error and exitCode != 0:
+                self.error = self._name(stage) + " failed with exit code " + str(exitCode)
+        self.stream.close(self.error)
+
+    @staticmethod
+    def _name(command: Command) -> str:
+        return command.cmd[0] if isinstance(command.cmd, list) else command.cmd.split()[0]
+
+    def _drain(self) -> None:
+        view: memoryview = memoryview(bytearray(HashEngine.BUFFER_SIZE))
+        with open(self._pipe, "rb", buffering=0) as f:
+            while n := f.readinto(view):
+                self._consume(view[:n])
+
+    def _feed(self) -> None:
+        try:
+            view: memoryview = PageCache.Buffer(HashEngine.BUFFER_SIZE)
+            position: int = 0
+            with PageCache.Open(self.source) as f:
+                while n := f.readinto(view):
+                    self.stream.update(view[:n])
+                    self.command.write(view[:n]) # type: ignore  # copies the chunk
+                    PageCache.Consumed(f.fileno(), position, n)
+                    position += n
+        except (BrokenPipeError, ValueError):
+            self.error = self._name(self.command) + " closed its input early" # type: ignore
+        except OSError as e:
+            self.error = "Cannot read '" + self.source + "': " + str(e)
+        finally:
+            self.command.closeStdin() # type: ignore
+
+class _Verify:
+
+    """
+    TEST_READ pass: reads the given Files back from tape one after another and
+    hashes them in memory, compared against the known values of `File.cksum`
+    (e.g. from the TOC). The Files themselves are not touched, every tape file
+    gets verified with a `Checksum.copy()`.
+
+    Per File one report entry, `result`:
+    - OK:         digest (and leaves / manifest) match
+    - MISMATCH:   damaged, `bad_blocks` / `bad_leaves` locate it if recorded
+    - UNVERIFIED: no known checksum, `actual` is what the tape holds now
+    - SKIPPED:    ChecksumType.NONE, read past without hashing
+    - ERROR:      dd failed, the pass stops (the tape position is unknown)
+
+    The per-file Commands belong to this thread alone (`TapeDrive.command` is left alone),
+    others only see `self.last`, a snapshot of the Command that finished last.
+    """
+
+    def __init__(self, drive: "TapeDrive", files: List[File]) -> None:
+        self.drive: TapeDrive = drive
+        self.files: List[File] = files
+        self.report: List[dict] = []
+        self.last: dict = {}
+        self.thread: threading.Thread = threading.Thread(target=self._run, name="TapeDrive", daemon=True)
+
+    def running(self) -> bool:
+        return self.thread.is_alive()
+
+    def failed(self) -> bool:
+        return any(entry["result"] == "ERROR" for entry in self.report)
+
+    def _run(self) -> None:
+        for file in self.files:
+            entry: dict = self._verify(file)
+            self.report.append(entry)
+            if entry["result"] == "ERROR":
+                break
+
+    def _verify(self, file: File) -> dict:
+        cksum: Checksum = file.cksum.copy(file.path.path)
+        known: bool = len(cksum.value) > 0
+        stream: HashStream | None = cksum.stream()
+        entry: dict = {"id": file.id, "path": file.path.path, "type": cksum.type.name, "expected": cksum.value}
+
+        argv: List[str] = ["dd", "if=" + self.drive.path, "bs=" + self.drive.blocksize, "status=none"]
+        if stream is None:
+            # Nothing to compare, only move past this tape file
+            command: Command = Command(argv + ["of=/dev/null"], filesize=file.size, capture=Capture(E_Capture.RING),
+                                       sched=Sched.STREAMING)
+            command.wait()
+            self.last = command._asdict()
+            entry.update({"result": "SKIPPED" if command.exitCode == 0 else "ERROR", "bytes": -1})
+            return entry
+
+        tee: _Tee = _Tee(stream)
+        crypt: Encryption | None = TapeDrive._crypt(file)
+        if crypt is None:
+            tee.start(Command(argv, filesize=file.size, capture=Capture(E_Capture.RING), sched=Sched.STREAMING))
+        else:
+            # The checksum describes the plaintext, so it gets decrypted in memory as well
+            tee.start(Pipeline([
+                Command(argv, filesize=file.size, capture=Capture(E_Capture.RING), sched=Sched.STREAMING),
+                Command(crypt.streamArgv(decrypt=True), capture=Capture(E_Capture.RING), sched=Sched.STREAMING)]))
+        tee.thread.join()
+        for stage in tee.stages:
+            stage.cleanup()     # join() does not, thousands of files would leak a pidfd each
+        self.last = tee.stages[-1]._asdict()
+        cksum._status()
+
+        entry.update({"bytes": cksum.cmd.bytes, "actual": cksum.value})
+        match cksum.state:
+            case ChecksumState.IDLE:
+                entry["result"] = "OK" if known else "UNVERIFIED"
+            case ChecksumState.MISMATCH:
+                entry.update({"result": "MISMATCH", "bad_blocks": cksum.bad_blocks, "bad_leaves": cksum.bad_leaves})
+            case _:
+                entry.update({"result": "ERROR", "message": cksum.cmd.status_msg})
+        return entry
+
+    def _asdict(self) -> dict:
+        results: List[str] = [entry["result"] for entry in self.report]
+        return {
+            "running": self.running(),
+            "files": len(self.files),
+            "verified": len(self.report),
+            "summary": {result: results.count(result) for result in dict.fromkeys(results)},
+            "last_command": self.last,
+            "report": self.report
+        }
+
 class TapeDrive:
 
     """#### === TapeDrive =====================================================
-    
+
+    Files with a checksum type are hashed on the fly while they stream to or from
+    tape (see `_Tee`), there is no separate read pass before a write or after a read.
+    The digest describes the bytes dd actually got (write) or delivered (read).
+
+    Files with `Encryption.inline` are encrypted on the way to tape (`openssl | dd`) and
+    decrypted on the way back (`dd | openssl -d`), `self.command` is the Pipeline then.
+    The digest describes the plaintext, `verify()` decrypts in memory to check it.
     """
 
     """_summary_
     Main Interfaces:
         - write(file: File)               -> Main WRITE Command
         - read() -> List[Folder]          -> Main READ Command
+        - readRange(file, offset, length) -> re-reads a part of a file (repair / resume)
+        - verify(files: List[File])       -> TEST_READ, hashes tape content in memory, see self.verification
         - writeInit(toc: TableOfContent)  -> rewinds tape and write TOC
         - readToc() -> TableOfContent     -> rewinds tape and returns TOC
         - clearErrorState() -> None:      -> User can clear Error
@@ -187,6 +416,7 @@ class TapeDrive:
     generic_path: str = ""
     command: Command = None
     file: File = None
+    PROBE_INTERVAL: float = 10.0    # sec. between two media probes while idle (tape inserted?)
 
     """_summary_
         This Backend is written for SCSI/SAS-Drives but can support other drives via an override.
@@ -317,6 +547,10 @@ class TapeDrive:
         self.drive_override = drive_override
         self.blocksize = blocksize
         self.file = None
+        self._settled: Command = None   # last command whose completion got processed
+        self._tee: _Tee | None = None   # hashes the current write / read
+        self.verification: _Verify | None = None    # last TEST_READ pass
+        self._probed: float = 0.0       # monotonic() of the last inquiry / mode sense
         self._refresh()
 
     def _inquiry(self) -> None:
@@ -334,7 +568,7 @@ class TapeDrive:
 
         # Sensible to override
         if not self.inquiryCommand:
-            self.command = Command("sg_raw --binary -r 1k '" + self.generic_path +  "' 12 1 83 0 2a 0", 0, True)
+            self.command = Command(["sg_raw", "--binary", "-r", "1k", self.generic_path, "12", "1", "83", "0", "2a", "0"], 0, True)
         else:
             self.command = self.inquiryCommand
 
@@ -351,9 +585,10 @@ class TapeDrive:
 
         self.state = TD_State.IDLE
         
-        self.vendor = bytes.fromhex(self.command.stdout[0]).decode("ascii", errors="replace")[8:16].strip()
-        self.model = bytes.fromhex(self.command.stdout[0]).decode("ascii", errors="replace")[16:31].strip()
-        self.serial = bytes.fromhex(self.command.stdout[0]).decode("ascii", errors="replace")[32:42].strip()
+        inquiry: bytes = bytes(self.command.stdoutRaw)
+        self.vendor = inquiry[8:16].decode("ascii", errors="replace").strip()
+        self.model = inquiry[16:31].decode("ascii", errors="replace").strip()
+        self.serial = inquiry[32:42].decode("ascii", errors="replace").strip()
 
     def _readModeSense(self) -> None:
         
@@ -362,7 +597,7 @@ class TapeDrive:
 
         # Sensible to override
         if not self.readModeSenseCommand:
-            self.command = Command("sg_raw --binary -r 1k '" + self.generic_path +  "' 5a 0 0 0 0 0 0 0 4 0", 0, True)
+            self.command = Command(self._modeSenseArgv(), 0, True)
         else:
             self.command = self.readModeSenseCommand
 
@@ -372,22 +607,33 @@ class TapeDrive:
         if self.command.exitCode == 6:
             self._inquiry()
             # Ugly, but I don't know "nicer" way currently
-            self.command = Command("sg_raw --binary -r 1k '" + self.generic_path +  "' 5a 0 0 0 0 0 0 0 4 0", 0, True)
+            self.command = Command(self._modeSenseArgv(), 0, True)
             self.command.wait()
 
         if self.tape.state == E_Tape.NO_TAPE:
             try:
-                self.tape = Tape(self.command.stdout[0][4:])
+                self.tape = Tape(self.command.stdoutRaw[2:4].hex())
             except IndexError:
                 self.tape = Tape("0000")
 
+    def _modeSenseArgv(self) -> List[str]:
+        return ["sg_raw", "--binary", "-r", "1k", self.generic_path, "5a", "0", "0", "0", "0", "0", "0", "0", "4", "0"]
+
     def _refresh(self) -> None:
         # When still initializing run first inquiry
         if self.command is None:
-            self._inquiry()
-            self._readModeSense()
+            self._probe()
             return
         
+        # TEST_READ runs one dd per File in the verify thread, only the end of the whole pass counts
+        if self.state is TD_State.TEST_READ and self.verification is not None:
+            if self.verification.running():
+                return
+            self.state = TD_State.ERROR if self.verification.failed() else TD_State.IDLE
+            if self.state is TD_State.IDLE:
+                self._probe()
+            return
+
         # When currently running SOME stuff (except init)
         self.command.status()   # get current state
         
@@ -395,6 +641,13 @@ class TapeDrive:
         if self.command.running:
             return
 
+        # Nothing happened since the last refresh. SCSI inquiries only run on
+        # state transitions, plus a slow probe to notice media changes.
+        if self.command is self._settled:
+            if self.state is TD_State.IDLE and monotonic() - self._probed >= self.PROBE_INTERVAL:
+                self._probe()
+            return
+
         # do not accept further commands when in error state
         if self.command.exitCode != 0:
             self.state = TD_State.ERROR
@@ -408,8 +661,20 @@ class TapeDrive:
                 self.tape.begin_of_tape = False
         
         self.state = TD_State.IDLE
+        self._probe()
+
+    def _probe(self) -> None:
+        before: Command | None = self.command
         self._inquiry()
+        inquiry: Command | None = self.command
         self._readModeSense()
+        self._probed = monotonic()
+        self._settled = self.command
+
+        # The probe settles right here, so it fails the drive itself: only a clean exit stays IDLE
+        probes: List[Command] = [c for c in (inquiry, self.command) if c is not None and c is not before]
+        if any(c.exitCode != 0 for c in probes):
+            self.state = TD_State.ERROR
 
     def _asdict(self) -> dict:
         self._refresh()
@@ -448,7 +713,10 @@ class TapeDrive:
             "tape": self.tape._asdict(),
             "command" : command,
             "current_file": currentFile
-        }    
+        }
+
+        if self.verification is not None:
+            data.update({"verification": self.verification._asdict()})
         
         return data
 
@@ -502,16 +770,44 @@ class TapeDrive:
         self.file = file
 
         self.state = TD_State.WRITE
-        self.command = Command(
-            "dd if='" + self.file.path.path + "' of='" + self.path + "' " +
-            "iflag=fullblock status=none bs=" + self.blocksize, 
-            filesize=self.file.size)
-        
-        self.command.start()
+        stream: HashStream | None = file.streamChecksum()
+        crypt: Encryption | None = TapeDrive._crypt(file)
+        dd: List[str] = ["dd", "of=" + self.path, "iflag=fullblock", "status=none", "bs=" + self.blocksize]
+        if stream is None and crypt is None:
+            self._tee = None
+            self.command = Command(
+                ["dd", "if=" + self.file.path.path, "of=" + self.path, "status=none", "bs=" + self.blocksize]
+                + PageCache.Dd("iflag", self.file.path.path, ["fullblock"]),
+                filesize=self.file.size,
+                capture=Capture(E_Capture.RING),
+                sched=Sched.STREAMING)
+            self.command.start()
+        elif stream is None:
+            # openssl (or dd | openssl) reads the file, the ciphertext only passes a kernel pipe into dd
+            self._tee = None
+            self.command = Pipeline(
+                crypt.streamStages(path=file.path.path, filesize=self.file.size, sched=Sched.STREAMING) # type: ignore
+                + [Command(dd, filesize=self.file.size, capture=Capture(E_Capture.RING), sched=Sched.STREAMING)])
+            self.command.start()
+        else:
+            # Python reads the file once, hashing every chunk on its way into dd (or openssl | dd)
+            self._tee = _Tee(stream, source=file.path.path)
+            command: Command = Command(dd, filesize=self.file.size, capture=Capture(E_Capture.RING),
+                                       stdin=crypt is None, sched=Sched.STREAMING)
+            if crypt is None:
+                self.command = command
+            else:
+                self.command = Pipeline([
+                    Command(crypt.streamArgv(), filesize=self.file.size, capture=Capture(E_Capture.RING),
+                            stdin=True, sched=Sched.STREAMING),
+                    command])
+            self._tee.start(self.command)
+
         self.tape.begin_of_tape = False
 
     def writeTOC(self, tableOfContent: str):
         # This writes TOC as first File on Tape
+        # The TOC is streamed from memory into dd's STDIN, no temporary file in /tmp
         self._refresh()
         
         if self.state != TD_State.IDLE or not self.tape.begin_of_tape:
@@ -519,32 +815,24 @@ class TapeDrive:
         
         self.state = TD_State.WRITE_TOC
 
-        toc_uuid : str = str(uuid.uuid4())
-        toc_filename : str = "toc_" + toc_uuid + ".json"
-        toc_path: str = "/tmp/" + toc_filename
-        tocfile: File = File(0, toc_path, "CONTEXT")
-        
-        try:
-            with open(tocfile.path.path, 'w') as f:
-                pass
-                #f.write(json.dumps(tableOfContent._asdict(), indent=2))
-        except PermissionError:
-           raise PermissionError("Cannot write Temporary file into /tmp!")
-        except:
-            raise
-
+        toc: bytes = tableOfContent.encode("utf-8")
         self.command = Command(
-            "dd if='" + self.file.path.path + "' of='" + self.path + "' " +
-            "iflag=fullblock status=none bs=" + self.blocksize, 
-            filesize=tocfile.size)
+            ["dd", "of=" + self.path, "iflag=fullblock", "status=none", "bs=" + self.blocksize],
+            filesize=len(toc),
+            stdin=True,
+            sched=Sched.STREAMING)
 
+        self.command.start()
+        try:
+            self.command.feed(toc)
+        except BrokenPipeError:
+            pass    # dd died early, exitCode tells why
         self.command.wait()
         
         if(self.command.exitCode != 0):
             self.state = TD_State.ERROR
             return
         
-        tocfile.remove()
         self.tape.begin_of_tape = False
 
     def read(self, file: File) -> None:
@@ -560,17 +848,127 @@ class TapeDrive:
             return
         
         self.state = TD_State.READ
-        self.command = Command(
-            "dd if='" + self.path + "' " + "of='" + file.path.path + "' " +
-            "bs='" + self.blocksize + "' " + "iflag=fullblock status=none")
+        self.file = file
+        stream: HashStream | None = file.streamChecksum()
+        crypt: Encryption | None = TapeDrive._crypt(file)
+        dd: List[str] = ["dd", "if=" + self.path, "bs=" + self.blocksize, "iflag=fullblock", "status=none"]
+        if stream is None and crypt is None:
+            self._tee = None
+            self.command = Command(
+                ["dd", "if=" + self.path, "of=" + file.path.path,
+                 "bs=" + self.blocksize, "iflag=fullblock", "status=none"] + PageCache.Dd("oflag", file.path.path),
+                capture=Capture(E_Capture.RING),
+                sched=Sched.STREAMING)
+            self.command.start()
+        elif stream is None:
+            # dd | openssl -d, openssl (or openssl | dd) writes the plaintext file
+            self._tee = None
+            self.command = Pipeline(
+                [Command(dd, capture=Capture(E_Capture.RING), sched=Sched.STREAMING)]
+                + crypt.streamStages(decrypt=True, target=file.path.path, sched=Sched.STREAMING)) # type: ignore
+            self.command.start()
+        else:
+            # dd (or dd | openssl -d) hands the data to Python, every chunk gets hashed and written
+            # to the file. A known checksum (TOC) is validated in the same pass, no read-back.
+            self._tee = _Tee(stream, target=file.path.path)
+            command: Command = Command(
+                dd if crypt is None else crypt.streamArgv(decrypt=True),
+                capture=Capture(E_Capture.RING),
+                sched=Sched.STREAMING)
+            if crypt is None:
+                self.command = command
+            else:
+                self.command = Pipeline([Command(dd, capture=Capture(E_Capture.RING), sched=Sched.STREAMING), command])
+            self._tee.start(self.command)
 
+        self.tape.begin_of_tape = False
+
+    def verify(self, files: List[File]) -> None:
+        """
+        TEST_READ: streams the Files back from tape and hashes them in memory, no disk
+        space and no disk I/O. Compares against the checksums known by each `File.cksum`
+        (e.g. restored from the TOC), the per-file report is `self.verification`.
+        Like `read()` the tape must be positioned at the first of the Files, and the Files
+        must be given in tape order.
+        """
+        self._refresh()
+
+        if self.state != TD_State.IDLE or not files:
+            return
+
+        self.state = TD_State.TEST_READ
+        self.file = None
+        self._tee = None
+        self.verification = _Verify(self, files)
+        self.verification.thread.start()
+        self.tape.begin_of_tape = False
+
+    def readRange(self, file: File, offset: int = 0, length: int = -1) -> None:
+        """
+        Re-reads bytes [offset, offset + length) of the CURRENT tape file into `file`, in place
+        (conv=notrunc), length -1 up to the end. Repairs what `Checksum.badRange()` reports
+        or resumes an interrupted restore, without reading the whole file again.
+        `offset` must be aligned to the blocksize (manifest entries are).
+
+        Like `read()` the tape must be positioned at the start of the file. Real drives
+        skip the leading blocks with SCSI SPACE, overridden drives let dd skip them.
+        """
+        self._refresh()
+
+        if self.state != TD_State.IDLE:
+            return
+
+        if TapeDrive._crypt(file) is not None:
+            # Plaintext offsets do not map onto the ciphertext (salt header, CBC chaining)
+            raise ValueError("[ERROR] readRange: not supported for inline encrypted files, use read()")
+
+        block: int = Tape.Bytes(self.blocksize)
+        if offset % block != 0:
+            raise ValueError("[ERROR] readRange: offset " + str(offset) + " not aligned to blocksize " + self.blocksize)
+        first: int = offset // block
+
+        argv: List[str] = ["dd", "if=" + self.path, "of=" + file.path.path, "bs=" + self.blocksize,
+                           "seek=" + str(first), "conv=notrunc", "iflag=fullblock", "status=none"]
+        argv += PageCache.Dd("oflag", file.path.path)
+        if length >= 0:
+            argv.append("count=" + str(-(-length // block)))
+
+        if first > 0:
+            if self.drive_override or not self.generic_path:
+                argv.append("skip=" + str(first))
+            elif not self._space(first):
+                self.state = TD_State.ERROR
+                return
+
+        self.state = TD_State.READ
+        self.file = file
+        self._tee = None
+        self.command = Command(argv, capture=Capture(E_Capture.RING), sched=Sched.STREAMING)
         self.command.start()
         self.tape.begin_of_tape = False
 
+    @staticmethod
+    def _crypt(file: File) -> Encryption | None:
+        # Encryption of `file` on the tape path, None: the bytes go to tape as they are
+        scheme: Encryption = file.encryption_scheme
+        return scheme if scheme.inline and scheme.active else None
+
+    def _space(self, blocks: int) -> bool:
+        # SCSI SPACE(6), code 0 = logical blocks: the drive locates without transferring data.
+        # The count field has 24 bit, larger distances take several steps.
+        while blocks > 0:
+            count: bytes = min(blocks, 0xFFFFFF).to_bytes(3, "big")
+            self.command = Command(["sg_raw", self.generic_path, "11", "0"] + [format(b, "x") for b in count] + ["0"])
+            self.command.wait()
+            if self.command.exitCode != 0:
+                return False
+            blocks -= 0xFFFFFF
+        return True
+
     def __eject(self):
         self.state = TD_State.EJECT
         if self.ejectCommand is None:
-            self.command = Command("sg_raw '" + self.generic_path + "' 0x1B 0 0 0 0 0")
+            self.command = Command(["sg_raw", self.generic_path, "0x1B", "0", "0", "0", "0", "0"])
         else:
             self.command = self.ejectCommand
         self.command.start()
@@ -579,7 +977,7 @@ class TapeDrive:
     def __rewind(self):
         self.state = TD_State.REWIND
         if self.rewindCommand is None:
-            self.command = Command("sg_raw '" + self.generic_path + "' 0x01 0 0 0 0 0")
+            self.command = Command(["sg_raw", self.generic_path, "0x01", "0", "0", "0", "0", "0"])
         else:
             self.command = self.rewindCommand
         self.command.start()
\ No newline at end of file
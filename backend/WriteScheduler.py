@@ -8,9 +8,11 @@ from tbk.Status import Status
 from backend.TableOfContent import TableOfContent
 from backend.Command import Command
 from backend.TapeDrive import TapeDrive
-from backend.File import File
+from backend.File import File, FileState
 from backend.Folder import Folder
 from backend.Checksum import Checksum, ChecksumType
+from backend.ChecksumBatch import ChecksumBatch
+from backend.HashEngine import HashJob
 
 class WS_States(Enum):
     WAIT_FOR_DRIVE = 0
@@ -26,54 +28,55 @@ class WriteScheduler():
     drive: TapeDrive
     threadLimit: int
     cksum_type: ChecksumType
+    teeHash: bool = True    # checksums get computed by the TapeDrive while writing, no extra read pass
+    inlineEncryption: bool = True   # encrypted on the tape path (if the Folder agrees), no .crypt copy
     folders: List[Folder] = []
     writePipeline: List[File] = []
     cksumPipeline: List[File] = []
 
     write_job: File
-    cksum_jobs: List[File]
-    failedCmd: Command
+    cksum_jobs: ChecksumBatch
+    failedCmd: Command | HashJob
     # --------------------------------------------------------------
 
 
     def _initPipelines(self) -> None:
         for folder in self.folders:
             for file in folder.files:
-                if self.cksum_type != ChecksumType.NONE:
+                file.encryption_scheme.inline = self.inlineEncryption and folder.inlineEnc
+                if self.cksum_type != ChecksumType.NONE and not self.teeHash:
                     self.cksumPipeline.append(file)
                 else:
                     self.writePipeline.append(file)
 
+        # All checksums run as one batch, small files share worker tasks
+        self.cksum_jobs = ChecksumBatch(self.cksumPipeline)
+        self.cksumPipeline = []
+        self.cksum_jobs.start()
+
     def _checkWriteJob(self):
         _driveState = self.drive.getStatus()
         if _driveState in {Status.TAPE_RDY, Status.NOT_AT_BOT}:
             self.write_job = None
 
     def _checkCksumJobs(self) -> None:
-        # This empties completed Jobs
-        if not self.cksum_jobs:
-            return
-        for job in self.cksum_jobs:
-            # Check Status, so it'll commit the value
-            job.checksum._status()
-
-            # When job completed...
-            if not job.checksum.cmd.running:
-                # ... Check if error occured
-                if job.checksum.cmd.exitCode != 0:
-                    self.state = WS_States.CKSUM_ERROR
-                    self.failedCmd = job.cmd
-                    break
-                else:
-                    # ... Move this job to write-pipeline
-                    self.writePipeline.append(job)
-                    self.cksum_jobs.remove(job)
+        # Moves all completed checksums to the write-pipeline at once
+        for file in self.cksum_jobs.drain():
+            # ... Check if error occured
+            if file.state is not FileState.IDLE:
+                self.state = WS_States.CKSUM_ERROR
+                self.failedCmd = file.cksum.cmd
+            else:
+                self.writePipeline.append(file)
 
 
     def _assignJobs(self) -> None:
         if not self.write_job:
             if not self.writePipeline:
                 self._checkCksumJobs()
+                if not self.writePipeline and self.cksum_jobs.pending:
+                    # the drive idles for about cksum_jobs.nextReady() sec.
+                    self.state = WS_States.WAIT_FOR_CHECKSUM
             else:
                 self.write_job = self.writePipeline.pop(0)
         else:
@@ -100,7 +103,7 @@ class WriteScheduler():
     def _asdict(self) -> dict:
         jobs = {
             "write_job": self.writeJob,
-            "cksum_jobs": [file._asdict() for file in self.cksum_jobs]
+            "cksum_jobs": self.cksum_jobs._asdict()
         }
 
         data =  {